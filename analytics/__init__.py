@@ -0,0 +1,25 @@
+from analytics.backends import BACKENDS, open_datasets
+from analytics.binning import DENSITY_COLUMNS, density_cells, lead_adr_density
+from analytics.chunked import ChunkedDataset, ChunkedDatasetManager
+from analytics.cube import BookingCube, CubeCell, MONTHS
+from analytics.dataset import Dataset, DatasetManager
+from analytics.derive import DERIVED_COLUMNS, MONTH_NUMBERS, derive_columns
+from analytics.export import EXPORT_FORMATS, iter_export
+from analytics.filter_index import FilterIndex, parse_date_range
+from analytics.ingest import prepare_batch
+from analytics.parallel import AggregationPool
+from analytics.query import DIMENSIONS, parse_query, query_columns, run_query
+from analytics.schema import apply_schema, memory_report
+from analytics.sqlite_backend import SQLiteDataset, SQLiteDatasetManager, ensure_sqlite
+from analytics.stages import set_stage_timer
+from analytics.storage import cache_version, load_bookings, read_columnar, write_columnar
+
+__all__ = [
+    'AggregationPool', 'BACKENDS', 'BookingCube', 'ChunkedDataset', 'ChunkedDatasetManager',
+    'CubeCell', 'DENSITY_COLUMNS', 'DERIVED_COLUMNS', 'DIMENSIONS', 'Dataset', 'DatasetManager',
+    'EXPORT_FORMATS', 'FilterIndex', 'MONTHS', 'MONTH_NUMBERS', 'SQLiteDataset',
+    'SQLiteDatasetManager', 'apply_schema', 'cache_version', 'density_cells', 'derive_columns',
+    'ensure_sqlite', 'iter_export', 'lead_adr_density', 'load_bookings', 'memory_report',
+    'open_datasets', 'parse_date_range', 'parse_query', 'prepare_batch', 'query_columns',
+    'read_columnar', 'run_query', 'set_stage_timer', 'write_columnar',
+]
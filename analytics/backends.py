@@ -0,0 +1,35 @@
+from analytics.chunked import ChunkedDatasetManager
+from analytics.dataset import DatasetManager
+from analytics.parallel import AggregationPool
+from analytics.sqlite_backend import SQLiteDatasetManager
+
+# Dataset backends by configuration name
+BACKENDS = {
+    'pandas': DatasetManager,
+    'sqlite': SQLiteDatasetManager,
+    'chunked': ChunkedDatasetManager,
+}
+
+
+def open_datasets(path, backend='pandas', cache_dir=None, workers=0):
+    """Create the dataset manager for ``path`` with the named backend.
+
+    ``pandas`` memory-maps the columnar cache and answers from in-memory
+    indexes; ``sqlite`` keeps the rows in an indexed SQLite file and pushes
+    filters and aggregations into SQL, for datasets larger than RAM;
+    ``chunked`` streams the CSV itself in fixed-size chunks, with no
+    conversion step, at the cost of a file scan per uncached query.
+
+    ``workers`` > 0 starts an ``AggregationPool`` of that many processes for
+    the ``pandas`` backend, which then builds its cube and answers large
+    queries partition by partition in parallel.
+    """
+    try:
+        manager = BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"unknown dataset backend {backend!r}, expected one of {', '.join(BACKENDS)}") from None
+    if workers:
+        if backend != 'pandas':
+            raise ValueError(f'parallel aggregation needs the pandas backend, not {backend!r}')
+        return manager(path, cache_dir, pool=AggregationPool(workers))
+    return manager(path, cache_dir)
@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+
+# Fixed grid domain, so payloads stay comparable across filters. Values above
+# the upper bound land in the last bin rather than stretching the grid.
+LEAD_TIME_MAX = 720
+ADR_MAX = 400
+DEFAULT_BINS = (24, 20)
+MAX_BINS = 100
+# Columns the density reads, for callers that project before filtering
+DENSITY_COLUMNS = ['hotel', 'lead_time', 'adr', 'is_canceled']
+
+
+def _bin(values, upper, bins):
+    codes = (values * (bins / upper)).astype(np.int64)
+    return np.clip(codes, 0, bins - 1)
+
+
+def lead_adr_density(frame, rows=None, lead_bins=DEFAULT_BINS[0], adr_bins=DEFAULT_BINS[1], split_by_hotel=False):
+    """Booking counts and cancellation rate on a lead time x ADR grid.
+
+    Works on the selected row positions only, with one ``np.bincount`` per
+    measure, so cost grows linearly with the selection while the payload size
+    depends only on the grid (and the number of hotels when split).
+    """
+    lead_bins, adr_bins = clamp_bins(lead_bins, adr_bins)
+
+    def column(name):
+        values = frame[name].to_numpy()
+        return values if rows is None else values[rows]
+
+    lead = column('lead_time')
+    adr = column('adr')
+    canceled = column('is_canceled')
+    # Same population the scatter plot used to sample from
+    keep = (adr > 0) & (lead > 0)
+    if split_by_hotel:
+        hotel = frame['hotel'] if rows is None else frame['hotel'].take(rows)
+        hotel_codes, hotels = pd.factorize(hotel, sort=True)
+        # Rows without a hotel (code -1) belong to no series
+        keep &= hotel_codes >= 0
+        names = list(hotels)
+    else:
+        names = ['All Hotels']
+    lead, adr, canceled = lead[keep], adr[keep], canceled[keep]
+
+    cells = lead_bins * adr_bins
+    codes = _bin(lead, LEAD_TIME_MAX, lead_bins) * adr_bins + _bin(adr, ADR_MAX, adr_bins)
+    if split_by_hotel:
+        codes = codes + hotel_codes[keep] * cells
+
+    size = cells * len(names)
+    counts = np.bincount(codes, minlength=size)
+    cancels = np.bincount(codes, weights=canceled, minlength=size)
+    return density_payload(names, counts, cancels, lead_bins, adr_bins)
+
+
+def clamp_bins(lead_bins, adr_bins):
+    """Grid dimensions limited to 1..MAX_BINS."""
+    return int(min(max(lead_bins, 1), MAX_BINS)), int(min(max(adr_bins, 1), MAX_BINS))
+
+
+def density_payload(names, counts, cancels, lead_bins, adr_bins):
+    """Assemble the density response from flat per-cell booking and cancellation counts.
+
+    ``counts`` and ``cancels`` hold ``len(names) * lead_bins * adr_bins``
+    cells, hotel-major, then lead time, then ADR.
+    """
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rates = np.round(cancels / counts, 4)
+
+    counts = counts.reshape(len(names), lead_bins, adr_bins)
+    rates = rates.reshape(len(names), lead_bins, adr_bins)
+    # Arrays are left as NumPy for the JSON layer to encode in one pass
+    return {
+        'lead_time_edges': np.linspace(0, LEAD_TIME_MAX, lead_bins + 1),
+        'adr_edges': np.linspace(0, ADR_MAX, adr_bins + 1),
+        'series': [
+            {
+                'hotel': name,
+                'counts': counts[i],
+                # Empty cells have no rate; NaN serialises as null
+                'cancel_rate': rates[i],
+            }
+            for i, name in enumerate(names)
+        ],
+    }
+
+
+def density_cells(density):
+    """Flatten a density grid into one row per non-empty cell, for plotting."""
+    lead_edges = np.asarray(density['lead_time_edges'])
+    adr_edges = np.asarray(density['adr_edges'])
+    lead_centers = (lead_edges[:-1] + lead_edges[1:]) / 2
+    adr_centers = (adr_edges[:-1] + adr_edges[1:]) / 2
+    frames = []
+    for series in density['series']:
+        counts = np.asarray(series['counts'])
+        lead_idx, adr_idx = np.nonzero(counts)
+        frames.append(pd.DataFrame({
+            'hotel': series['hotel'],
+            'lead_time': lead_centers[lead_idx],
+            'adr': adr_centers[adr_idx],
+            'count': counts[lead_idx, adr_idx],
+            'cancel_rate': np.asarray(series['cancel_rate'], dtype=float)[lead_idx, adr_idx],
+        }))
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,174 @@
+"""Out-of-core aggregation over booking CSVs too large to load.
+
+``ChunkedDataset`` never holds more than one chunk of rows. Loading streams
+the file once and folds per-chunk cube cells into the booking cube, so the
+KPI, revenue, cancellation and top-country widgets are served from memory
+afterwards. Group-by queries, density grids and exports stream the file
+again per request: the hotel/year/month filters are applied chunk by chunk
+and mergeable partial aggregates (counts, exact sums, per-key counters) are
+folded into the final result. Float sums are exact (see ``analytics.exact``),
+so every result is identical to the in-memory backend's, whatever the
+chunk size.
+"""
+import numpy as np
+import pandas as pd
+
+from analytics.binning import (ADR_MAX, DEFAULT_BINS, LEAD_TIME_MAX, _bin, clamp_bins, density_payload)
+from analytics.cube import BookingCube
+from analytics.dataset import DatasetManager
+from analytics.derive import derive_columns
+from analytics.query import aggregate_pieces, run_query
+from analytics.stages import stage
+from analytics.storage import file_fingerprint
+
+CHUNK_ROWS = 100000
+
+
+def iter_chunks(path, chunk_rows=CHUNK_ROWS):
+    """Yield the bookings at ``path`` with derived columns, ``chunk_rows`` at a time."""
+    for chunk in pd.read_csv(path, chunksize=chunk_rows):
+        yield derive_columns(chunk)
+
+
+def _mask(chunk, hotel=None, year=None, month=None, start=None, stop=None):
+    # Same "All ..." conventions as FilterIndex.select; None keeps every row
+    matches = []
+    for column, value in [('hotel', hotel if hotel != "All Hotels" else None),
+                          ('arrival_date_year', int(year) if year and year != "All Years" else None),
+                          ('arrival_date_month', month if month != "All Months" else None)]:
+        if value:
+            matches.append((chunk[column] == value).to_numpy())
+    if start is not None:
+        matches.append((chunk['arrival_date'] >= start).to_numpy())
+    if stop is not None:
+        matches.append((chunk['arrival_date'] < stop).to_numpy())
+    return np.logical_and.reduce(matches) if matches else None
+
+
+class ChunkedDataset:
+    """The booking CSV aggregated in fixed-size chunks, with the ``Dataset`` interface.
+
+    Peak memory is one chunk plus the aggregates being built; ``filter``
+    is the exception, as it returns all the matching rows in one frame.
+    """
+
+    def __init__(self, path, version, chunk_rows=CHUNK_ROWS):
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self.base_version = version
+        self.version = version
+        self.appended = 0
+
+        self.cube = BookingCube.from_frames(self.chunks())
+        self.rows = self.cube.cell().bookings
+
+    def __len__(self):
+        return self.rows
+
+    def chunks(self, hotel=None, year=None, month=None, start=None, stop=None):
+        """Yield the matching rows of every chunk, skipping chunks without any."""
+        chunks = iter_chunks(self.path, self.chunk_rows)
+        while True:
+            # Reading and masking the file is this backend's filtering; the
+            # caller's work on each yielded chunk is not
+            with stage('filter'):
+                chunk = next(chunks, None)
+                if chunk is None:
+                    return
+                mask = _mask(chunk, hotel, year, month, start, stop)
+                if mask is not None:
+                    chunk = chunk[mask] if mask.any() else None
+            if chunk is not None:
+                yield chunk
+
+    def cube_for(self, start=None, stop=None):
+        """The booking cube, or one over the bookings arriving in ``[start, stop)``."""
+        if start is None and stop is None:
+            return self.cube
+        return BookingCube.from_frames(self.chunks(start=start, stop=stop))
+
+    def select(self, hotel=None, year=None, month=None, start=None, stop=None):
+        """Matching rows as a lazy stream of ``(frame, None)`` chunks.
+
+        At least one (possibly empty) frame is produced, so callers always
+        see the columns.
+        """
+        empty = True
+        for chunk in self.chunks(hotel, year, month, start, stop):
+            empty = False
+            yield chunk, None
+        if empty:
+            yield derive_columns(pd.read_csv(self.path, nrows=0)), None
+
+    def filter(self, hotel=None, year=None, month=None, start=None, stop=None, columns=None):
+        """Matching rows as one frame, optionally restricted to ``columns``."""
+        pieces = [frame if columns is None else frame[list(columns)]
+                  for frame, _ in self.select(hotel, year, month, start, stop)]
+        return pd.concat(pieces, ignore_index=True)
+
+    def query(self, hotel=None, year=None, month=None, start=None, stop=None,
+              group_by=(), measures=('count',), order_by=None, limit=None):
+        """Run a parsed group-by query (see ``parse_query``) one chunk at a time.
+
+        Each chunk adds its per-group partial aggregates into running totals
+        (see ``aggregate_pieces``), which are then handed to ``run_query``.
+        """
+        frame = aggregate_pieces(self.chunks(hotel, year, month, start, stop), group_by, measures)
+        return run_query(frame, list(group_by), measures, order_by, limit, aggregated=True)
+
+    def density(self, hotel=None, year=None, month=None, start=None, stop=None,
+                lead_bins=DEFAULT_BINS[0], adr_bins=DEFAULT_BINS[1], split_by_hotel=False):
+        """Lead time x ADR density grid, with per-hotel cell counts added up chunk by chunk."""
+        lead_bins, adr_bins = clamp_bins(lead_bins, adr_bins)
+        cells = lead_bins * adr_bins
+        grids = {}
+
+        def add(name, codes, canceled):
+            counts, cancels = grids.setdefault(name, (np.zeros(cells, dtype=np.int64), np.zeros(cells)))
+            counts += np.bincount(codes, minlength=cells)
+            cancels += np.bincount(codes, weights=canceled, minlength=cells)
+
+        for chunk in self.chunks(hotel, year, month, start, stop):
+            lead = chunk['lead_time'].to_numpy()
+            adr = chunk['adr'].to_numpy()
+            # Same population and bins as lead_adr_density
+            keep = (adr > 0) & (lead > 0)
+            codes = _bin(lead[keep], LEAD_TIME_MAX, lead_bins) * adr_bins + _bin(adr[keep], ADR_MAX, adr_bins)
+            canceled = chunk['is_canceled'].to_numpy()[keep]
+            if not split_by_hotel:
+                add('All Hotels', codes, canceled)
+                continue
+            hotel_codes, hotels = pd.factorize(chunk['hotel'])
+            # Every hotel with a matching booking gets a grid, even an empty one
+            for i, name in enumerate(hotels):
+                rows = hotel_codes[keep] == i
+                add(name, codes[rows], canceled[rows])
+
+        names = sorted(grids) if split_by_hotel else ['All Hotels']
+        empty = (np.zeros(cells, dtype=np.int64), np.zeros(cells))
+        counts = np.array([grids.get(name, empty)[0] for name in names], dtype=np.int64).ravel()
+        cancels = np.array([grids.get(name, empty)[1] for name in names], dtype=np.float64).ravel()
+        return density_payload(names, counts, cancels, lead_bins, adr_bins)
+
+    def values(self, dim):
+        """Sorted distinct values of a filter dimension (hotel, year or month)."""
+        return {'hotel': self.cube.hotels, 'year': self.cube.years, 'month': self.cube.months}[dim]
+
+
+class ChunkedDatasetManager(DatasetManager):
+    """``DatasetManager`` for the chunked backend, for CSVs larger than memory.
+
+    Reloads and watching work as for the other backends. Appends are not
+    supported, since the rows are only ever read back from the source file.
+    """
+
+    def __init__(self, path, cache_dir=None, chunk_rows=CHUNK_ROWS):
+        self.chunk_rows = chunk_rows
+        super().__init__(path, cache_dir)
+
+    def _load(self):
+        version = f"{file_fingerprint(self.path)['sha256'][:16]}-chunked"
+        return ChunkedDataset(self.path, version, self.chunk_rows)
+
+    def append(self, batch):
+        raise ValueError('the chunked backend reads bookings from the source file only; append to that file instead')
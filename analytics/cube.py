@@ -0,0 +1,228 @@
+import itertools
+
+import pandas as pd
+
+from analytics.exact import exact_sums, grouped_sum, to_float
+from analytics.filter_index import FilterIndex
+
+MONTHS = ['January', 'February', 'March', 'April', 'May', 'June', 'July',
+          'August', 'September', 'October', 'November', 'December']
+
+# Columns the additive measures are computed from
+CUBE_COLUMNS = ['is_canceled', 'adr', 'total_nights', 'revenue', 'country']
+
+
+def _plain_index(counts):
+    return pd.Series(counts.to_numpy(), index=counts.index.astype(object))
+
+
+def _ranked(counts, categories):
+    # Ranks exactly like value_counts on a categorical with these categories,
+    # ties included: counts in category order, then the same sort
+    full = pd.Series(_plain_index(counts).reindex(categories, fill_value=0).to_numpy(dtype='int64'),
+                     index=pd.CategoricalIndex(categories, categories=categories))
+    ranked = full.sort_values(ascending=False)
+    return ranked[ranked > 0]
+
+
+def partial_cells(frame):
+    """Cells of ``frame``'s rows per (hotel, year, month), NaN for a missing value."""
+    keys = [frame['hotel'], frame['arrival_date_year'], frame['arrival_date_month']]
+    groups = frame[CUBE_COLUMNS].groupby(keys, dropna=False, observed=True, sort=False)
+    return {key: CubeCell(rows) for key, rows in groups}
+
+
+class CubeCell:
+    """Additive measures for one hotel x year x month combination.
+
+    ADR and revenue are kept as exact totals (see ``analytics.exact``), so
+    cells added up from batches or chunks equal the cell built in one pass.
+    """
+
+    __slots__ = ('bookings', 'canceled', 'not_canceled', 'adr_total', 'adr_count',
+                 'nights_sum', 'nights_count', 'revenue_total', 'country_counts')
+
+    def __init__(self, frame):
+        nights = frame['total_nights']
+        self.bookings = len(frame)
+        self.canceled = int((frame['is_canceled'] == 1).sum())
+        self.not_canceled = int((frame['is_canceled'] == 0).sum())
+        self.adr_total = exact_sums(frame['adr'])[0]
+        self.adr_count = int(frame['adr'].count())
+        self.nights_sum = nights.sum()
+        self.nights_count = int(nights.count())
+        self.revenue_total = exact_sums(frame['revenue'])[0]
+        country_counts = frame['country'].value_counts()
+        # Categorical value_counts also lists countries absent from this cell
+        self.country_counts = country_counts[country_counts > 0]
+
+    def __add__(self, other):
+        return CubeCell.combine([self, other])
+
+    @staticmethod
+    def combine(cells):
+        """The cell of all the rows behind ``cells``, in one pass over them."""
+        cell = object.__new__(CubeCell)
+        for name in CubeCell.__slots__[:-1]:
+            setattr(cell, name, sum(getattr(part, name) for part in cells))
+        countries = pd.concat([_plain_index(part.country_counts) for part in cells])
+        cell.country_counts = countries.groupby(level=0).sum().sort_values(ascending=False, kind='stable')
+        return cell
+
+    @property
+    def adr_sum(self):
+        return to_float(self.adr_total)
+
+    @property
+    def revenue_sum(self):
+        return to_float(self.revenue_total)
+
+    @property
+    def avg_adr(self):
+        return self.adr_sum / self.adr_count
+
+    @property
+    def avg_nights(self):
+        return self.nights_sum / self.nights_count
+
+
+class BookingCube:
+    """Measures materialised for every hotel/year/month cell, "All" roll-ups included.
+
+    The frame must already carry the columns added by ``derive_columns``.
+
+    Every cell is summed straight from its own rows with exact float sums, so
+    derived averages and totals are bit-identical to computing them per request
+    on the filtered frame. Cubes built over appended batches are folded in with
+    ``merge``, which adds the batch's cells to the matching ones, and
+    ``from_frames`` assembles a cube from frames seen one at a time.
+
+    A ``lazy`` cube computes each cell the first time it is looked up instead,
+    which suits throwaway cubes over a subset of the rows, such as a date range.
+    """
+
+    def __init__(self, frame, index=None, lazy=False):
+        index = index if index is not None else FilterIndex(frame)
+        self.hotels = index.observed('hotel')
+        self.years = index.observed('year')
+        self.months = index.observed('month')
+        self.empty = CubeCell(frame[CUBE_COLUMNS].iloc[:0])
+
+        self.cells = {}
+        self._measures = frame[CUBE_COLUMNS]
+        self._index = index
+        if not lazy:
+            for key in itertools.product([None] + self.hotels, [None] + self.years, [None] + self.months):
+                self.cells[key] = self._compute(key)
+            # An eager cube answers from its cells alone
+            self._measures = self._index = None
+
+    def _compute(self, key):
+        rows = self._index.select(*key)
+        return CubeCell(self._measures if rows is None else self._measures.take(rows))
+
+    @classmethod
+    def from_partials(cls, partials):
+        """Roll the finest-grained cells up into a cube.
+
+        ``partials`` maps every (hotel, year, month) combination present in
+        the data to the cell of its rows, with NaN for a missing value. Each
+        roll-up is the sum of the partials under it, and cell sums are exact,
+        so the cube equals one built from all the rows in a single frame.
+        """
+        cube = object.__new__(cls)
+        cube._index = None
+        observed = [sorted({key[dim] for key in partials if not pd.isna(key[dim])}) for dim in range(3)]
+        cube.hotels, cube.years, cube.months = observed[0], [int(year) for year in observed[1]], observed[2]
+        cube.empty = CubeCell(pd.DataFrame({column: [] for column in CUBE_COLUMNS}))
+
+        rollups = {}
+        for key, cell in partials.items():
+            for used in itertools.product((False, True), repeat=3):
+                if any(use and pd.isna(value) for use, value in zip(used, key)):
+                    continue
+                target = cls.key(*(value if use else None for use, value in zip(used, key)))
+                rollups.setdefault(target, []).append(cell)
+
+        countries = sorted(set().union(*(cell.country_counts.index for cell in partials.values())))
+        cube.cells = {}
+        for target, cells in rollups.items():
+            cell = cube.cells[target] = CubeCell.combine(cells)
+            cell.country_counts = _ranked(cell.country_counts, countries)
+        return cube
+
+    @classmethod
+    def from_frames(cls, frames):
+        """Cube over the rows of all ``frames``, holding one of them at a time."""
+        return cls.from_cell_maps(partial_cells(frame) for frame in frames)
+
+    @classmethod
+    def from_cell_maps(cls, maps):
+        """Cube from several ``partial_cells`` results, e.g. computed in worker processes."""
+        partials = {}
+        for cells in maps:
+            for key, cell in cells.items():
+                partials[key] = partials[key] + cell if key in partials else cell
+        return cls.from_partials(partials)
+
+    def merge(self, delta):
+        """Return a new cube with the cells of ``delta`` added to this one's.
+
+        Only the cells the delta touches are recomputed; the rest are shared,
+        so the cost follows the size of the delta rather than of the cube.
+        """
+        cube = object.__new__(BookingCube)
+        cube.hotels = sorted(set(self.hotels) | set(delta.hotels))
+        cube.years = sorted(set(self.years) | set(delta.years))
+        cube.months = sorted(set(self.months) | set(delta.months))
+        cube.empty = self.empty
+        cube._index = None
+        cube.cells = dict(self.cells)
+        for key, cell in delta.cells.items():
+            if cell.bookings:
+                cube.cells[key] = cube.cells[key] + cell if key in cube.cells else cell
+        return cube
+
+    @staticmethod
+    def key(hotel=None, year=None, month=None):
+        """Normalise request filters into a cell key, None meaning "All"."""
+        return (
+            hotel if hotel and hotel != "All Hotels" else None,
+            int(year) if year and year != "All Years" else None,
+            month if month and month != "All Months" else None,
+        )
+
+    def cell(self, hotel=None, year=None, month=None):
+        key = self.key(hotel, year, month)
+        cell = self.cells.get(key)
+        if cell is None:
+            if self._index is None:
+                return self.empty
+            # Racing requests may both compute a cell; they store the same value
+            cell = self.cells[key] = self._compute(key)
+        return cell
+
+    def hotel_counts(self, hotel=None, year=None, month=None):
+        """Bookings per hotel, largest first, like ``value_counts`` on the filtered rows."""
+        hotel, year, month = self.key(hotel, year, month)
+        hotels = self.hotels if hotel is None else [hotel]
+        counts = [(name, self.cell(name, year, month).bookings) for name in hotels]
+        counts = [(name, count) for name, count in counts if count > 0]
+        return pd.Series(dict(counts), dtype='int64').sort_values(ascending=False, kind='stable')
+
+    def revenue_by_month(self, hotel=None, year=None):
+        """Revenue for each calendar month, zero where nothing was booked."""
+        if self._index is not None:
+            # One grouped pass rather than twelve lazily built cells
+            rows = self._index.select(hotel, year)
+            revenue = self._measures['revenue'].to_numpy()
+            codes = self._index.codes['month']
+            if rows is not None:
+                revenue, codes = revenue[rows], codes[rows]
+            sums = grouped_sum(revenue, codes, len(self._index.lookup['month']))
+            return pd.Series(sums, index=self._index.values('month'), dtype='float64').reindex(MONTHS, fill_value=0.0)
+        return pd.Series(
+            [self.cell(hotel, year, month).revenue_sum for month in MONTHS],
+            index=MONTHS,
+            dtype='float64',
+        )
@@ -0,0 +1,263 @@
+import os
+import threading
+import time
+from concurrent.futures import BrokenExecutor
+
+import numpy as np
+import pandas as pd
+
+from analytics.binning import DEFAULT_BINS, DENSITY_COLUMNS, lead_adr_density
+from analytics.cube import CUBE_COLUMNS, BookingCube
+from analytics.filter_index import FilterIndex
+from analytics.ingest import prepare_batch
+from analytics.query import aggregate_pieces, aggregated_frame, merge_aggregates, partial_aggregates
+from analytics.query import query_columns, run_query
+from analytics.stages import stage
+from analytics.storage import cache_version, ensure_cache, read_partitioned
+
+
+class Dataset:
+    """An immutable snapshot of the booking data and the structures built on it.
+
+    The rows live in parts, each with its own filter index: the loaded frame
+    as one zero-copy slice per (hotel, arrival year) partition, then any
+    batches appended since. Filters run per part, and a part whose partition
+    key rules the filters out is skipped without touching its rows, so a
+    single hotel and year costs what that partition costs. Appends only index
+    the new batch and fold its cube into the existing one.
+
+    This is the in-memory backend. ``SQLiteDataset`` offers the same methods
+    (``cube``, ``cube_for``, ``select``, ``filter``, ``query``, ``density``,
+    ``values``) over an indexed database file, and views should stick to them.
+    Every row filter takes ``hotel``, ``year`` and ``month`` plus an arrival
+    date range ``[start, stop)`` (see ``parse_date_range``).
+
+    Given the cache directory as ``source`` and an ``AggregationPool``, the
+    cube and large queries are aggregated partition by partition in the
+    pool's worker processes, which map the same cache files.
+    """
+
+    def __init__(self, frame, version, partitions=None, source=None, pool=None):
+        self.partitions = list(partitions or [])
+        if self.partitions:
+            self.parts = [FilterIndex(frame.iloc[start:stop], key) for key, start, stop in self.partitions]
+        else:
+            self.parts = [FilterIndex(frame)]
+        self.source = source
+        self.pool = pool if source is not None and self.partitions else None
+        self.base_version = version
+        if self.pool is not None and len(frame) >= self.pool.min_rows:
+            self.cube = BookingCube.from_cell_maps(self.pool.cells((source, version), self.partitions))
+        else:
+            self.cube = BookingCube.from_frames(part.frame for part in self.parts)
+        self.version = version
+        self.appended = 0
+
+    def __len__(self):
+        return sum(len(part) for part in self.parts)
+
+    def cube_for(self, start=None, stop=None):
+        """The booking cube, or one over the bookings arriving in ``[start, stop)``.
+
+        Range cubes are lazy and built per call from just the rows in the
+        range, which the date index finds without scanning the others.
+        """
+        if start is None and stop is None:
+            return self.cube
+        columns = CUBE_COLUMNS + list(FilterIndex.COLUMNS.values()) + [FilterIndex.DATE_COLUMN]
+        return BookingCube(self.filter(start=start, stop=stop, columns=columns), lazy=True)
+
+    def select(self, hotel=None, year=None, month=None, start=None, stop=None):
+        """Matching rows as ``(frame, rows)`` pairs, one per part with any match.
+
+        ``rows`` is None when the whole part matches. With no match at all the
+        first part comes back with no rows, so callers still see the columns.
+        """
+        with stage('filter'):
+            return self._select(hotel, year, month, start, stop)
+
+    def _select(self, hotel=None, year=None, month=None, start=None, stop=None):
+        selection = []
+        for part in self.parts:
+            rows = part.select(hotel, year, month, start, stop)
+            if rows is None or len(rows):
+                selection.append((part.frame, rows))
+        return selection or [(self.parts[0].frame, np.empty(0, dtype=np.int64))]
+
+    def pieces(self, hotel=None, year=None, month=None, start=None, stop=None, columns=None):
+        """Matching rows as one frame per part with any match, optionally restricted to ``columns``."""
+        with stage('filter'):
+            return [_project(frame, rows, columns) for frame, rows in self._select(hotel, year, month, start, stop)]
+
+    def filter(self, hotel=None, year=None, month=None, start=None, stop=None, columns=None):
+        """Matching rows as one frame, optionally restricted to ``columns``."""
+        pieces = self.pieces(hotel, year, month, start, stop, columns)
+        return pieces[0] if len(pieces) == 1 else pd.concat(pieces)
+
+    def query(self, hotel=None, year=None, month=None, start=None, stop=None, **query):
+        """Run a parsed group-by query (see ``parse_query``) over the matching rows.
+
+        Rows spanning several parts are aggregated part by part and the
+        partial aggregates merged, rather than concatenated first. With a
+        pool, selections of at least ``pool.min_rows`` loaded rows send the
+        loaded partitions to the workers.
+        """
+        filters = (hotel, year, month, start, stop)
+        group_by, measures = query['group_by'], query['measures']
+        wanted = [bounds for part, bounds in zip(self.parts, self.partitions) if part.covers(hotel, year, start, stop)]
+        if self.pool is not None and sum(last - first for _, first, last in wanted) >= self.pool.min_rows:
+            totals = self._pool_aggregates(wanted, filters, group_by, measures)
+            if totals is not None:
+                return run_query(aggregated_frame(totals, group_by, measures), aggregated=True, **query)
+        pieces = self.pieces(hotel, year, month, start, stop, query_columns(**query))
+        if len(pieces) == 1:
+            return run_query(pieces[0], **query)
+        return run_query(aggregate_pieces(pieces, group_by, measures), aggregated=True, **query)
+
+    def _pool_aggregates(self, wanted, filters, group_by, measures):
+        # None when the pool is unusable (a worker died, or a newer cache build
+        # removed this version), so the caller aggregates in-process instead
+        try:
+            partials = self.pool.query((self.source, self.base_version), wanted, filters, group_by, measures)
+        except (OSError, BrokenExecutor):
+            return None
+        totals = {}
+        for partial in partials:
+            merge_aggregates(totals, partial)
+        # Appended parts live only in this process
+        columns = query_columns(group_by, measures)
+        for part in self.parts[len(self.partitions):]:
+            rows = part.select(*filters)
+            merge_aggregates(totals, partial_aggregates(_project(part.frame, rows, columns), group_by, measures))
+        return totals
+
+    def density(self, hotel=None, year=None, month=None, start=None, stop=None,
+                lead_bins=DEFAULT_BINS[0], adr_bins=DEFAULT_BINS[1], split_by_hotel=False):
+        """Lead time x ADR density grid over the matching rows."""
+        frame = self.filter(hotel, year, month, start, stop, DENSITY_COLUMNS)
+        return lead_adr_density(frame, None, lead_bins, adr_bins, split_by_hotel)
+
+    def values(self, dim):
+        """Sorted distinct values of a filter dimension (hotel, year or month)."""
+        return sorted(set().union(*(part.observed(dim) for part in self.parts)))
+
+    def append(self, batch):
+        """Return a new snapshot with a typed, derived ``batch`` appended."""
+        batch = batch.set_axis(pd.RangeIndex(len(self), len(self) + len(batch)))
+        index = FilterIndex(batch)
+        dataset = object.__new__(Dataset)
+        dataset.parts = _compact(self.parts + [index])
+        dataset.partitions = self.partitions
+        dataset.source = self.source
+        dataset.pool = self.pool
+        dataset.cube = self.cube.merge(BookingCube(batch, index))
+        dataset.base_version = self.base_version
+        dataset.appended = self.appended + len(batch)
+        dataset.version = f'{self.base_version}+{dataset.appended}'
+        return dataset
+
+
+def _project(frame, rows, columns=None):
+    if columns is not None:
+        frame = pd.DataFrame({column: frame[column] for column in columns}, copy=False)
+    return frame if rows is None else frame.take(rows)
+
+
+def _compact(parts):
+    # Merge appended parts like a binary counter: a part is folded into the
+    # one before it once it is at least half that size. This keeps the number
+    # of parts logarithmic while every row is copied O(log n) times in total.
+    # The loaded parts are never merged, so they stay memory-mapped.
+    while len(parts) > 2 and parts[-2].partition is None and 2 * len(parts[-1]) >= len(parts[-2]):
+        merged = pd.concat([parts[-2].frame, parts[-1].frame])
+        parts = parts[:-2] + [FilterIndex(merged)]
+    return parts
+
+
+class DatasetManager:
+    """Owns the current Dataset and swaps in new versions of the source file.
+
+    A reload parses and indexes the new file in a background thread; only the
+    fully built snapshot is published, with a single reference assignment, so
+    a request holding ``current`` never sees a half-loaded frame.
+    """
+
+    def __init__(self, path, cache_dir=None, pool=None):
+        self.path = path
+        self.cache_dir = cache_dir
+        self.pool = pool
+        self.listeners = []
+        self._append_lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._reloading = None
+        self._watcher = None
+        self.current = self._load()
+
+    def _load(self):
+        directory = ensure_cache(self.path, self.cache_dir)
+        # Map the version read here, even if a newer build is published meanwhile
+        version = cache_version(self.path, self.cache_dir)
+        frame, partitions = read_partitioned(directory, version)
+        return Dataset(frame, version, partitions, directory, self.pool)
+
+    def _publish(self, dataset):
+        self.current = dataset
+        for listener in self.listeners:
+            listener(dataset)
+
+    def _swap(self):
+        try:
+            dataset = self._load()
+            if dataset.base_version != self.current.base_version:
+                self._publish(dataset)
+        finally:
+            with self._reload_lock:
+                self._reloading = None
+
+    def reload(self):
+        """Start a background reload, or return the one already running."""
+        with self._reload_lock:
+            if self._reloading is None:
+                self._reloading = threading.Thread(target=self._swap, name='dataset-reload', daemon=True)
+                self._reloading.start()
+            return self._reloading
+
+    def append(self, batch):
+        """Append a raw batch of bookings and publish the new snapshot.
+
+        The batch is typed and derived with ``prepare_batch``, which raises
+        ValueError for missing columns. Appended rows are held in memory only;
+        a reload from the source file replaces them, so the feed should also
+        land in that file upstream.
+        """
+        with self._append_lock:
+            dataset = self.current.append(prepare_batch(batch, self.current.parts[0].frame))
+            self._publish(dataset)
+            return dataset
+
+    def on_swap(self, listener):
+        """Call ``listener(dataset)`` after every swap, e.g. to drop derived caches."""
+        self.listeners.append(listener)
+        return listener
+
+    def watch(self, interval=5.0):
+        """Poll the source file and reload whenever its size or mtime changes."""
+        if self._watcher is not None:
+            return self._watcher
+
+        def poll():
+            last = None
+            while True:
+                try:
+                    stat = os.stat(self.path)
+                    seen = (stat.st_size, stat.st_mtime_ns)
+                except OSError:
+                    seen = None
+                if last is not None and seen is not None and seen != last:
+                    self.reload().join()
+                last = seen
+                time.sleep(interval)
+
+        self._watcher = threading.Thread(target=poll, name='dataset-watch', daemon=True)
+        self._watcher.start()
+        return self._watcher
@@ -0,0 +1,30 @@
+import pandas as pd
+
+from analytics.cube import MONTHS
+
+MONTH_NUMBERS = {name: number for number, name in enumerate(MONTHS, start=1)}
+
+DERIVED_COLUMNS = ['total_nights', 'revenue', 'arrival_month', 'arrival_date']
+
+
+def derive_columns(df):
+    """Add the derived booking columns every dashboard aggregates on.
+
+    ``total_nights``, ``revenue``, a numeric ``arrival_month`` and a real
+    ``arrival_date`` are computed once here, in place, so aggregations can be
+    plain ``groupby().sum()`` calls instead of per-group Python callbacks.
+    """
+    df['total_nights'] = df['stays_in_weekend_nights'] + df['stays_in_week_nights']
+    df['revenue'] = df['adr'] * df['total_nights']
+    # Unknown month names become 0, which turns into NaT below
+    df['arrival_month'] = df['arrival_date_month'].map(MONTH_NUMBERS).fillna(0).astype('int8')
+    df['arrival_date'] = pd.to_datetime(
+        pd.DataFrame({
+            'year': df['arrival_date_year'],
+            'month': df['arrival_month'],
+            'day': df['arrival_date_day_of_month'],
+        }),
+        errors='coerce',
+    )
+    return df
+
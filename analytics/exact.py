@@ -0,0 +1,80 @@
+"""Exact, mergeable summation of float columns.
+
+Floating-point addition is not associative, so a total folded together
+chunk by chunk normally differs in its last bits from one summed in a single
+pass. Here every double is split into its binary exponent and its 53-bit
+integer mantissa, the mantissas are summed as integers per exponent, and
+the total is kept as one Python integer in units of ``2**-SHIFT``. Partial
+totals are therefore exact and merge by plain addition in any order, and
+``to_float`` rounds once, giving the correctly rounded sum (what
+``math.fsum`` returns) however the rows were split up.
+"""
+import numpy as np
+
+# 53 mantissa bits below the smallest binary exponent, so every double is an integer multiple
+SHIFT = 1126
+# Rows per bincount: keeps every partial mantissa sum exactly representable in a float64
+_BLOCK = 1 << 26
+_LOW_BITS = 26
+
+
+def exact_sums(values, codes=None, size=1):
+    """Exact per-group sums of ``values`` as integers in units of ``2**-SHIFT``.
+
+    ``codes`` assigns each value a group in ``range(size)`` (all to group 0
+    when omitted); values with a negative code are left out. NaN and other
+    non-finite values are skipped, like ``Series.sum`` skips NaN.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    keep = np.isfinite(values)
+    if codes is not None:
+        codes = np.asarray(codes, dtype=np.int64)
+        keep &= codes >= 0
+    if not keep.all():
+        values = values[keep]
+        codes = None if codes is None else codes[keep]
+    totals = [0] * size
+    if not len(values):
+        return totals
+
+    fractions, exponents = np.frexp(values)
+    lowest = int(exponents.min())
+    levels = int(exponents.max()) - lowest + 1
+    keys = exponents - lowest
+    if codes is not None:
+        keys = codes * levels + keys
+    # The 53-bit mantissa splits exactly into a 27-bit high and a 26-bit low integer
+    scaled = fractions * float(1 << 27)
+    high = np.floor(scaled)
+    low = (scaled - high) * float(1 << _LOW_BITS)
+    for start in range(0, len(values), _BLOCK):
+        block = slice(start, start + _BLOCK)
+        high_sums = np.bincount(keys[block], weights=high[block], minlength=size * levels)
+        low_sums = np.bincount(keys[block], weights=low[block], minlength=size * levels)
+        for key in np.flatnonzero((high_sums != 0) | (low_sums != 0)):
+            group, level = divmod(int(key), levels)
+            mantissa_sum = (int(high_sums[key]) << _LOW_BITS) + int(low_sums[key])
+            totals[group] += mantissa_sum << (lowest + level - 53 + SHIFT)
+    return totals
+
+
+def to_float(total):
+    """Round an exact total from ``exact_sums`` to the nearest float."""
+    # int / int true division is correctly rounded
+    return total / (1 << SHIFT)
+
+
+def from_float(value):
+    """The exact total equal to the float ``value``."""
+    numerator, denominator = float(value).as_integer_ratio()
+    return numerator * ((1 << SHIFT) // denominator)
+
+
+def exact_sum(values):
+    """Correctly rounded sum of ``values``, skipping NaN."""
+    return to_float(exact_sums(values)[0])
+
+
+def grouped_sum(values, codes, size):
+    """Correctly rounded per-group sums, as a float array of length ``size``."""
+    return np.array([to_float(total) for total in exact_sums(values, codes, size)], dtype=np.float64)
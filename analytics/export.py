@@ -0,0 +1,101 @@
+import json
+import math
+import zlib
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from analytics.derive import DERIVED_COLUMNS
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+EXPORT_CHUNK_ROWS = 5000
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'csv.gz': ('application/gzip', 'csv.gz'),
+}
+
+
+def _columns(frame):
+    # Exports use the source file's columns, not the derived ones
+    return [column for column in frame.columns if column not in DERIVED_COLUMNS]
+
+
+def _chunks(selection, chunk_rows):
+    for frame, rows in selection:
+        columns = _columns(frame)
+        total = len(frame) if rows is None else len(rows)
+        for start in range(0, total, chunk_rows):
+            if rows is None:
+                yield frame.iloc[start:start + chunk_rows][columns]
+            else:
+                yield frame.take(rows[start:start + chunk_rows])[columns]
+        if not total:
+            # Keeps the header of an empty export
+            yield frame.iloc[:0][columns]
+
+
+def iter_csv(selection, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Yield the selected rows as CSV text, one chunk of rows at a time.
+
+    ``selection`` is an iterable of ``(frame, rows)`` pairs as returned by
+    ``Dataset.select``; ``rows`` of None means the whole frame. It is consumed
+    lazily, so a backend can produce the frames while the response streams.
+    """
+    header = True
+    for chunk in _chunks(selection, chunk_rows):
+        if len(chunk) or header:
+            yield chunk.to_csv(index=False, header=header)
+            header = False
+
+
+def _default(value):
+    # Missing values become null and dates ISO 8601 strings, as in the JSON API
+    if value is pd.NaT or value is pd.NA:
+        return None
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def _record_json(record):
+    # Encoded like app.serialization.dumps: orjson when installed, NaN and
+    # infinities as null, no escaped slashes, columns in file order
+    if orjson is not None:
+        return orjson.dumps(record, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    record = {key: None if isinstance(value, float) and not math.isfinite(value) else value
+              for key, value in record.items()}
+    return json.dumps(record, default=_default, allow_nan=False, separators=(',', ':')).encode('utf-8')
+
+
+def iter_ndjson(selection, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Yield the selected rows as newline-delimited JSON records."""
+    for chunk in _chunks(selection, chunk_rows):
+        if len(chunk):
+            yield b''.join(_record_json(record) + b'\n' for record in chunk.to_dict('records')).decode('utf-8')
+
+
+def iter_gzip(pieces):
+    """Gzip a stream of text pieces incrementally."""
+    compressor = zlib.compressobj(wbits=31)
+    for piece in pieces:
+        compressed = compressor.compress(piece.encode('utf-8'))
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def iter_export(selection, fmt='csv', chunk_rows=EXPORT_CHUNK_ROWS):
+    if fmt == 'ndjson':
+        return iter_ndjson(selection, chunk_rows)
+    if fmt == 'csv.gz':
+        return iter_gzip(iter_csv(selection, chunk_rows))
+    return iter_csv(selection, chunk_rows)
@@ -0,0 +1,183 @@
+import numpy as np
+import pandas as pd
+
+
+def _bound(value):
+    return None if value is None else pd.Timestamp(value).to_datetime64()
+
+
+def parse_date_range(start=None, end=None):
+    """Validate ``start``/``end`` request parameters into a half-open date range.
+
+    Both are optional ISO dates and both are inclusive, so ``start=2016-07-01``
+    and ``end=2016-09-30`` select Q3 2016. Returns ``(start, stop)`` as
+    Timestamps (or None), with ``stop`` the day after ``end``. Raises
+    ValueError for unparseable dates or an empty range.
+    """
+    bounds = []
+    for name, value in (('start', start), ('end', end)):
+        if not value:
+            bounds.append(None)
+            continue
+        try:
+            bounds.append(pd.Timestamp(value).normalize())
+        except ValueError:
+            raise ValueError(f'{name} must be a date like 2016-07-01, got {value!r}') from None
+    start, end = bounds
+    if start is not None and end is not None and end < start:
+        raise ValueError('end must not be before start')
+    return start, None if end is None else end + pd.Timedelta(days=1)
+
+
+class FilterIndex:
+    """Dictionary-encoded row index over the hotel/year/month filter columns.
+
+    Each filter column is encoded once into small integer codes, and every
+    distinct value keeps the sorted array of row positions holding it. A filter
+    combination is resolved by walking the shortest row list and checking the
+    other dimensions' codes, so no boolean scan or frame copy is needed.
+
+    ``arrival_date`` gets a position index sorted by date instead: any date
+    range is a contiguous slice of it, found with two binary searches.
+
+    When the frame is one (hotel, arrival year) partition of the dataset,
+    ``partition`` is that key. Filters on it then prune the whole frame, or
+    match all of it, without looking at a single row.
+    """
+
+    COLUMNS = {
+        'hotel': 'hotel',
+        'year': 'arrival_date_year',
+        'month': 'arrival_date_month',
+    }
+    DATE_COLUMN = 'arrival_date'
+
+    def __init__(self, frame, partition=None):
+        self.frame = frame
+        self.partition = partition
+        self.codes = {}
+        self.lookup = {}
+        self.rows = {}
+        position_dtype = np.int32 if len(frame) < np.iinfo(np.int32).max else np.int64
+        for dim, column in self.COLUMNS.items():
+            series = frame[column]
+            if isinstance(series.dtype, pd.CategoricalDtype) and series.cat.categories.is_monotonic_increasing:
+                # Reuse the categorical codes as-is: no copy, and for a memory-mapped
+                # frame the pages stay shared between worker processes
+                codes, uniques = series.cat.codes.to_numpy(), series.cat.categories
+            else:
+                codes, uniques = pd.factorize(series, sort=True)
+                code_dtype = np.int8 if len(uniques) < np.iinfo(np.int8).max else np.int32
+                codes = codes.astype(code_dtype)
+            # Stable sort keeps row positions ascending inside every value
+            order = np.argsort(codes, kind='stable').astype(position_dtype)
+            bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+            self.codes[dim] = codes
+            self.lookup[dim] = {value: code for code, value in enumerate(uniques.tolist())}
+            self.rows[dim] = [order[bounds[code]:bounds[code + 1]] for code in range(len(uniques))]
+
+        self.dates = frame[self.DATE_COLUMN].to_numpy()
+        # NaT sorts last, so the dated rows are the leading part of the order
+        self.by_date = np.argsort(self.dates, kind='stable').astype(position_dtype)
+        self.dated = len(self.dates) - int(np.isnat(self.dates).sum())
+
+    def __len__(self):
+        return len(self.frame)
+
+    def values(self, dim):
+        """Distinct values of a filter dimension, in sorted order."""
+        return list(self.lookup[dim])
+
+    def observed(self, dim):
+        """Distinct values of a filter dimension that occur in at least one row."""
+        return [value for value, code in self.lookup[dim].items() if len(self.rows[dim][code])]
+
+    def date_span(self, start=None, stop=None):
+        """Row positions with ``start <= arrival_date < stop``, in date order.
+
+        A slice of the date-sorted index, so O(log n) whatever its length.
+        Either bound may be None; rows without a date are never included.
+        """
+        start, stop = _bound(start), _bound(stop)
+        dated = self.by_date[:self.dated]
+        lo = 0 if start is None else np.searchsorted(self.dates, start, side='left', sorter=dated)
+        hi = len(dated) if stop is None else np.searchsorted(self.dates, stop, side='left', sorter=dated)
+        return dated[lo:hi]
+
+    def _in_dates(self, rows, start, stop):
+        dates = self.dates[rows]
+        keep = ~np.isnat(dates)
+        if start is not None:
+            keep &= dates >= _bound(start)
+        if stop is not None:
+            keep &= dates < _bound(stop)
+        return rows[keep]
+
+    def covers(self, hotel=None, year=None, start=None, stop=None):
+        """False when the partition key rules out every row; always True without one."""
+        if self.partition is None:
+            return True
+        key_hotel, key_year = self.partition
+        if hotel and hotel != "All Hotels" and hotel != key_hotel:
+            return False
+        if year and year != "All Years" and int(year) != key_year:
+            return False
+        if start is not None or stop is not None:
+            # Rows without a year have no arrival date either
+            if key_year is None:
+                return False
+            if start is not None and _bound(start) >= np.datetime64(f'{key_year + 1}-01-01'):
+                return False
+            if stop is not None and _bound(stop) <= np.datetime64(f'{key_year}-01-01'):
+                return False
+        return True
+
+    def select(self, hotel=None, year=None, month=None, start=None, stop=None):
+        """Return the sorted row positions matching the filters, or None for all rows.
+
+        ``start`` and ``stop`` restrict ``arrival_date`` to ``[start, stop)``.
+        """
+        if self.partition is not None:
+            if not self.covers(hotel, year, start, stop):
+                return np.empty(0, dtype=np.int64)
+            # Every row has the partition's hotel and year
+            hotel = year = None
+        wanted = []
+        if hotel and hotel != "All Hotels":
+            wanted.append(('hotel', hotel))
+        if year and year != "All Years":
+            wanted.append(('year', int(year)))
+        if month and month != "All Months":
+            wanted.append(('month', month))
+        dated = start is not None or stop is not None
+        if not wanted and not dated:
+            return None
+
+        empty = np.empty(0, dtype=np.int64)
+        postings = []
+        for dim, value in wanted:
+            code = self.lookup[dim].get(value)
+            if code is None:
+                return empty
+            postings.append((dim, code, self.rows[dim][code]))
+        if dated:
+            postings.append(('date', None, self.date_span(start, stop)))
+
+        postings.sort(key=lambda posting: len(posting[2]))
+        dim, _, rows = postings[0]
+        if dim == 'date':
+            # Back to row order, which every other posting list is in
+            rows = np.sort(rows)
+        for dim, code, _ in postings[1:]:
+            if dim == 'date':
+                rows = self._in_dates(rows, start, stop)
+            else:
+                rows = rows[self.codes[dim][rows] == code]
+        return rows
+
+    def filter(self, hotel=None, year=None, month=None, start=None, stop=None):
+        """Return the rows of the indexed frame matching the filters."""
+        rows = self.select(hotel, year, month, start, stop)
+        if rows is None:
+            return self.frame
+        return self.frame.take(rows)
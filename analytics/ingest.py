@@ -0,0 +1,68 @@
+"""Incremental ingestion of new bookings into a running dashboard.
+
+Run ``python -m analytics.ingest new_bookings.csv [url] [batch_size]`` to post
+a CSV file to ``/api/bookings/append`` in batches (default url
+``http://localhost:5000``, 5000 rows per batch). The endpoint needs the
+app's admin token, read from ``DATASET_ADMIN_TOKEN``.
+"""
+import json
+import os
+import sys
+import urllib.request
+
+import pandas as pd
+
+from analytics.derive import DERIVED_COLUMNS, derive_columns
+from analytics.schema import _fits, apply_schema
+
+INGEST_BATCH_ROWS = 5000
+
+
+def prepare_batch(batch, like):
+    """Type and derive a raw ``batch`` of bookings to match the frame ``like``.
+
+    Raises ValueError when source columns are missing. Categoricals take the
+    existing categories when every value is already known, so the batch can
+    be concatenated with ``like`` without falling back to object columns.
+    """
+    columns = [column for column in like.columns if column not in DERIVED_COLUMNS]
+    missing = [column for column in columns if column not in batch.columns]
+    if missing:
+        raise ValueError(f"missing columns: {', '.join(missing)}")
+
+    batch = apply_schema(derive_columns(batch[columns].reset_index(drop=True)))
+    conformed = {}
+    for column in like.columns:
+        dtype = like[column].dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            values = batch[column].dropna().unique()
+            if pd.Index(values).isin(dtype.categories).all():
+                conformed[column] = pd.Categorical(batch[column], categories=dtype.categories)
+        elif batch[column].dtype != dtype and _fits(batch[column], dtype):
+            conformed[column] = batch[column].astype(dtype)
+    return batch.assign(**conformed)[list(like.columns)]
+
+
+def post_batches(path, url='http://localhost:5000', batch_rows=INGEST_BATCH_ROWS, token=None):
+    """Post the CSV file at ``path`` to a running app, one batch at a time.
+
+    ``token`` is the app's admin token, by default ``DATASET_ADMIN_TOKEN``.
+    """
+    token = token or os.environ.get('DATASET_ADMIN_TOKEN', '')
+    for chunk in pd.read_csv(path, chunksize=batch_rows):
+        request = urllib.request.Request(
+            url.rstrip('/') + '/api/bookings/append',
+            data=chunk.to_csv(index=False).encode('utf-8'),
+            headers={'Content-Type': 'text/csv', 'Authorization': f'Bearer {token}'},
+        )
+        with urllib.request.urlopen(request) as response:
+            yield json.load(response)
+
+
+def main(path, url='http://localhost:5000', batch_rows=INGEST_BATCH_ROWS):
+    for result in post_batches(path, url, int(batch_rows)):
+        print(f"appended {result['appended']} rows, {result['total_rows']} total (version {result['version']})")
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,93 @@
+"""Parallel aggregation of the columnar cache's partitions in worker processes.
+
+Workers memory-map the same cache files as the web process, so attaching to
+a partition copies nothing: every process reads the one copy in the page
+cache. Each job aggregates one (hotel, year) partition into mergeable
+partials, exact sums and counts, and the caller folds them together, so the
+result is identical to aggregating in-process. Only partials, never rows,
+cross the process boundary.
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from analytics.cube import partial_cells
+from analytics.filter_index import FilterIndex
+from analytics.query import partial_aggregates, query_columns
+from analytics.storage import read_partitioned
+
+# Below this many candidate rows, dispatching jobs costs more than it saves
+PARALLEL_MIN_ROWS = 500000
+# Cache versions a worker keeps mapped; a reload makes the oldest one stale
+KEEP_VERSIONS = 2
+
+# Per worker process: (directory, version) -> (frame, {(start, stop): FilterIndex})
+_attached = {}
+
+
+def _partition(directory, version, key, start, stop):
+    if (directory, version) not in _attached:
+        while len(_attached) >= KEEP_VERSIONS:
+            _attached.pop(next(iter(_attached)))
+        _attached[directory, version] = (read_partitioned(directory, version)[0], {})
+    frame, indexes = _attached[directory, version]
+    if (start, stop) not in indexes:
+        indexes[start, stop] = FilterIndex(frame.iloc[start:stop], key)
+    return indexes[start, stop]
+
+
+def _query_job(job):
+    directory, version, (key, start, stop), filters, group_by, measures = job
+    index = _partition(directory, version, key, start, stop)
+    rows = index.select(*filters)
+    frame = pd.DataFrame({column: index.frame[column] for column in query_columns(group_by, measures)}, copy=False)
+    return partial_aggregates(frame if rows is None else frame.take(rows), group_by, measures)
+
+
+def _cells_job(job):
+    directory, version, (key, start, stop) = job
+    return partial_cells(_partition(directory, version, key, start, stop).frame)
+
+
+def _ready():
+    return os.getpid()
+
+
+class AggregationPool:
+    """A persistent pool of worker processes that aggregate cache partitions.
+
+    All workers are started up front, before the web process starts any
+    threads, and stay up between requests, keeping their mappings and
+    partition indexes. Datasets only use the pool for selections of at
+    least ``min_rows`` rows.
+    """
+
+    def __init__(self, workers=None, min_rows=PARALLEL_MIN_ROWS):
+        self.workers = workers or os.cpu_count() or 1
+        self.min_rows = min_rows
+        # fork skips re-importing the app in every worker; spawn where it is unavailable
+        method = 'fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn'
+        self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context(method))
+        for future in [self._executor.submit(_ready) for _ in range(self.workers)]:
+            future.result()
+
+    def query(self, source, partitions, filters, group_by, measures):
+        """``partial_aggregates`` of the filtered rows of each partition, one job per partition.
+
+        ``source`` is the cache ``(directory, version)`` and ``partitions``
+        the ``(key, start, stop)`` ranges to aggregate.
+        """
+        directory, version = str(source[0]), source[1]
+        jobs = [(directory, version, partition, filters, list(group_by), list(measures))
+                for partition in partitions]
+        return list(self._executor.map(_query_job, jobs))
+
+    def cells(self, source, partitions):
+        """``partial_cells`` of each partition, one job per partition."""
+        directory, version = str(source[0]), source[1]
+        return list(self._executor.map(_cells_job, [(directory, version, partition) for partition in partitions]))
+
+    def shutdown(self):
+        self._executor.shutdown(cancel_futures=True)
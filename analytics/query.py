@@ -0,0 +1,263 @@
+"""Declarative group-by and pivot queries over the booking frame.
+
+A query names up to two dimensions to group by and a list of measures.
+Every measure is computed from bincounts over the combined group codes
+(sums exactly, see ``analytics.exact``), so a query costs one pass over the
+selected rows however many measures it asks for, and charts that group the
+same way can share it.
+
+Measures are ``count``, ``cancel_rate`` and ``<sum|mean>_<field>`` for the
+fields in ``MEASURE_FIELDS``, e.g. ``mean_adr`` or ``sum_revenue``.
+"""
+import numpy as np
+import pandas as pd
+
+from analytics.cube import MONTHS
+from analytics.exact import exact_sums, grouped_sum, to_float
+
+DIMENSIONS = [
+    'hotel', 'arrival_date_year', 'arrival_date_month', 'market_segment', 'distribution_channel',
+    'customer_type', 'country', 'deposit_type', 'meal', 'reserved_room_type', 'is_repeated_guest',
+]
+# Dimensions shown in calendar rather than sorted order
+DIMENSION_ORDER = {'arrival_date_month': MONTHS}
+MEASURE_FIELDS = {
+    'adr': 'adr',
+    'canceled': 'is_canceled',
+    'revenue': 'revenue',
+    'lead_time': 'lead_time',
+    'special_requests': 'total_of_special_requests',
+    'nights': 'total_nights',
+}
+AGGREGATES = ('sum', 'mean')
+MAX_GROUP_BY = 2
+DEFAULT_MEASURES = ['count']
+
+
+def _split(value):
+    if value is None:
+        return []
+    if isinstance(value, str):
+        value = value.split(',')
+    return [item.strip() for item in value if item.strip()]
+
+
+def _measure_column(measure):
+    """Source column of ``measure``, None for ``count``; ValueError if unknown."""
+    if measure == 'count':
+        return None
+    if measure == 'cancel_rate':
+        return 'is_canceled'
+    aggregate, _, field = measure.partition('_')
+    if aggregate in AGGREGATES and field in MEASURE_FIELDS:
+        return MEASURE_FIELDS[field]
+    raise ValueError(f'unknown measure: {measure}')
+
+
+def parse_query(group_by=None, measures=None, order_by=None, limit=None):
+    """Validate a query against the whitelists and return it as keyword arguments.
+
+    ``group_by`` and ``measures`` are lists or comma-separated strings.
+    ``order_by`` (a measure, optionally prefixed with ``-`` for descending)
+    and ``limit`` only apply to single-dimension queries.
+    """
+    group_by = _split(group_by)
+    measures = _split(measures) or list(DEFAULT_MEASURES)
+    if len(group_by) > MAX_GROUP_BY:
+        raise ValueError(f'group_by takes at most {MAX_GROUP_BY} dimensions')
+    for dimension in group_by:
+        if dimension not in DIMENSIONS:
+            raise ValueError(f'unknown dimension: {dimension}')
+    if len(set(group_by)) != len(group_by):
+        raise ValueError('group_by dimensions must differ')
+    for measure in measures:
+        _measure_column(measure)
+
+    if order_by or limit is not None:
+        if len(group_by) != 1:
+            raise ValueError('order_by and limit need exactly one group_by dimension')
+        if order_by and order_by.lstrip('-') not in measures:
+            raise ValueError('order_by must be one of the requested measures')
+        if limit is not None:
+            if not str(limit).isdigit() or int(limit) < 1:
+                raise ValueError('limit must be a positive integer')
+            limit = int(limit)
+    return {'group_by': group_by, 'measures': measures, 'order_by': order_by or None, 'limit': limit}
+
+
+def measure_columns(measures):
+    """Distinct source columns the ``measures`` aggregate, in order."""
+    columns = []
+    for measure in measures:
+        column = _measure_column(measure)
+        if column is not None and column not in columns:
+            columns.append(column)
+    return columns
+
+
+def partial_aggregates(frame, group_by, measures):
+    """Per-group counts, exact sums and non-null counts of one piece of the rows.
+
+    Returns a dict from group label tuples to ``{'count': n, column: [exact
+    sum, non-null count], ...}``. Partials of disjoint pieces add up with
+    ``merge_aggregates`` into the partials of their union.
+    """
+    columns = measure_columns(measures)
+    code = np.zeros(len(frame), dtype=np.int64)
+    uniques = []
+    for dimension in group_by:
+        codes, labels = pd.factorize(frame[dimension])
+        code = np.where((code >= 0) & (codes >= 0), code * len(labels) + codes, -1)
+        uniques.append(labels)
+    shape = [len(labels) for labels in uniques]
+    size = int(np.prod(shape))
+    valid = code >= 0
+
+    counts = np.bincount(code[valid], minlength=size)
+    sums = {column: exact_sums(frame[column], code, size) for column in columns}
+    non_null = {column: np.bincount(code[valid & frame[column].notna().to_numpy()], minlength=size)
+                for column in columns}
+    partials = {}
+    for group in np.flatnonzero(counts):
+        label = tuple(labels[i] for labels, i in zip(uniques, np.unravel_index(group, shape)))
+        partials[label] = {'count': int(counts[group]),
+                           **{column: [sums[column][group], int(non_null[column][group])] for column in columns}}
+    return partials
+
+
+def merge_aggregates(totals, partials):
+    """Add ``partials`` into ``totals`` (both from ``partial_aggregates``) in place."""
+    for label, partial in partials.items():
+        entry = totals.get(label)
+        if entry is None:
+            totals[label] = {name: list(value) if isinstance(value, list) else value
+                             for name, value in partial.items()}
+            continue
+        for name, value in partial.items():
+            if name == 'count':
+                entry['count'] += value
+            else:
+                entry[name][0] += value[0]
+                entry[name][1] += value[1]
+    return totals
+
+
+def aggregated_frame(totals, group_by, measures):
+    """Turn merged partials into the ``aggregated`` input of ``run_query``."""
+    frame = {dimension: [label[i] for label in totals] for i, dimension in enumerate(group_by)}
+    frame['count'] = [entry['count'] for entry in totals.values()]
+    for column in measure_columns(measures):
+        frame[f'sum:{column}'] = [to_float(entry[column][0]) for entry in totals.values()]
+        frame[f'n:{column}'] = [entry[column][1] for entry in totals.values()]
+    return pd.DataFrame(frame)
+
+
+def aggregate_pieces(frames, group_by, measures):
+    """Fold several frames of rows into the ``aggregated`` input of ``run_query``.
+
+    Each frame is grouped on its own and its partial aggregates added to
+    running totals, so the frames are never concatenated and can be
+    produced one at a time.
+    """
+    totals = {}
+    for frame in frames:
+        merge_aggregates(totals, partial_aggregates(frame, group_by, measures))
+    return aggregated_frame(totals, group_by, measures)
+
+
+def query_columns(group_by, measures, **options):
+    """Columns a parsed query reads, for projecting before filtering."""
+    columns = list(group_by)
+    columns += [column for column in measure_columns(measures) if column not in columns]
+    # Queries without any column still need the rows counted
+    return columns or ['hotel']
+
+
+def _codes(values, dimension):
+    codes, labels = pd.factorize(values, sort=True)
+    order = DIMENSION_ORDER.get(dimension)
+    if order is not None:
+        labels = list(labels)
+        ranked = sorted(range(len(labels)), key=lambda i: order.index(labels[i]) if labels[i] in order else len(order))
+        remap = np.empty(len(labels), dtype=np.int64)
+        remap[ranked] = np.arange(len(labels))
+        codes = np.where(codes >= 0, remap[np.maximum(codes, 0)], -1)
+        labels = [labels[i] for i in ranked]
+    return codes, pd.Index(labels)
+
+
+def run_query(frame, group_by, measures, order_by=None, limit=None, aggregated=False):
+    """Evaluate a parsed query over ``frame`` in one vectorised pass.
+
+    With no dimension the measures are scalars; with one they are lists
+    aligned with ``groups``; with two they are ``rows`` x ``columns``
+    matrices. Only groups with at least one booking are returned, and means
+    of empty pivot cells are NaN.
+
+    With ``aggregated`` the frame holds partial aggregates instead of
+    bookings: the group-by columns plus ``count`` and, per measured column,
+    ``sum:<column>`` and ``n:<column>`` (its non-null count). Backends that
+    group in the database use this to share the reshaping done here.
+    """
+    shape = []
+    labels = []
+    code = np.zeros(len(frame), dtype=np.int64)
+    valid = np.ones(len(frame), dtype=bool)
+    for dimension in group_by:
+        codes, uniques = _codes(frame[dimension], dimension)
+        valid &= codes >= 0
+        code = code * len(uniques) + codes
+        shape.append(len(uniques))
+        labels.append(uniques)
+    code = code[valid]
+    size = int(np.prod(shape))
+
+    def total(column):
+        weights = frame[column].to_numpy(dtype=np.float64)[valid]
+        return np.bincount(code, weights=weights, minlength=size)
+
+    counts = total('count').astype(np.int64) if aggregated else np.bincount(code, minlength=size)
+    results = {}
+    for measure in measures:
+        column = _measure_column(measure)
+        if column is None:
+            results[measure] = counts
+            continue
+        if aggregated:
+            sums = total(f'sum:{column}')
+        else:
+            values = frame[column].to_numpy(dtype=np.float64)[valid]
+            present = ~np.isnan(values)
+            sums = grouped_sum(values, code, size)
+        if measure.startswith('sum_'):
+            results[measure] = sums
+            continue
+        non_null = total(f'n:{column}') if aggregated else np.bincount(code[present], minlength=size)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            results[measure] = sums / non_null
+
+    response = {'dimensions': group_by}
+    if not group_by:
+        response['measures'] = {name: values[0] for name, values in results.items()}
+        return response
+
+    if len(group_by) == 1:
+        keep = np.flatnonzero(counts)
+        if order_by:
+            key = results[order_by.lstrip('-')][keep]
+            keep = keep[np.argsort(-key if order_by.startswith('-') else key, kind='stable')]
+        if limit is not None:
+            keep = keep[:limit]
+        response['groups'] = labels[0][keep]
+        response['measures'] = {name: values[keep] for name, values in results.items()}
+        return response
+
+    grid = counts.reshape(shape)
+    rows = np.flatnonzero(grid.sum(axis=1))
+    columns = np.flatnonzero(grid.sum(axis=0))
+    response['rows'] = labels[0][rows]
+    response['columns'] = labels[1][columns]
+    response['measures'] = {
+        name: values.reshape(shape)[np.ix_(rows, columns)] for name, values in results.items()
+    }
+    return response
@@ -0,0 +1,95 @@
+"""Compact dtypes for the booking frame.
+
+Run ``python -m analytics.schema [path/to/hotel_booking_cleaned.csv]`` to print
+the bytes used by every column before and after the schema is applied.
+"""
+import sys
+
+import numpy as np
+import pandas as pd
+
+from analytics.derive import derive_columns
+
+CATEGORY_COLUMNS = [
+    'hotel', 'arrival_date_month', 'meal', 'country', 'market_segment',
+    'distribution_channel', 'reserved_room_type', 'assigned_room_type',
+    'deposit_type', 'customer_type', 'reservation_status', 'reservation_status_date',
+]
+
+# Target dtype per numeric column. adr and revenue stay float64: they are
+# summed into revenue totals, where float32 would lose whole dollars.
+NUMERIC_DTYPES = {
+    'is_canceled': 'int8',
+    'is_repeated_guest': 'int8',
+    'lead_time': 'int16',
+    'arrival_date_year': 'int16',
+    'arrival_date_week_number': 'int8',
+    'arrival_date_day_of_month': 'int8',
+    'arrival_month': 'int8',
+    'stays_in_weekend_nights': 'int8',
+    'stays_in_week_nights': 'int8',
+    'total_nights': 'int16',
+    'adults': 'int8',
+    'children': 'float32',
+    'babies': 'int8',
+    'previous_cancellations': 'int8',
+    'previous_bookings_not_canceled': 'int8',
+    'booking_changes': 'int8',
+    'agent': 'float32',
+    'company': 'float32',
+    'days_in_waiting_list': 'int16',
+    'required_car_parking_spaces': 'int8',
+    'total_of_special_requests': 'int8',
+}
+
+
+def _fits(series, dtype):
+    dtype = np.dtype(dtype)
+    if dtype.kind == 'f':
+        return True
+    if series.isna().any() or not pd.api.types.is_integer_dtype(series.dtype):
+        return False
+    if series.empty:
+        return True
+    info = np.iinfo(dtype)
+    return info.min <= series.min() and series.max() <= info.max
+
+
+def apply_schema(df):
+    """Return ``df`` with low-cardinality strings as categoricals and narrowed numbers.
+
+    A numeric column is only narrowed when every value fits the target type;
+    otherwise it keeps its current dtype rather than silently wrapping.
+    """
+    converted = {}
+    for column in CATEGORY_COLUMNS:
+        if column in df.columns and not isinstance(df[column].dtype, pd.CategoricalDtype):
+            categories = pd.Index(df[column].dropna().unique()).sort_values()
+            converted[column] = pd.Categorical(df[column], categories=categories)
+    for column, dtype in NUMERIC_DTYPES.items():
+        if column in df.columns and df[column].dtype != dtype and _fits(df[column], dtype):
+            converted[column] = df[column].astype(dtype)
+    return df.assign(**converted)
+
+
+def memory_report(before, after):
+    """Bytes per column before and after, with the resulting dtypes."""
+    report = pd.DataFrame({
+        'dtype_before': before.dtypes.astype(str),
+        'bytes_before': before.memory_usage(index=False, deep=True),
+        'dtype_after': after.dtypes.astype(str),
+        'bytes_after': after.memory_usage(index=False, deep=True),
+    })
+    report.loc['TOTAL'] = ['', report['bytes_before'].sum(), '', report['bytes_after'].sum()]
+    report['ratio'] = (report['bytes_before'] / report['bytes_after']).round(1)
+    return report
+
+
+def main(path='hotel_booking_cleaned.csv'):
+    before = derive_columns(pd.read_csv(path))
+    after = apply_schema(before)
+    print(memory_report(before, after).to_string())
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
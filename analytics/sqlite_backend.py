@@ -0,0 +1,423 @@
+"""Booking dataset served from an indexed SQLite file instead of memory.
+
+The CSV is converted chunk by chunk into a typed ``bookings`` table with
+composite indexes on the filter columns, so neither the conversion nor the
+queries hold the whole dataset in memory. Filters and aggregations run in
+SQL, and only grouped results (or, for exports, one chunk of rows at a time)
+come back into pandas.
+
+Build or refresh the database ahead of starting workers with
+``python -m analytics.sqlite_backend [path/to/hotel_booking_cleaned.csv]``.
+"""
+import json
+import os
+import sqlite3
+import sys
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from analytics.binning import (ADR_MAX, DEFAULT_BINS, LEAD_TIME_MAX, clamp_bins, density_payload)
+from analytics.cube import MONTHS, CubeCell
+from analytics.dataset import DatasetManager
+from analytics.derive import DERIVED_COLUMNS, derive_columns
+from analytics.exact import from_float
+from analytics.filter_index import FilterIndex
+from analytics.query import measure_columns, run_query
+from analytics.schema import NUMERIC_DTYPES
+from analytics.stages import stage
+from analytics.storage import _build_lock, _cached_source, _is_current, _publish, file_fingerprint
+
+# Bump whenever the table layout, indexes or derived columns change
+SQLITE_FORMAT = 2
+BUILD_CHUNK_ROWS = 100000
+SELECT_CHUNK_ROWS = 5000
+
+INDEXES = {
+    'bookings_hotel_year_month': ('hotel', 'arrival_date_year', 'arrival_date_month'),
+    'bookings_year_month': ('arrival_date_year', 'arrival_date_month'),
+    # Month-only filters cannot use either composite index
+    'bookings_month': ('arrival_date_month',),
+    # Date ranges become one index range scan
+    'bookings_arrival_date': ('arrival_date',),
+}
+
+
+def default_sqlite_dir(path):
+    path = Path(path)
+    return path.with_name(path.stem + '.sqlite')
+
+
+def _sql_type(column, dtype):
+    dtype = np.dtype(NUMERIC_DTYPES.get(column, dtype if pd.api.types.is_numeric_dtype(dtype) else object))
+    if dtype.kind in 'biu':
+        return 'INTEGER'
+    if dtype.kind == 'f':
+        return 'REAL'
+    return 'TEXT'
+
+
+def _records(frame):
+    if 'arrival_date' in frame.columns:
+        frame = frame.assign(arrival_date=frame['arrival_date'].dt.strftime('%Y-%m-%d'))
+    # NaN/NaT become NULL and NumPy scalars plain Python values
+    return frame.astype(object).where(frame.notna(), None).itertuples(index=False, name=None)
+
+
+def _insert(conn, frame):
+    columns = ', '.join(frame.columns)
+    placeholders = ', '.join('?' * len(frame.columns))
+    conn.executemany(f'INSERT INTO bookings ({columns}) VALUES ({placeholders})', _records(frame))
+
+
+def _create_table(conn, frame):
+    columns = ', '.join(f'{name} {_sql_type(name, frame[name].dtype)}' for name in frame.columns)
+    conn.execute(f'CREATE TABLE bookings ({columns})')
+
+
+def write_sqlite(path, db_path, source, chunk_rows=BUILD_CHUNK_ROWS):
+    """Convert the booking CSV at ``path`` into an indexed SQLite file at ``db_path``.
+
+    Columns are declared INTEGER, REAL or TEXT following the schema's target
+    dtypes, derived columns are stored alongside the source ones, and
+    ``arrival_date`` is kept as ISO ``YYYY-MM-DD`` text. Indexes are created
+    after loading, then ``ANALYZE`` gives the planner row estimates.
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        # The file is only published once complete, so skip the journal
+        conn.execute('PRAGMA journal_mode = OFF')
+        conn.execute('PRAGMA synchronous = OFF')
+        rows = 0
+        for chunk in pd.read_csv(path, chunksize=chunk_rows):
+            chunk = derive_columns(chunk)
+            if not rows:
+                _create_table(conn, chunk)
+            _insert(conn, chunk)
+            rows += len(chunk)
+        if not rows:
+            _create_table(conn, derive_columns(pd.read_csv(path, nrows=0)))
+
+        for name, columns in INDEXES.items():
+            conn.execute(f"CREATE INDEX {name} ON bookings ({', '.join(columns)})")
+        conn.execute('ANALYZE')
+        conn.execute('CREATE TABLE dataset_meta (key TEXT PRIMARY KEY, value TEXT)')
+        conn.executemany('INSERT INTO dataset_meta VALUES (?, ?)', [
+            ('format', str(SQLITE_FORMAT)), ('source', json.dumps(source)),
+            ('rows', str(rows)), ('appended', '0'),
+        ])
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def ensure_sqlite(path, directory=None):
+    """Make sure the SQLite database for ``path`` is up to date and return its directory.
+
+    Keyed and locked exactly like the columnar cache (see ``ensure_cache``):
+    each content version is built under a temporary name, renamed into place
+    and published through ``current.json``, so workers that still have the
+    previous file open keep reading it undisturbed.
+    """
+    directory = Path(directory or default_sqlite_dir(path))
+    if _is_current(_cached_source(directory, SQLITE_FORMAT), file_fingerprint(path, digest=False)):
+        return directory
+
+    with _build_lock(directory):
+        cached = _cached_source(directory, SQLITE_FORMAT)
+        if _is_current(cached, file_fingerprint(path, digest=False)):
+            return directory
+
+        fingerprint = file_fingerprint(path)
+        current = {'format': SQLITE_FORMAT, 'version': f"{fingerprint['sha256'][:16]}-sqlite{SQLITE_FORMAT}",
+                   'source': fingerprint}
+        if not (cached and cached['sha256'] == fingerprint['sha256']):
+            staging = directory / f".{current['version']}.{os.getpid()}.db"
+            staging.unlink(missing_ok=True)
+            write_sqlite(path, staging, fingerprint)
+            os.replace(staging, directory / f"{current['version']}.db")
+        _publish(directory, current)
+
+        # Open connections keep reading unlinked files
+        for stale in directory.iterdir():
+            if not stale.name.startswith(('.', current['version'])) and stale.suffix != '.json':
+                stale.unlink(missing_ok=True)
+    return directory
+
+
+def _filters(hotel=None, year=None, month=None, start=None, stop=None):
+    # Same "All ..." conventions as FilterIndex.select
+    clauses, params = [], []
+    if hotel and hotel != "All Hotels":
+        clauses.append('hotel = ?')
+        params.append(hotel)
+    if year and year != "All Years":
+        clauses.append('arrival_date_year = ?')
+        params.append(int(year))
+    if month and month != "All Months":
+        clauses.append('arrival_date_month = ?')
+        params.append(month)
+    # ISO date strings compare in date order
+    if start is not None:
+        clauses.append('arrival_date >= ?')
+        params.append(pd.Timestamp(start).strftime('%Y-%m-%d'))
+    if stop is not None:
+        clauses.append('arrival_date < ?')
+        params.append(pd.Timestamp(stop).strftime('%Y-%m-%d'))
+    return clauses, params
+
+
+def _where(clauses):
+    return ' WHERE ' + ' AND '.join(clauses) if clauses else ''
+
+
+class SQLiteCube:
+    """``BookingCube`` lookalike that aggregates the requested cell in SQL.
+
+    Every lookup is one indexed query, so nothing is materialised up front
+    and appended rows are visible immediately. ``start`` and ``stop`` limit
+    every lookup to an arrival date range.
+    """
+
+    def __init__(self, dataset, start=None, stop=None):
+        self.dataset = dataset
+        self.dates = (start, stop)
+
+    def cell(self, hotel=None, year=None, month=None):
+        clauses, params = _filters(hotel, year, month, *self.dates)
+        conn = self.dataset.connection()
+        with stage('filter'):
+            totals = conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(is_canceled = 1), 0), COALESCE(SUM(is_canceled = 0), 0),'
+                ' TOTAL(adr), COUNT(adr), COALESCE(SUM(total_nights), 0), COUNT(total_nights), TOTAL(revenue)'
+                f' FROM bookings{_where(clauses)}', params
+            ).fetchone()
+            countries = conn.execute(
+                f"SELECT country, COUNT(*) AS n FROM bookings{_where(clauses + ['country IS NOT NULL'])}"
+                ' GROUP BY country ORDER BY n DESC, country', params
+            ).fetchall()
+
+        cell = object.__new__(CubeCell)
+        for name, value in zip(CubeCell.__slots__[:-1], totals):
+            setattr(cell, name, value)
+        cell.adr_total = from_float(cell.adr_total)
+        cell.revenue_total = from_float(cell.revenue_total)
+        cell.country_counts = pd.Series(dict(countries), dtype='int64')
+        return cell
+
+    def hotel_counts(self, hotel=None, year=None, month=None):
+        """Bookings per hotel, largest first."""
+        clauses, params = _filters(hotel, year, month, *self.dates)
+        with stage('filter'):
+            rows = self.dataset.connection().execute(
+                f'SELECT hotel, COUNT(*) AS n FROM bookings{_where(clauses)} GROUP BY hotel ORDER BY n DESC, hotel',
+                params,
+            ).fetchall()
+        return pd.Series(dict(rows), dtype='int64')
+
+    def revenue_by_month(self, hotel=None, year=None):
+        """Revenue for each calendar month, zero where nothing was booked."""
+        clauses, params = _filters(hotel, year, None, *self.dates)
+        with stage('filter'):
+            rows = self.dataset.connection().execute(
+                f'SELECT arrival_date_month, TOTAL(revenue) FROM bookings{_where(clauses)} GROUP BY arrival_date_month',
+                params,
+            ).fetchall()
+        return pd.Series(dict(rows), dtype='float64').reindex(MONTHS, fill_value=0.0)
+
+
+class SQLiteDataset:
+    """The booking data in an SQLite file, with the ``Dataset`` interface.
+
+    Each thread reads through its own read-only connection. Rows appended
+    with ``insert`` are written to the same file, and ``version`` reflects
+    them in every process serving it.
+    """
+
+    def __init__(self, db_path, version):
+        self.db_path = Path(db_path)
+        self.base_version = version
+        self.cube = SQLiteCube(self)
+        self._local = threading.local()
+        self.columns = [row[1] for row in self.connection().execute('PRAGMA table_info(bookings)')]
+
+    def connection(self):
+        conn = getattr(self._local, 'connection', None)
+        if conn is None:
+            conn = sqlite3.connect(f'{self.db_path.resolve().as_uri()}?mode=ro', uri=True)
+            self._local.connection = conn
+        return conn
+
+    def _meta(self, key):
+        return int(self.connection().execute('SELECT value FROM dataset_meta WHERE key = ?', (key,)).fetchone()[0])
+
+    @property
+    def appended(self):
+        return self._meta('appended')
+
+    @property
+    def version(self):
+        appended = self.appended
+        return f'{self.base_version}+{appended}' if appended else self.base_version
+
+    def __len__(self):
+        return self._meta('rows')
+
+    def _read(self, sql, params=(), columns=()):
+        dates = ['arrival_date'] if 'arrival_date' in columns else None
+        with stage('filter'):
+            return pd.read_sql_query(sql, self.connection(), params=params, parse_dates=dates)
+
+    def cube_for(self, start=None, stop=None):
+        """The SQL cube, limited to bookings arriving in ``[start, stop)`` if given."""
+        if start is None and stop is None:
+            return self.cube
+        return SQLiteCube(self, start, stop)
+
+    def select(self, hotel=None, year=None, month=None, start=None, stop=None, chunk_rows=SELECT_CHUNK_ROWS):
+        """Matching rows as a lazy stream of ``(frame, None)`` chunks, in file order.
+
+        At least one (possibly empty) frame is produced, so callers always
+        see the columns. The stream reads on its own connection and holds
+        one chunk in memory at a time.
+        """
+        clauses, params = _filters(hotel, year, month, start, stop)
+        conn = sqlite3.connect(f'{self.db_path.resolve().as_uri()}?mode=ro', uri=True)
+        try:
+            with stage('filter'):
+                cursor = conn.execute(f'SELECT * FROM bookings{_where(clauses)} ORDER BY rowid', params)
+            while True:
+                with stage('filter'):
+                    rows = cursor.fetchmany(chunk_rows)
+                yield pd.DataFrame.from_records(rows, columns=self.columns), None
+                if len(rows) < chunk_rows:
+                    break
+        finally:
+            conn.close()
+
+    def filter(self, hotel=None, year=None, month=None, start=None, stop=None, columns=None):
+        """Matching rows as one frame, optionally restricted to ``columns``."""
+        columns = list(columns) if columns is not None else self.columns
+        clauses, params = _filters(hotel, year, month, start, stop)
+        return self._read(f"SELECT {', '.join(columns)} FROM bookings{_where(clauses)}", params, columns)
+
+    def query(self, hotel=None, year=None, month=None, start=None, stop=None,
+              group_by=(), measures=('count',), order_by=None, limit=None):
+        """Run a parsed group-by query (see ``parse_query``) as one SQL GROUP BY.
+
+        Dimensions and measure columns come from ``parse_query``'s whitelists,
+        so they are safe to splice into the statement.
+        """
+        clauses, params = _filters(hotel, year, month, start, stop)
+        select = list(group_by) + ['COUNT(*) AS "count"']
+        for column in measure_columns(measures):
+            select += [f'TOTAL({column}) AS "sum:{column}"', f'COUNT({column}) AS "n:{column}"']
+        sql = f"SELECT {', '.join(select)} FROM bookings{_where(clauses)}"
+        if group_by:
+            sql += f" GROUP BY {', '.join(group_by)}"
+        return run_query(self._read(sql, params), group_by, measures, order_by, limit, aggregated=True)
+
+    def density(self, hotel=None, year=None, month=None, start=None, stop=None,
+                lead_bins=DEFAULT_BINS[0], adr_bins=DEFAULT_BINS[1], split_by_hotel=False):
+        """Lead time x ADR density grid, binned and counted in SQL."""
+        lead_bins, adr_bins = clamp_bins(lead_bins, adr_bins)
+        clauses, params = _filters(hotel, year, month, start, stop)
+        conn = self.connection()
+        if split_by_hotel:
+            with stage('filter'):
+                names = [row[0] for row in conn.execute(
+                    f"SELECT DISTINCT hotel FROM bookings{_where(clauses + ['hotel IS NOT NULL'])} ORDER BY hotel", params
+                )]
+        else:
+            names = ['All Hotels']
+
+        # Same truncating arithmetic as binning._bin, on the same population
+        cell = (f'MIN(MAX(CAST(lead_time * ? AS INTEGER), 0), {lead_bins - 1}) * {adr_bins}'
+                f' + MIN(MAX(CAST(adr * ? AS INTEGER), 0), {adr_bins - 1})')
+        population = ['adr > 0', 'lead_time > 0']
+        if split_by_hotel:
+            # Bookings without a hotel belong to no series
+            population.append('hotel IS NOT NULL')
+        with stage('filter'):
+            rows = conn.execute(
+                f"SELECT {'hotel' if split_by_hotel else 'NULL'}, {cell} AS cell, COUNT(*), TOTAL(is_canceled)"
+                f" FROM bookings{_where(clauses + population)} GROUP BY 1, 2",
+                [lead_bins / LEAD_TIME_MAX, adr_bins / ADR_MAX] + params,
+            ).fetchall()
+
+        size = lead_bins * adr_bins * len(names)
+        counts = np.zeros(size, dtype=np.int64)
+        cancels = np.zeros(size)
+        if rows:
+            offsets = {name: i * lead_bins * adr_bins for i, name in enumerate(names)}
+            hotels, cells, n, canceled = zip(*rows)
+            positions = np.array([offsets.get(hotel, 0) for hotel in hotels]) + np.array(cells)
+            counts[positions] = n
+            cancels[positions] = canceled
+        return density_payload(names, counts, cancels, lead_bins, adr_bins)
+
+    def values(self, dim):
+        """Sorted distinct values of a filter dimension (hotel, year or month)."""
+        column = FilterIndex.COLUMNS[dim]
+        sql = f'SELECT DISTINCT {column} FROM bookings WHERE {column} IS NOT NULL ORDER BY {column}'
+        return [row[0] for row in self.connection().execute(sql)]
+
+    def insert(self, batch):
+        """Derive and insert a raw ``batch`` of bookings in one transaction.
+
+        Raises ValueError when source columns are missing.
+        """
+        columns = [column for column in self.columns if column not in DERIVED_COLUMNS]
+        missing = [column for column in columns if column not in batch.columns]
+        if missing:
+            raise ValueError(f"missing columns: {', '.join(missing)}")
+        batch = derive_columns(batch[columns].reset_index(drop=True))
+
+        conn = sqlite3.connect(self.db_path)
+        try:
+            with conn:
+                _insert(conn, batch)
+                conn.execute("UPDATE dataset_meta SET value = CAST(value AS INTEGER) + ? WHERE key IN ('rows', 'appended')",
+                             (len(batch),))
+        finally:
+            conn.close()
+        return len(batch)
+
+
+def current_database(directory):
+    """Path and version of the SQLite file currently published in ``directory``."""
+    current = json.loads((Path(directory) / 'current.json').read_text())
+    return Path(directory) / f"{current['version']}.db", current['version']
+
+
+class SQLiteDatasetManager(DatasetManager):
+    """``DatasetManager`` serving an ``SQLiteDataset``, for data larger than RAM.
+
+    Reloads and watching work as for the in-memory backend: a changed source
+    file is converted into a new database in the background and swapped in.
+    Appends go straight into the current database file, so they are shared by
+    every worker and survive restarts until the source file itself changes.
+    """
+
+    def _load(self):
+        return SQLiteDataset(*current_database(ensure_sqlite(self.path, self.cache_dir)))
+
+    def append(self, batch):
+        with self._append_lock:
+            dataset = self.current
+            dataset.insert(batch)
+            # The snapshot object is unchanged; publishing notifies the listeners
+            self._publish(dataset)
+            return dataset
+
+
+def main(path='hotel_booking_cleaned.csv'):
+    directory = ensure_sqlite(path)
+    db_path, version = current_database(directory)
+    print(f'{path}: SQLite database {version} at {db_path}')
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,23 @@
+"""Stage timing hook for the dataset backends.
+
+The backends run their row filtering (index lookups, chunk masks, SQL
+execution) inside ``stage('filter')``, so a host app can split a call's time
+into filtering and aggregation. Without a timer installed with
+``set_stage_timer`` the blocks cost nothing. The timer is any callable that
+takes a stage name and returns a context manager, such as
+``RequestMetrics.stage``.
+"""
+from contextlib import nullcontext
+
+_timer = None
+
+
+def set_stage_timer(timer):
+    """Time the backends' stages with ``timer(name)``; None switches timing off."""
+    global _timer
+    _timer = timer
+
+
+def stage(name):
+    """Context manager timing the block as stage ``name``."""
+    return nullcontext() if _timer is None else _timer(name)
@@ -0,0 +1,250 @@
+"""Typed columnar cache of the booking CSV.
+
+Build or refresh the cache ahead of starting workers with
+``python -m analytics.storage [path/to/hotel_booking_cleaned.csv]``.
+"""
+import hashlib
+import json
+import os
+import shutil
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from analytics.derive import derive_columns
+from analytics.schema import apply_schema
+
+try:
+    import fcntl
+except ImportError:  # Windows: concurrent builds stay safe, they are just duplicated
+    fcntl = None
+
+# Bump whenever the on-disk layout or the derived columns change
+CACHE_FORMAT = 3
+
+# Rows are stored clustered into one partition per value of these columns
+PARTITION_COLUMNS = ['hotel', 'arrival_date_year']
+
+
+def file_fingerprint(path, digest=True):
+    """Size, mtime and (optionally) SHA-256 of a source file."""
+    stat = os.stat(path)
+    fingerprint = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    if digest:
+        sha = hashlib.sha256()
+        with open(path, 'rb') as fh:
+            for block in iter(lambda: fh.read(1 << 20), b''):
+                sha.update(block)
+        fingerprint['sha256'] = sha.hexdigest()
+    return fingerprint
+
+
+def default_cache_dir(path):
+    path = Path(path)
+    return path.with_name(path.stem + '.columns')
+
+
+def _publish(directory, current):
+    pointer = directory / f'.current.{os.getpid()}'
+    pointer.write_text(json.dumps(current))
+    os.replace(pointer, directory / 'current.json')
+
+
+def _json_value(value):
+    if pd.isna(value):
+        return None
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def partition_rows(df):
+    """Cluster ``df`` into its (hotel, arrival year) partitions.
+
+    Returns the reordered frame and one ``[hotel, year, start, stop]`` entry
+    per partition, giving its row range. Partitions come in order of first
+    appearance and rows keep their order inside each, so a file that is
+    already sorted by hotel and date is left as it is.
+    """
+    groups = df.groupby(PARTITION_COLUMNS, sort=False, dropna=False, observed=True)
+    codes = groups.ngroup().to_numpy()
+    order = np.argsort(codes, kind='stable')
+    bounds = np.searchsorted(codes[order], np.arange(groups.ngroups + 1))
+    keys = df[PARTITION_COLUMNS].take(order[bounds[:-1]]).itertuples(index=False, name=None)
+    partitions = [[*map(_json_value, key), int(start), int(stop)]
+                  for key, start, stop in zip(keys, bounds[:-1], bounds[1:])]
+    return df.take(order).reset_index(drop=True), partitions
+
+
+def write_columnar(df, directory, source):
+    """Write ``df`` as one ``.npy`` file per column plus a JSON manifest.
+
+    Rows are clustered by ``partition_rows`` first and the manifest lists the
+    partitions, so each one can be mapped as a contiguous slice of the
+    columns. Numeric and datetime columns are stored as raw arrays and
+    categoricals as their codes, so all of them can be memory-mapped; any
+    other column is dictionary encoded into integer codes and decoded back
+    on load. The version directory is published by atomically replacing
+    ``current.json``.
+    """
+    directory = Path(directory)
+    version = f"{source['sha256'][:16]}-{CACHE_FORMAT}"
+    target = directory / version
+    if (target / 'manifest.json').exists():
+        # Another process already built this exact version
+        _publish(directory, {'format': CACHE_FORMAT, 'version': version, 'source': source})
+        return json.loads((target / 'manifest.json').read_text())
+
+    staging = directory / f'.{version}.{os.getpid()}'
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+
+    df, partitions = partition_rows(df)
+    columns = []
+    for position, name in enumerate(df.columns):
+        series = df[name]
+        entry = {'name': name, 'file': f'{position:03d}.npy'}
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            entry.update(kind='categorical', categories=series.cat.categories.tolist())
+            values = series.cat.codes.to_numpy()
+        elif pd.api.types.is_datetime64_dtype(series.dtype):
+            entry.update(kind='datetime', dtype=str(series.dtype))
+            values = series.to_numpy().view(np.int64)
+        elif pd.api.types.is_numeric_dtype(series.dtype) or pd.api.types.is_bool_dtype(series.dtype):
+            entry.update(kind='array', dtype=str(series.dtype))
+            values = series.to_numpy()
+        else:
+            codes, categories = pd.factorize(series, sort=True)
+            entry.update(kind='dictionary', categories=categories.tolist())
+            values = codes.astype(np.min_scalar_type(-max(len(categories), 1)))
+        np.save(staging / entry['file'], values, allow_pickle=False)
+        columns.append(entry)
+
+    manifest = {'format': CACHE_FORMAT, 'source': source, 'rows': len(df), 'columns': columns,
+                'partitions': partitions}
+    (staging / 'manifest.json').write_text(json.dumps(manifest))
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(staging, target)
+    _publish(directory, {'format': CACHE_FORMAT, 'version': version, 'source': source})
+
+    # Files still mapped by running workers stay valid after unlinking
+    for stale in directory.iterdir():
+        if stale.is_dir() and stale.name != version and not stale.name.startswith('.'):
+            shutil.rmtree(stale, ignore_errors=True)
+    return manifest
+
+
+def read_columnar(directory):
+    """Memory-map a columnar cache written by ``write_columnar``."""
+    return read_partitioned(directory)[0]
+
+
+def read_partitioned(directory, version=None):
+    """Memory-map a columnar cache and return it with its partition list.
+
+    Partitions are ``((hotel, year), start, stop)`` row ranges of the frame,
+    as listed in the manifest. ``version`` maps that published version
+    rather than the current one.
+    """
+    directory = Path(directory)
+    version = version or json.loads((directory / 'current.json').read_text())['version']
+    version_dir = directory / version
+    manifest = json.loads((version_dir / 'manifest.json').read_text())
+    mmap_mode = 'r' if manifest['rows'] else None
+
+    arrays = {}
+    for entry in manifest['columns']:
+        # Plain ndarray views over the mapping, so np.memmap never leaks into results
+        values = np.load(version_dir / entry['file'], mmap_mode=mmap_mode, allow_pickle=False).view(np.ndarray)
+        if entry['kind'] == 'datetime':
+            values = values.view(entry['dtype'])
+        elif entry['kind'] == 'categorical':
+            values = pd.Categorical.from_codes(values, categories=entry['categories'])
+        elif entry['kind'] == 'dictionary':
+            categories = np.asarray(entry['categories'], dtype=object)
+            values = pd.Categorical.from_codes(values, categories=categories).astype(object)
+        arrays[entry['name']] = values
+    # copy=False keeps every column as its own block backed by the mapped file
+    partitions = [((hotel, year), start, stop) for hotel, year, start, stop in manifest['partitions']]
+    return pd.DataFrame(arrays, copy=False), partitions
+
+
+def _cached_source(directory, fmt=CACHE_FORMAT):
+    try:
+        current = json.loads((Path(directory) / 'current.json').read_text())
+    except (OSError, ValueError):
+        return None
+    if current.get('format') != fmt:
+        return None
+    return current['source']
+
+
+def cache_version(path, cache_dir=None):
+    """Version stamp of the columnar cache currently published for ``path``."""
+    cache_dir = Path(cache_dir or default_cache_dir(path))
+    return json.loads((cache_dir / 'current.json').read_text())['version']
+
+
+@contextmanager
+def _build_lock(directory):
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory / '.lock', 'w') as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _is_current(cached, fingerprint):
+    return bool(cached) and cached['size'] == fingerprint['size'] and cached['mtime_ns'] == fingerprint['mtime_ns']
+
+
+def ensure_cache(path, cache_dir=None):
+    """Make sure the columnar cache for ``path`` is up to date and return its directory.
+
+    The cache is keyed on the source file's size, mtime and SHA-256. A matching
+    size and mtime is trusted without hashing; otherwise the file is hashed and
+    only re-parsed when its content actually changed. Builds are serialised
+    with a file lock, so when several workers start against a stale cache one
+    of them parses the CSV and the others wait and map its result.
+    """
+    cache_dir = Path(cache_dir or default_cache_dir(path))
+    if _is_current(_cached_source(cache_dir), file_fingerprint(path, digest=False)):
+        return cache_dir
+
+    with _build_lock(cache_dir):
+        cached = _cached_source(cache_dir)
+        if _is_current(cached, file_fingerprint(path, digest=False)):
+            return cache_dir
+
+        fingerprint = file_fingerprint(path)
+        if cached and cached['sha256'] == fingerprint['sha256']:
+            # Same content with a new mtime (touched or re-copied): refresh the key only
+            current = json.loads((cache_dir / 'current.json').read_text())
+            current['source'] = fingerprint
+            _publish(cache_dir, current)
+        else:
+            write_columnar(apply_schema(derive_columns(pd.read_csv(path))), cache_dir, fingerprint)
+    return cache_dir
+
+
+def load_bookings(path, cache_dir=None):
+    """Load the typed booking frame, with derived columns, through the columnar cache.
+
+    Every column is a read-only view over the memory-mapped cache files, so
+    any number of worker processes share one physical copy of the data.
+    """
+    return read_columnar(ensure_cache(path, cache_dir))
+
+
+def main(path='hotel_booking_cleaned.csv'):
+    cache_dir = ensure_cache(path)
+    print(f'{path}: columnar cache {cache_version(path)} in {cache_dir}')
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -1,44 +1,82 @@
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, Response, abort, make_response, render_template, jsonify, request, g, stream_with_context
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-import math
+import hmac
+import io
+import os
+from functools import wraps
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy import func
-from app.models import db, Hotel, Room, Booking, Customer, ServiceRequest, MaintenanceRecord, CustomerFeedback, Staff
+from app.buckets import period_bucket
+from app.models import db, Hotel, Room, Booking, BookingRollup, Customer, ServiceRequest, MaintenanceRecord, CustomerFeedback, Staff
+from analytics import EXPORT_FORMATS, iter_export, open_datasets, parse_date_range, parse_query, set_stage_timer
+from app.caching import ResponseCache
+from app.metrics import RequestMetrics
+from app.serialization import FastJSONProvider
 
 # Initialize the Flask app
 app = Flask(__name__)
+# Encode responses and template data straight from pandas/NumPy values
+app.json = FastJSONProvider(app)
+# Per-endpoint latency, split into filter/aggregate/serialize/render, at /metrics
+metrics = RequestMetrics(app)
+# The dataset backends report their row filtering as the 'filter' stage
+set_stage_timer(metrics.stage)
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///hotel.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['DATASET_PATH'] = os.environ.get('DATASET_PATH', 'hotel_booking_cleaned.csv')
+# 'pandas' serves the dataset from memory, 'sqlite' from an indexed database file,
+# 'chunked' by streaming the CSV in fixed-size chunks
+app.config['DATASET_BACKEND'] = os.environ.get('DATASET_BACKEND', 'pandas')
+# Seconds between checks of the dataset file for changes; 0 disables watching
+app.config['DATASET_WATCH_INTERVAL'] = float(os.environ.get('DATASET_WATCH_INTERVAL', 0))
+# Worker processes aggregating large selections of the pandas backend in parallel; 0 disables
+app.config['DATASET_WORKERS'] = int(os.environ.get('DATASET_WORKERS', 0))
+# Token the dataset admin endpoints require as 'Authorization: Bearer <token>';
+# unset, they are disabled and answer 403
+app.config['DATASET_ADMIN_TOKEN'] = os.environ.get('DATASET_ADMIN_TOKEN')
 db.init_app(app)
 
-# Load and preprocess the dataset
-data = pd.read_csv('hotel_booking_cleaned.csv')
-
-# Helper function to clean data for JSON
-def clean_for_json(data):
-    cleaned = []
-    for row in data:
-        cleaned_row = []
-        for val in row:
-            if val is None or (isinstance(val, float) and math.isnan(val)):
-                cleaned_row.append(0)
-            else:
-                cleaned_row.append(val)
-        cleaned.append(cleaned_row)
-    return cleaned
-
-# Helper function to apply filters
-def apply_filters(df, hotel=None, year=None, month=None):
-    filtered = df.copy()
-    if hotel and hotel != "All Hotels":
-        filtered = filtered[filtered['hotel'] == hotel]
-    if year and year != "All Years":
-        filtered = filtered[filtered['arrival_date_year'] == int(year)]
-    if month and month != "All Months":
-        filtered = filtered[filtered['arrival_date_month'] == month]
-    return filtered
+# Load and preprocess the dataset; after the first start this memory-maps the
+# typed columnar cache (or opens the SQLite database) instead of re-parsing the
+# CSV. A reload builds the new version in the background and swaps it in whole.
+datasets = open_datasets(app.config['DATASET_PATH'], app.config['DATASET_BACKEND'],
+                         workers=app.config['DATASET_WORKERS'])
+if app.config['DATASET_WATCH_INTERVAL'] > 0:
+    datasets.watch(app.config['DATASET_WATCH_INTERVAL'])
+
+# Pin one dataset version for the whole request, even if a reload swaps it mid-way
+def current_dataset():
+    if 'dataset' not in g:
+        g.dataset = datasets.current
+    return g.dataset
+
+# Optional inclusive arrival date range (?start=2016-07-01&end=2016-09-30) as
+# half-open (start, stop) bounds; malformed dates are rejected with a 400
+def date_range():
+    try:
+        return parse_date_range(request.args.get('start'), request.args.get('end'))
+    except ValueError as e:
+        abort(make_response(jsonify({'error': str(e)}), 400))
+
+# Reject requests to the dataset admin endpoints without the configured token
+def admin_required(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        token = app.config['DATASET_ADMIN_TOKEN']
+        sent = request.headers.get('Authorization', '').removeprefix('Bearer ')
+        if not token or not hmac.compare_digest(sent.encode(), token.encode()):
+            return jsonify({'error': 'admin token required'}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+# JSON responses are pure functions of the filters and the dataset version
+response_cache = ResponseCache(version=lambda: current_dataset().version)
+
+@datasets.on_swap
+def drop_stale_responses(dataset):
+    response_cache.clear()
 
 # Route for Dashboard 1 (Strategic Overview)
 @app.route('/')
@@ -51,43 +89,38 @@ def dashboard2():
     hotel = request.args.get('hotel')
     year = request.args.get('year')
     month = request.args.get('month')
+    start, stop = date_range()
     
-    filtered = apply_filters(data, hotel, year, month)
+    dataset = current_dataset()
+    filters = (hotel, year, month, start, stop)
     
     # 1. Cancellations by Market Segment
-    cancel_by_segment = filtered.groupby('market_segment')['is_canceled'].value_counts().unstack(fill_value=0)
-    cancel_by_segment = [
-        (seg, int(cancel_by_segment.loc[seg].get(1, 0)), int(cancel_by_segment.loc[seg].get(0, 0)))
-        for seg in cancel_by_segment.index
-    ]
-    
-    # 2. ADR vs Lead Time (sample 200 rows for better visualization)
-    lead_vs_adr = filtered[(filtered['adr'] > 0) & (filtered['lead_time'] > 0)][['lead_time', 'adr']]
-    if len(lead_vs_adr) > 200:
-        lead_vs_adr = lead_vs_adr.sample(n=200, random_state=1)
-    lead_vs_adr = lead_vs_adr.values.tolist()
+    segments = dataset.query(*filters, group_by=['market_segment'], measures=['count', 'sum_canceled'])
+    canceled = segments['measures']['sum_canceled'].astype(int)
+    cancel_by_segment = list(zip(segments['groups'], canceled, segments['measures']['count'] - canceled))
+    
+    # 2. ADR vs Lead Time as a fixed-size density grid over every matching booking
+    lead_vs_adr = dataset.density(*filters)
     
     # 3. Revenue by Distribution Channel
-    revenue_by_channel = filtered.groupby('distribution_channel').apply(
-        lambda x: (x['adr'] * (x['stays_in_weekend_nights'] + x['stays_in_week_nights'])).sum()
-    )
-    revenue_by_channel = [(ch, float(revenue_by_channel.loc[ch])) for ch in revenue_by_channel.index]
+    channels = dataset.query(*filters, group_by=['distribution_channel'], measures=['sum_revenue'])
+    revenue_by_channel = list(zip(channels['groups'], channels['measures']['sum_revenue']))
     
     # 4. Special Requests by Customer Type
-    special_requests = filtered.groupby('customer_type')['total_of_special_requests'].mean()
-    special_requests = [(ct, float(special_requests.loc[ct])) for ct in special_requests.index]
+    customers = dataset.query(*filters, group_by=['customer_type'], measures=['mean_special_requests'])
+    special_requests = list(zip(customers['groups'], customers['measures']['mean_special_requests']))
     
     # 5. Repeat vs New Guests
-    repeat_guests = filtered['is_repeated_guest'].value_counts().sort_index()
-    repeat_guests = [(int(k), int(v)) for k, v in repeat_guests.items()]
+    repeats = dataset.query(*filters, group_by=['is_repeated_guest'], measures=['count'])
+    repeat_guests = list(zip(repeats['groups'], repeats['measures']['count']))
     
     return render_template(
         "dashboard2.html",
-        cancel_by_segment=clean_for_json(cancel_by_segment),
-        lead_vs_adr=clean_for_json(lead_vs_adr),
-        revenue_by_channel=clean_for_json(revenue_by_channel),
-        special_requests=clean_for_json(special_requests),
-        repeat_guests=clean_for_json(repeat_guests)
+        cancel_by_segment=cancel_by_segment,
+        lead_vs_adr=lead_vs_adr,
+        revenue_by_channel=revenue_by_channel,
+        special_requests=special_requests,
+        repeat_guests=repeat_guests
     )
 
 # Route for Dashboard 3 (Customer Insights)
@@ -108,152 +141,264 @@ def dashboard5():
     """Operational Efficiency Dashboard"""
     return render_template('dashboard5.html')
 
+# Helper functions building the Dashboard 1 widget payloads from the cube
+def hotel_payload(cube, hotel=None, year=None, month=None):
+    hotel_counts = cube.hotel_counts(hotel, year, month)
+    return {
+        'labels': hotel_counts.index,
+        'counts': hotel_counts
+    }
+
+def cancellation_payload(cube, hotel=None, year=None, month=None):
+    cell = cube.cell(hotel, year, month)
+    return {
+        'labels': ['Not Canceled', 'Canceled'],
+        'counts': [cell.not_canceled, cell.canceled]
+    }
+
+def kpi_payload(cube, hotel=None, year=None, month=None):
+    cell = cube.cell(hotel, year, month)
+    
+    total_bookings = cell.bookings
+    total_revenue = cell.revenue_sum
+    avg_adr = cell.avg_adr if total_bookings else 0
+    occupancy_rate = 100 * cell.avg_nights / 7 if total_bookings else 0
+    
+    return {
+        'total_bookings': total_bookings,
+        'total_revenue': round(total_revenue, 2),
+        'average_adr': round(avg_adr, 2),
+        'occupancy_rate': round(occupancy_rate, 2)
+    }
+
+def revenue_payload(cube, hotel=None, year=None):
+    revenue_by_month = cube.revenue_by_month(hotel, year)
+    return {
+        'labels': revenue_by_month.index,
+        'values': revenue_by_month
+    }
+
+def top_countries_payload(cube, hotel=None, year=None, month=None):
+    cell = cube.cell(hotel, year, month)
+    
+    if not cell.bookings:
+        return {'labels': ['No Data'], 'counts': [1]}
+    
+    top_countries = cell.country_counts.head(5)
+    return {
+        'labels': top_countries.index,
+        'counts': top_countries
+    }
+
 # API route for hotel distribution data
 @app.route('/hotel_data')
+@response_cache.cached('hotel', 'year', 'month', 'start', 'end')
 def hotel_data():
     hotel = request.args.get('hotel')
     year = request.args.get('year')
     month = request.args.get('month')
-    
-    filtered = apply_filters(data, hotel, year, month)
-    hotel_counts = filtered['hotel'].value_counts()
-    
-    response = {
-        'labels': list(hotel_counts.index),
-        'counts': [int(x) for x in hotel_counts.values]
-    }
-    return jsonify(response)
+    start, stop = date_range()
+    return jsonify(hotel_payload(current_dataset().cube_for(start, stop), hotel, year, month))
 
 # API route for cancellation data
 @app.route('/cancellation_data')
+@response_cache.cached('hotel', 'year', 'month', 'start', 'end')
 def cancellation_data():
     hotel = request.args.get('hotel')
     year = request.args.get('year')
     month = request.args.get('month')
-    
-    filtered = apply_filters(data, hotel, year, month)
-    cancel_counts = filtered['is_canceled'].value_counts().sort_index()
-    
-    not_canceled = int(cancel_counts.get(0, 0))
-    canceled = int(cancel_counts.get(1, 0))
-    
-    response = {
-        'labels': ['Not Canceled', 'Canceled'],
-        'counts': [not_canceled, canceled]
-    }
-    return jsonify(response)
+    start, stop = date_range()
+    return jsonify(cancellation_payload(current_dataset().cube_for(start, stop), hotel, year, month))
 
 # API route for KPI data
 @app.route('/kpi_data')
+@response_cache.cached('hotel', 'year', 'month', 'start', 'end')
 def kpi_data():
     hotel = request.args.get('hotel')
     year = request.args.get('year')
     month = request.args.get('month')
-    
-    filtered = apply_filters(data, hotel, year, month)
-    
-    total_bookings = len(filtered)
-    total_revenue = (filtered['adr'] * (filtered['stays_in_weekend_nights'] + filtered['stays_in_week_nights'])).sum()
-    avg_adr = filtered['adr'].mean() if not filtered.empty else 0
-    occupancy_rate = 100 * (filtered['stays_in_weekend_nights'] + filtered['stays_in_week_nights']).mean() / 7 if not filtered.empty else 0
-    
-    kpis = {
-        'total_bookings': int(total_bookings),
-        'total_revenue': round(total_revenue, 2),
-        'average_adr': round(avg_adr, 2),
-        'occupancy_rate': round(occupancy_rate, 2)
-    }
-    
-    return jsonify(kpis)
+    start, stop = date_range()
+    return jsonify(kpi_payload(current_dataset().cube_for(start, stop), hotel, year, month))
 
 # API route for revenue trend data
 @app.route('/revenue_data')
+@response_cache.cached('hotel', 'year', 'start', 'end')
 def revenue_data():
     hotel = request.args.get('hotel')
     year = request.args.get('year')
-    
-    filtered = apply_filters(data, hotel, year)
-    
-    months_order = ['January','February','March','April','May','June','July','August','September','October','November','December']
-    revenue_by_month = filtered.groupby('arrival_date_month').apply(
-        lambda x: (x['adr'] * (x['stays_in_weekend_nights'] + x['stays_in_week_nights'])).sum()
-    ).reindex(months_order, fill_value=0)
-    
-    response = {
-        'labels': list(revenue_by_month.index),
-        'values': [float(x) for x in revenue_by_month.values]
-    }
-    return jsonify(response)
+    start, stop = date_range()
+    return jsonify(revenue_payload(current_dataset().cube_for(start, stop), hotel, year))
 
 # API route for top countries data
 @app.route('/top_countries_data')
+@response_cache.cached('hotel', 'year', 'month', 'start', 'end')
 def top_countries_data():
     hotel = request.args.get('hotel')
     year = request.args.get('year')
     month = request.args.get('month')
+    start, stop = date_range()
+    return jsonify(top_countries_payload(current_dataset().cube_for(start, stop), hotel, year, month))
+
+# API route bundling every Dashboard 1 widget into a single response
+@app.route('/api/dashboard1/bundle')
+@response_cache.cached('hotel', 'year', 'month', 'start', 'end')
+def dashboard1_bundle():
+    hotel = request.args.get('hotel')
+    year = request.args.get('year')
+    month = request.args.get('month')
+    start, stop = date_range()
     
-    filtered = apply_filters(data, hotel, year, month)
-    
-    if filtered.empty:
-        return jsonify({'labels': ['No Data'], 'counts': [1]})
+    cube = current_dataset().cube_for(start, stop)
     
-    top_countries = filtered['country'].value_counts().head(5)
     response = {
-        'labels': list(top_countries.index),
-        'counts': list(top_countries.values)
+        'kpis': kpi_payload(cube, hotel, year, month),
+        'revenue': revenue_payload(cube, hotel, year),
+        'hotels': hotel_payload(cube, hotel, year, month),
+        'cancellations': cancellation_payload(cube, hotel, year, month),
+        'top_countries': top_countries_payload(cube, hotel, year, month)
     }
     return jsonify(response)
 
+# API route for the lead time x ADR density grid
+@app.route('/api/lead_adr_density')
+@response_cache.cached('hotel', 'year', 'month', 'start', 'end', 'lead_bins', 'adr_bins', 'split')
+def lead_adr_density_data():
+    hotel = request.args.get('hotel')
+    year = request.args.get('year')
+    month = request.args.get('month')
+    lead_bins = request.args.get('lead_bins', 24, type=int)
+    adr_bins = request.args.get('adr_bins', 20, type=int)
+    split_by_hotel = request.args.get('split') == 'hotel'
+    start, stop = date_range()
+    
+    return jsonify(current_dataset().density(hotel, year, month, start, stop, lead_bins, adr_bins, split_by_hotel))
+
+# API route for declarative group-by/pivot queries over the filtered bookings, e.g.
+# /api/query?group_by=market_segment,customer_type&measures=count,cancel_rate,mean_adr
+@app.route('/api/query')
+@response_cache.cached('hotel', 'year', 'month', 'start', 'end', 'group_by', 'measures', 'order_by', 'limit')
+def query_data():
+    hotel = request.args.get('hotel')
+    year = request.args.get('year')
+    month = request.args.get('month')
+    start, stop = date_range()
+    
+    try:
+        query = parse_query(
+            request.args.get('group_by'),
+            request.args.get('measures'),
+            request.args.get('order_by'),
+            request.args.get('limit')
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify(current_dataset().query(hotel, year, month, start, stop, **query))
+
 # API route for market segment analysis
 @app.route('/market_segment_data')
+@response_cache.cached('hotel', 'year', 'month', 'start', 'end')
 def market_segment_data():
     hotel = request.args.get('hotel')
     year = request.args.get('year')
     month = request.args.get('month')
+    start, stop = date_range()
     
-    filtered = apply_filters(data, hotel, year, month)
-    
-    segment_analysis = filtered.groupby('market_segment').agg({
-        'is_canceled': ['count', 'mean'],
-        'adr': 'mean',
-        'total_of_special_requests': 'mean'
-    }).round(2)
+    segment_analysis = current_dataset().query(
+        hotel, year, month, start, stop,
+        group_by=['market_segment'],
+        measures=['count', 'cancel_rate', 'mean_adr', 'mean_special_requests']
+    )
+    measures = segment_analysis['measures']
     
     response = {
-        'labels': list(segment_analysis.index),
-        'bookings': [int(x) for x in segment_analysis[('is_canceled', 'count')]],
-        'cancel_rate': [float(x) for x in segment_analysis[('is_canceled', 'mean')]],
-        'avg_adr': [float(x) for x in segment_analysis[('adr', 'mean')]],
-        'avg_special_requests': [float(x) for x in segment_analysis[('total_of_special_requests', 'mean')]]
+        'labels': segment_analysis['groups'],
+        'bookings': measures['count'],
+        'cancel_rate': np.round(measures['cancel_rate'], 2),
+        'avg_adr': np.round(measures['mean_adr'], 2),
+        'avg_special_requests': np.round(measures['mean_special_requests'], 2)
     }
     return jsonify(response)
 
 # API route for customer type analysis
 @app.route('/customer_type_data')
+@response_cache.cached('hotel', 'year', 'month', 'start', 'end')
 def customer_type_data():
     hotel = request.args.get('hotel')
     year = request.args.get('year')
     month = request.args.get('month')
+    start, stop = date_range()
     
-    filtered = apply_filters(data, hotel, year, month)
-    
-    customer_analysis = filtered.groupby('customer_type').agg({
-        'is_canceled': ['count', 'mean'],
-        'adr': 'mean',
-        'total_of_special_requests': 'mean',
-        'lead_time': 'mean'
-    }).round(2)
+    customer_analysis = current_dataset().query(
+        hotel, year, month, start, stop,
+        group_by=['customer_type'],
+        measures=['count', 'cancel_rate', 'mean_adr', 'mean_special_requests', 'mean_lead_time']
+    )
+    measures = customer_analysis['measures']
     
     response = {
-        'labels': list(customer_analysis.index),
-        'bookings': [int(x) for x in customer_analysis[('is_canceled', 'count')]],
-        'cancel_rate': [float(x) for x in customer_analysis[('is_canceled', 'mean')]],
-        'avg_adr': [float(x) for x in customer_analysis[('adr', 'mean')]],
-        'avg_special_requests': [float(x) for x in customer_analysis[('total_of_special_requests', 'mean')]],
-        'avg_lead_time': [float(x) for x in customer_analysis[('lead_time', 'mean')]]
+        'labels': customer_analysis['groups'],
+        'bookings': measures['count'],
+        'cancel_rate': np.round(measures['cancel_rate'], 2),
+        'avg_adr': np.round(measures['mean_adr'], 2),
+        'avg_special_requests': np.round(measures['mean_special_requests'], 2),
+        'avg_lead_time': np.round(measures['mean_lead_time'], 2)
     }
     return jsonify(response)
 
+# Admin trigger: load the dataset file again in the background and swap it in
+@app.route('/admin/reload', methods=['POST'])
+@admin_required
+def reload_dataset():
+    datasets.reload()
+    return jsonify({'status': 'reloading', 'version': datasets.current.version}), 202
+
+# Append new bookings (CSV body or a JSON list of records) without a reload.
+# Only the new batch is indexed and aggregated; the rows are kept (in memory,
+# or in the SQLite database) until the next reload from the dataset file.
+@app.route('/api/bookings/append', methods=['POST'])
+@admin_required
+def append_bookings():
+    try:
+        if request.is_json:
+            batch = pd.DataFrame.from_records(request.get_json())
+        else:
+            batch = pd.read_csv(io.BytesIO(request.get_data()))
+        dataset = datasets.append(batch)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({'appended': len(batch), 'version': dataset.version, 'total_rows': len(dataset)})
+
+# Response cache counters, for sizing the cache
+@app.route('/cache_stats')
+def cache_stats():
+    return jsonify(response_cache.stats())
+
+# Streaming export of the filtered bookings as CSV, NDJSON or gzipped CSV
+@app.route('/export')
+def export_data():
+    hotel = request.args.get('hotel')
+    year = request.args.get('year')
+    month = request.args.get('month')
+    fmt = request.args.get('format', 'csv')
+    start, stop = date_range()
+    
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': f"format must be one of {', '.join(EXPORT_FORMATS)}"}), 400
+    mimetype, extension = EXPORT_FORMATS[fmt]
+    
+    # The backend times its own filtering. The lazy backends filter while the
+    # response streams; stream_with_context keeps the request context until
+    # the stream ends, and the metrics are recorded when it is torn down then.
+    selection = current_dataset().select(hotel, year, month, start, stop)
+    
+    return Response(
+        stream_with_context(iter_export(selection, fmt)),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename=hotel_bookings.{extension}'}
+    )
+
 @app.route('/routes')
 def list_routes():
     import urllib
@@ -264,25 +409,36 @@ def list_routes():
         output.append(line)
     return "<pre>" + "\n".join(output) + "</pre>"
 
+# Backfill the daily booking rollups the revenue and channel endpoints read
+@app.cli.command('rebuild-rollups')
+def rebuild_rollups():
+    from app.models import rebuild_booking_rollups
+    print(f'rebuilt {rebuild_booking_rollups(db.session)} booking rollups')
+
 # API endpoints for Dashboard 3 (Strategic Revenue Management)
 @app.route('/api/revenue/trend')
 def revenue_trend():
-    period = request.args.get('period', 'monthly')
     hotel_type = request.args.get('hotel_type', 'all')
+    try:
+        bucket = period_bucket(BookingRollup.day, request.args.get('period', 'monthly'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
+    # Daily rollups rather than bookings: the cost follows the number of days,
+    # grouped by their stored period key
     query = db.session.query(
-        func.date_trunc(period, Booking.check_in).label('period'),
-        func.sum(Booking.total_amount).label('revenue')
-    ).join(Room).join(Hotel)
+        bucket.label('period'),
+        func.sum(BookingRollup.revenue).label('revenue')
+    ).join(Hotel, Hotel.id == BookingRollup.hotel_id)
     
     if hotel_type != 'all':
         query = query.filter(Hotel.type == hotel_type)
     
-    results = query.group_by('period').order_by('period').all()
+    results = query.group_by(bucket).order_by(bucket).all()
     
     return jsonify({
-        'periods': [r.period.strftime('%Y-%m-%d') for r in results],
-        'revenue': [float(r.revenue) for r in results]
+        'periods': [r.period for r in results],
+        'revenue': [r.revenue for r in results]
     })
 
 @app.route('/api/revenue/segments')
@@ -290,18 +446,18 @@ def revenue_segments():
     hotel_type = request.args.get('hotel_type', 'all')
     
     query = db.session.query(
-        Customer.customer_type,
-        func.sum(Booking.total_amount).label('revenue')
-    ).join(Booking).join(Room).join(Hotel)
+        BookingRollup.customer_type,
+        func.sum(BookingRollup.revenue).label('revenue')
+    ).join(Hotel, Hotel.id == BookingRollup.hotel_id)
     
     if hotel_type != 'all':
         query = query.filter(Hotel.type == hotel_type)
     
-    results = query.group_by(Customer.customer_type).all()
+    results = query.group_by(BookingRollup.customer_type).all()
     
     return jsonify({
         'segments': [r.customer_type for r in results],
-        'revenue': [float(r.revenue) for r in results]
+        'revenue': [r.revenue for r in results]
     })
 
 @app.route('/api/revenue/geographic')
@@ -309,18 +465,18 @@ def revenue_geographic():
     hotel_type = request.args.get('hotel_type', 'all')
     
     query = db.session.query(
-        Customer.country,
-        func.sum(Booking.total_amount).label('revenue')
-    ).join(Booking).join(Room).join(Hotel)
+        BookingRollup.country,
+        func.sum(BookingRollup.revenue).label('revenue')
+    ).join(Hotel, Hotel.id == BookingRollup.hotel_id)
     
     if hotel_type != 'all':
         query = query.filter(Hotel.type == hotel_type)
     
-    results = query.group_by(Customer.country).all()
+    results = query.group_by(BookingRollup.country).all()
     
     return jsonify({
         'countries': [r.country for r in results],
-        'revenue': [float(r.revenue) for r in results]
+        'revenue': [r.revenue for r in results]
     })
 
 # API endpoints for Dashboard 4 (Customer Insights)
@@ -337,37 +493,42 @@ def customer_segmentation():
     return jsonify({
         'segments': [r.customer_type for r in results],
         'counts': [r.count for r in results],
-        'avg_spend': [float(r.avg_spend) for r in results]
+        'avg_spend': [r.avg_spend for r in results]
     })
 
 @app.route('/api/customers/satisfaction')
 def customer_satisfaction():
+    try:
+        bucket = period_bucket(CustomerFeedback.created_at, request.args.get('period', 'monthly'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
     query = db.session.query(
-        func.date_trunc('month', CustomerFeedback.created_at).label('month'),
+        bucket.label('month'),
         func.avg(CustomerFeedback.rating).label('avg_rating')
-    ).group_by('month').order_by('month')
+    ).group_by(bucket).order_by(bucket)
     
     results = query.all()
     
     return jsonify({
-        'months': [r.month.strftime('%Y-%m') for r in results],
-        'ratings': [float(r.avg_rating) for r in results]
+        'months': [r.month for r in results],
+        'ratings': [r.avg_rating for r in results]
     })
 
 @app.route('/api/customers/channels')
 def booking_channels():
     query = db.session.query(
-        Booking.booking_channel,
-        func.count(Booking.id).label('count'),
-        func.avg(Booking.total_amount).label('avg_amount')
-    ).group_by(Booking.booking_channel)
+        BookingRollup.booking_channel,
+        func.sum(BookingRollup.bookings).label('count'),
+        (func.sum(BookingRollup.revenue) / func.sum(BookingRollup.bookings)).label('avg_amount')
+    ).group_by(BookingRollup.booking_channel)
     
     results = query.all()
     
     return jsonify({
         'channels': [r.booking_channel for r in results],
         'counts': [r.count for r in results],
-        'avg_amounts': [float(r.avg_amount) for r in results]
+        'avg_amounts': [r.avg_amount for r in results]
     })
 
 # API endpoints for Dashboard 5 (Operational Efficiency)
@@ -383,7 +544,8 @@ def room_utilization():
     
     return jsonify({
         'room_types': [r.room_type for r in results],
-        'utilization': [float(r.occupied_rooms) / float(r.total_rooms) * 100 for r in results]
+        'utilization': 100 * np.array([r.occupied_rooms for r in results], dtype=float)
+                       / np.array([r.total_rooms for r in results], dtype=float)
     })
 
 @app.route('/api/operations/service-requests')
@@ -401,7 +563,7 @@ def service_requests():
     return jsonify({
         'request_types': [r.request_type for r in results],
         'counts': [r.count for r in results],
-        'response_times': [float(r.avg_response_time) / 3600 for r in results]  # Convert to hours
+        'response_times': np.array([r.avg_response_time for r in results], dtype=float) / 3600  # Convert to hours
     })
 
 @app.route('/api/operations/maintenance')
@@ -417,7 +579,7 @@ def maintenance_metrics():
     return jsonify({
         'maintenance_types': [r.maintenance_type for r in results],
         'counts': [r.count for r in results],
-        'avg_costs': [float(r.avg_cost) for r in results]
+        'avg_costs': [r.avg_cost for r in results]
     })
 
 # Run the app
@@ -425,5 +587,3 @@ if __name__ == '__main__':
     with app.app_context():
         db.create_all()
     app.run(debug=True, port=5000)
-
-print(data[(data['arrival_date_year'] == 2015) & (data['arrival_date_month'] == 'March')].shape) 
\ No newline at end of file
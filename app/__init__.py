@@ -3,13 +3,17 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_migrate import Migrate
 import os
+from app.metrics import RequestMetrics
+from app.serialization import FastJSONProvider
 
 db = SQLAlchemy()
 login_manager = LoginManager()
 migrate = Migrate()
+metrics = RequestMetrics()
 
 def create_app():
     app = Flask(__name__)
+    app.json = FastJSONProvider(app)
     
     # Configuration
     app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev')
@@ -20,6 +24,7 @@ def create_app():
     db.init_app(app)
     login_manager.init_app(app)
     migrate.init_app(app, db)
+    metrics.init_app(app)
     
     # Set login view
     login_manager.login_view = 'auth.login'
@@ -33,6 +38,18 @@ def create_app():
     from app.routes import main
     app.register_blueprint(main)
     
+    # Recompute the booking sketches after bulk edits or deletes
+    @app.cli.command('rebuild-sketches')
+    def rebuild_sketches():
+        from app.models import rebuild_booking_sketches
+        print(f'rebuilt {rebuild_booking_sketches(db.session)} booking sketches')
+    
+    # Backfill the daily booking rollups, or resync them after bulk writes
+    @app.cli.command('rebuild-rollups')
+    def rebuild_rollups():
+        from app.models import rebuild_booking_rollups
+        print(f'rebuilt {rebuild_booking_rollups(db.session)} booking rollups')
+    
     # Create database tables
     with app.app_context():
         db.create_all()
@@ -0,0 +1,127 @@
+"""Period bucket keys for grouping by day, ISO week, month, quarter or year.
+
+A key is a sortable string naming the period a timestamp falls in:
+``2016-07-04``, ``2016-W27``, ``2016-07``, ``2016-Q3`` and ``2016``. Tables
+store keys computed in Python by ``period_keys`` next to the timestamps
+they came from, and index them, so grouping by period reads the index in
+key order instead of calling a date function on every row.
+``period_bucket`` builds the same keys in SQL where nothing is stored.
+"""
+from sqlalchemy import String
+from sqlalchemy.exc import CompileError
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+
+PERIODS = ('day', 'week', 'month', 'quarter', 'year')
+
+# The dashboards' period selects send these
+ALIASES = {'daily': 'day', 'weekly': 'week', 'monthly': 'month', 'quarterly': 'quarter', 'yearly': 'year'}
+
+
+def parse_period(name):
+    """The period named ``name`` (``month`` or ``monthly``); ValueError if unknown."""
+    period = ALIASES.get(name, name)
+    if period not in PERIODS:
+        raise ValueError(f"period must be one of {', '.join(PERIODS)}")
+    return period
+
+
+def period_key(value, period):
+    """The ``period`` key of a date or datetime ``value``."""
+    if period == 'day':
+        return value.strftime('%Y-%m-%d')
+    if period == 'week':
+        year, week, _ = value.isocalendar()
+        return f'{year}-W{week:02d}'
+    if period == 'month':
+        return value.strftime('%Y-%m')
+    if period == 'quarter':
+        return f'{value.year}-Q{(value.month + 2) // 3}'
+    return f'{value.year:04d}'
+
+
+def period_keys(value, periods=PERIODS):
+    """``{period: key}`` for ``value``, or all None when ``value`` is None."""
+    return {period: None if value is None else period_key(value, period) for period in periods}
+
+
+class _PeriodKey(FunctionElement):
+    type = String()
+    inherit_cache = True
+
+
+# One class per period, so the period is part of the statement cache key
+class day_key(_PeriodKey):
+    period = 'day'
+    inherit_cache = True
+
+
+class week_key(_PeriodKey):
+    period = 'week'
+    inherit_cache = True
+
+
+class month_key(_PeriodKey):
+    period = 'month'
+    inherit_cache = True
+
+
+class quarter_key(_PeriodKey):
+    period = 'quarter'
+    inherit_cache = True
+
+
+class year_key(_PeriodKey):
+    period = 'year'
+    inherit_cache = True
+
+
+KEY_FUNCTIONS = {cls.period: cls for cls in (day_key, week_key, month_key, quarter_key, year_key)}
+
+
+@compiles(_PeriodKey)
+def _compile_default(element, compiler, **kw):
+    raise CompileError(f'no period keys for the {compiler.dialect.name} dialect')
+
+
+@compiles(_PeriodKey, 'sqlite')
+def _compile_sqlite(element, compiler, **kw):
+    # The formats are written into the SQL rather than bound, so the
+    # expressions match the expression indexes built on them
+    column = compiler.process(element.clauses, **kw)
+    if element.period == 'week':
+        # ISO weeks belong to the year of their Thursday
+        thursday = f"date({column}, '-3 days', 'weekday 4')"
+        return (f"strftime('%Y', {thursday}) || '-W' || "
+                f"printf('%02d', (strftime('%j', {thursday}) + 6) / 7)")
+    if element.period == 'quarter':
+        return f"strftime('%Y', {column}) || '-Q' || ((strftime('%m', {column}) + 2) / 3)"
+    fmt = {'day': '%Y-%m-%d', 'month': '%Y-%m', 'year': '%Y'}[element.period]
+    return f"strftime('{fmt}', {column})"
+
+
+@compiles(_PeriodKey, 'postgresql')
+def _compile_postgresql(element, compiler, **kw):
+    fmt = {'day': 'YYYY-MM-DD', 'week': 'IYYY-"W"IW', 'month': 'YYYY-MM',
+           'quarter': 'YYYY-"Q"Q', 'year': 'YYYY'}[element.period]
+    return f"to_char({compiler.process(element.clauses, **kw)}, '{fmt}')"
+
+
+# (table, column) -> {period: stored key column}, filled by store_buckets
+_stored = {}
+
+
+def store_buckets(column, keys):
+    """Register ``keys`` (``{period: column}``) as stored keys of ``column``."""
+    column = column.expression
+    _stored[column.table.name, column.name] = keys
+
+
+def period_bucket(column, period):
+    """The ``period`` key of ``column``: its stored key column if it has one,
+    otherwise the SQL expression computing it."""
+    period = parse_period(period)
+    stored = _stored.get((column.expression.table.name, column.expression.name), {})
+    if period in stored:
+        return stored[period]
+    return KEY_FUNCTIONS[period](column)
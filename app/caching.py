@@ -0,0 +1,111 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Response, make_response, request
+
+ALL_VALUES = {'hotel': 'All Hotels', 'year': 'All Years', 'month': 'All Months'}
+
+
+def normalise_filter(name, value):
+    """Map every spelling of "no filter" to None and years to canonical strings."""
+    if not value or value == ALL_VALUES.get(name):
+        return None
+    if name == 'year':
+        try:
+            return str(int(value))
+        except ValueError:
+            return value
+    return value
+
+
+class ResponseCache:
+    """Size-bounded LRU of serialised JSON responses with strong ETags.
+
+    Responses are keyed on the endpoint, the dataset version and the
+    normalised filter values. Because a response is a pure function of that
+    key, the ETag is derived from the key alone: a client revalidating with
+    ``If-None-Match`` gets a 304 without the view running or anything being
+    serialised, even when the entry has already been evicted.
+    """
+
+    def __init__(self, version, maxsize=512, max_bytes=32 * 1024 * 1024):
+        self.version = version
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.not_modified = 0
+
+    def _get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            return body
+
+    def _put(self, key, body):
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = body
+            self._bytes += len(body)
+            while self._entries and (len(self._entries) > self.maxsize or self._bytes > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'not_modified': self.not_modified,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'maxsize': self.maxsize,
+                'max_bytes': self.max_bytes,
+            }
+
+    def cached(self, *params):
+        """Cache a JSON view on the given query parameters."""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                filters = tuple(normalise_filter(name, request.args.get(name)) for name in params)
+                key = (request.endpoint, self.version(), filters)
+                etag = hashlib.sha1(repr(key).encode()).hexdigest()
+
+                if request.if_none_match.contains(etag):
+                    with self._lock:
+                        self.not_modified += 1
+                    response = Response(status=304)
+                else:
+                    body = self._get(key)
+                    if body is None:
+                        response = make_response(view(*args, **kwargs))
+                        if response.status_code != 200:
+                            return response
+                        body = response.get_data()
+                        self._put(key, body)
+                    response = Response(body, mimetype='application/json')
+                response.set_etag(etag)
+                # Always revalidate: a reload changes the version and with it the ETag
+                response.headers['Cache-Control'] = 'no-cache'
+                return response
+            return wrapper
+        return decorator
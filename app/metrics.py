@@ -0,0 +1,208 @@
+"""Per-request latency metrics in the Prometheus text format.
+
+``RequestMetrics`` is a Flask extension. It records, per endpoint:
+
+- ``http_request_duration_seconds``: a histogram of the whole request
+- ``http_request_stage_seconds``: a histogram per stage. The stages are
+  ``filter`` (``metrics.stage('filter')`` blocks, which the app installs as
+  the dataset backends' stage timer, and SQL execution),
+  ``serialize`` (JSON responses), ``render`` (templates), and ``aggregate``,
+  which is the rest of the view's time
+- ``http_requests_total`` by method and status, and ``http_response_bytes_total``
+- ``http_requests_in_flight``
+
+Stage times collect in ``flask.g`` without locking. Each finished request
+then takes one short lock to fold its observations into the shared series,
+which costs a few microseconds. The numbers are per process, so run one
+scrape target per worker.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import Response, g, has_request_context, request
+from flask.signals import before_render_template, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _add_stage(name, seconds):
+    stages = g.get('metrics_stages') if has_request_context() else None
+    if stages is not None:
+        stages[name] = stages.get(name, 0.0) + seconds
+
+
+class Histogram:
+    __slots__ = ('counts', 'sum')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+
+
+def _labels(**labels):
+    return ','.join(f'{name}="{value}"' for name, value in labels.items())
+
+
+class RequestMetrics:
+    """Request latency, stage, count, size and in-flight metrics with a /metrics route."""
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._in_flight = set()
+        self.durations = {}
+        self.stages = {}
+        self.requests = {}
+        self.response_bytes = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app, path='/metrics'):
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.teardown_request(self._record)
+        before_render_template.connect(self._render_started, app)
+        template_rendered.connect(self._render_finished, app)
+
+        # JSON responses: time the provider that jsonify and returned dicts go through
+        json_response = app.json.response
+
+        def response(*args, **kwargs):
+            with self.stage('serialize'):
+                return json_response(*args, **kwargs)
+        app.json.response = response
+
+        # SQL execution counts as filtering for the SQL-backed dashboards
+        if not event.contains(Engine, 'before_cursor_execute', _query_started):
+            event.listen(Engine, 'before_cursor_execute', _query_started)
+            event.listen(Engine, 'after_cursor_execute', _query_finished)
+
+        app.add_url_rule(path, 'metrics', self.export)
+
+    @contextmanager
+    def stage(self, name):
+        """Attribute the time spent in the block to stage ``name``."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            _add_stage(name, time.perf_counter() - start)
+
+    def timed(self, name):
+        """Decorator form of ``stage``."""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.stage(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def _start(self):
+        # set.add and set.discard are atomic, so the gauge needs no lock
+        token = object()
+        self._in_flight.add(token)
+        g.metrics_stages = {}
+        g.metrics_request = [time.perf_counter(), token, 500, 0]
+
+    def _finish(self, response):
+        state = g.get('metrics_request')
+        if state is not None:
+            # Streamed responses have no length up front and count as 0 bytes
+            state[2:] = response.status_code, response.content_length or 0
+        return response
+
+    def _render_started(self, sender, template, context, **extra):
+        if has_request_context():
+            g.metrics_render_start = time.perf_counter()
+
+    def _render_finished(self, sender, template, context, **extra):
+        if has_request_context() and 'metrics_render_start' in g:
+            _add_stage('render', time.perf_counter() - g.pop('metrics_render_start'))
+
+    def _record(self, exc):
+        # Popped, so a streamed response that tears down again is counted once
+        state = g.pop('metrics_request', None)
+        if state is None:
+            return
+        start, token, status, size = state
+        elapsed = time.perf_counter() - start
+        self._in_flight.discard(token)
+        stages = g.pop('metrics_stages')
+        if stages:
+            # Whatever the view spent outside the timed stages is aggregation
+            stages['aggregate'] = max(elapsed - sum(stages.values()), 0.0)
+        if exc is not None:
+            status = 500
+        endpoint = request.endpoint or 'unmatched'
+
+        with self._lock:
+            if endpoint not in self.durations:
+                self.durations[endpoint] = Histogram()
+            self.durations[endpoint].observe(elapsed)
+            for name, seconds in stages.items():
+                key = (endpoint, name)
+                if key not in self.stages:
+                    self.stages[key] = Histogram()
+                self.stages[key].observe(seconds)
+            key = (endpoint, request.method, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.response_bytes[endpoint] = self.response_bytes.get(endpoint, 0) + size
+
+    def _histogram_lines(self, name, series):
+        for labels, histogram in series:
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ('+Inf',), histogram.counts):
+                cumulative += count
+                yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+            yield f'{name}_sum{{{labels}}} {histogram.sum:.6f}'
+            yield f'{name}_count{{{labels}}} {cumulative}'
+
+    def render(self):
+        with self._lock:
+            durations = [(_labels(endpoint=e), h) for e, h in sorted(self.durations.items())]
+            stages = [(_labels(endpoint=e, stage=s), h) for (e, s), h in sorted(self.stages.items())]
+            return self._render(durations, stages, sorted(self.requests.items()),
+                                sorted(self.response_bytes.items()))
+
+    def _render(self, durations, stages, requests, response_bytes):
+        lines = [
+            '# HELP http_request_duration_seconds Request latency by endpoint.',
+            '# TYPE http_request_duration_seconds histogram',
+            *self._histogram_lines('http_request_duration_seconds', durations),
+            '# HELP http_request_stage_seconds Time per request stage by endpoint.',
+            '# TYPE http_request_stage_seconds histogram',
+            *self._histogram_lines('http_request_stage_seconds', stages),
+            '# HELP http_requests_total Requests by endpoint, method and status.',
+            '# TYPE http_requests_total counter',
+            *(f'http_requests_total{{{_labels(endpoint=e, method=m, status=s)}}} {n}'
+              for (e, m, s), n in requests),
+            '# HELP http_response_bytes_total Response body bytes by endpoint.',
+            '# TYPE http_response_bytes_total counter',
+            *(f'http_response_bytes_total{{{_labels(endpoint=e)}}} {n}' for e, n in response_bytes),
+            '# HELP http_requests_in_flight Requests currently being served.',
+            '# TYPE http_requests_in_flight gauge',
+            f'http_requests_in_flight {len(self._in_flight)}',
+        ]
+        return '\n'.join(lines) + '\n'
+
+    def export(self):
+        return Response(self.render(), mimetype='text/plain; version=0.0.4')
+
+
+# The start time lives on the statement's execution context, which is
+# discarded with it, so a statement that raises leaves nothing behind
+def _query_started(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_query_start = time.perf_counter()
+
+
+def _query_finished(conn, cursor, statement, parameters, context, executemany):
+    _add_stage('filter', time.perf_counter() - context._metrics_query_start)
@@ -1,10 +1,14 @@
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
+from sqlalchemy import event, func
+from datetime import date, datetime
+from app.buckets import PERIODS, period_key, period_keys, store_buckets
+from app.sketches import HyperLogLog, QuantileSketch
 
 db = SQLAlchemy()
 
 class Hotel(db.Model):
     __tablename__ = 'hotels'
+    __table_args__ = (db.Index('ix_hotels_type', 'type'),)
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -19,6 +23,8 @@ class Hotel(db.Model):
 
 class Room(db.Model):
     __tablename__ = 'rooms'
+    # Covers the room utilization query (grouped by type, counting by status)
+    __table_args__ = (db.Index('ix_rooms_type_status', 'room_type', 'status'),)
     
     id = db.Column(db.Integer, primary_key=True)
     hotel_id = db.Column(db.Integer, db.ForeignKey('hotels.id'), nullable=False)
@@ -35,6 +41,8 @@ class Room(db.Model):
 
 class Customer(db.Model):
     __tablename__ = 'customers'
+    # Customer segmentation walks customers in group order, then their bookings
+    __table_args__ = (db.Index('ix_customers_customer_type', 'customer_type'),)
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -50,6 +58,14 @@ class Customer(db.Model):
 
 class Booking(db.Model):
     __tablename__ = 'bookings'
+    __table_args__ = (
+        # Covers the per-customer join of the segmentation query
+        db.Index('ix_bookings_customer_id', 'customer_id', 'room_id', 'total_amount'),
+        db.Index('ix_bookings_status', 'status'),
+        db.Index('ix_bookings_created_at', 'created_at'),
+        # Revenue by booking month, read in month order
+        db.Index('ix_bookings_created_month', 'created_month', 'created_at', 'total_amount'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     hotel_id = db.Column(db.Integer, db.ForeignKey('hotels.id'), nullable=False)
@@ -63,12 +79,262 @@ class Booking(db.Model):
     booking_channel = db.Column(db.String(50))  # Direct, OTA, Corporate
     special_requests = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Booking month key (see app.buckets), set on every write; the dashboard
+    # groups revenue by it. No query groups bookings by another period of
+    # created_at, and the check-in trends read the rollups' stored keys, so
+    # bookings keep no other key.
+    created_month = db.Column(db.String(7))
     
     # Relationships
     service_requests = db.relationship('ServiceRequest', backref='booking', lazy=True)
 
+store_buckets(Booking.created_at, {'month': Booking.created_month})
+
+def _set_created_month(booking):
+    booking.created_month = None if booking.created_at is None else period_key(booking.created_at, 'month')
+
+@event.listens_for(Booking, 'before_insert')
+def set_new_booking_month(mapper, connection, booking):
+    # The column default would only apply after this hook, too late for the key
+    if booking.created_at is None:
+        booking.created_at = datetime.utcnow()
+    _set_created_month(booking)
+
+@event.listens_for(Booking, 'before_update')
+def set_changed_booking_month(mapper, connection, booking):
+    if db.inspect(booking).attrs.created_at.history.has_changes():
+        _set_created_month(booking)
+
+class BookingSketch(db.Model):
+    """Per-hotel, per-check-in-day sketches of spend and distinct guests.
+
+    Kept up to date as bookings are inserted; edits and deletes are not
+    reflected until ``rebuild_booking_sketches`` runs.
+    """
+    __tablename__ = 'booking_sketches'
+    __table_args__ = (
+        db.UniqueConstraint('hotel_id', 'day'),
+        # Date ranges across all hotels
+        db.Index('ix_booking_sketches_day', 'day'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    # The booked room's hotel, as for the rollups
+    hotel_id = db.Column(db.Integer, db.ForeignKey('hotels.id'))
+    day = db.Column(db.Date, nullable=False)
+    bookings = db.Column(db.Integer, nullable=False, default=0)
+    spend_sketch = db.Column(db.LargeBinary, nullable=False)  # QuantileSketch of total_amount
+    guest_sketch = db.Column(db.LargeBinary, nullable=False)  # HyperLogLog of customer_id
+
+def _booked_room(connection, room_id):
+    # Sketches and rollups both take the hotel from the booked room, so the
+    # per-hotel filters of the revenue endpoints see the same bookings
+    rooms = Room.__table__
+    return connection.execute(
+        db.select(rooms.c.hotel_id, rooms.c.room_type).where(rooms.c.id == room_id)
+    ).first()
+
+@event.listens_for(Booking, 'after_insert')
+def add_booking_to_sketch(mapper, connection, booking):
+    # Runs inside the insert's transaction, which already holds the write
+    # lock, so the read-modify-write below cannot race another insert.
+    table = BookingSketch.__table__
+    room = _booked_room(connection, booking.room_id)
+    hotel_id = room.hotel_id if room else None
+    day = booking.check_in.date()
+    # == None compiles to IS NULL, so bookings of an unknown room match too
+    row = connection.execute(
+        table.select().where(table.c.hotel_id == hotel_id, table.c.day == day)
+    ).first()
+    if row is None:
+        spend, guests, bookings = QuantileSketch(), HyperLogLog(), 0
+    else:
+        spend = QuantileSketch.from_bytes(row.spend_sketch)
+        guests = HyperLogLog.from_bytes(row.guest_sketch)
+        bookings = row.bookings
+    spend.add(booking.total_amount)
+    guests.add(booking.customer_id)
+    values = {'bookings': bookings + 1, 'spend_sketch': spend.to_bytes(), 'guest_sketch': guests.to_bytes()}
+    if row is None:
+        connection.execute(table.insert().values(hotel_id=hotel_id, day=day, **values))
+    else:
+        connection.execute(table.update().where(table.c.id == row.id).values(**values))
+
+def rebuild_booking_sketches(session):
+    """Recompute every sketch from the bookings table, e.g. after edits or deletes."""
+    sketches = {}
+    rows = session.query(
+        Room.hotel_id, Booking.check_in, Booking.total_amount, Booking.customer_id
+    ).outerjoin(Room, Room.id == Booking.room_id)
+    for hotel_id, check_in, total_amount, customer_id in rows.yield_per(10000):
+        key = (hotel_id, check_in.date())
+        if key not in sketches:
+            sketches[key] = [QuantileSketch(), HyperLogLog(), 0]
+        sketch = sketches[key]
+        sketch[0].add(total_amount)
+        sketch[1].add(customer_id)
+        sketch[2] += 1
+    session.query(BookingSketch).delete()
+    session.add_all(
+        BookingSketch(hotel_id=hotel_id, day=day, bookings=bookings,
+                      spend_sketch=spend.to_bytes(), guest_sketch=guests.to_bytes())
+        for (hotel_id, day), (spend, guests, bookings) in sketches.items()
+    )
+    session.commit()
+    return len(sketches)
+
+class BookingRollup(db.Model):
+    """Booking counts and revenue per check-in day and dimension combination.
+
+    The dimensions are the hotel and room type of the booked room, the
+    customer's type and country, and the booking channel. The revenue and
+    channel endpoints read these instead of joining the bookings table, so
+    they cost what the number of days and combinations costs. Each row also
+    carries the week, month, quarter and year keys of its day, which the
+    revenue trend groups by.
+
+    ORM inserts, updates and deletes of bookings keep the rollups in step.
+    Bulk statements, and edits to a room's type or a customer's type or
+    country, are not reflected until ``rebuild_booking_rollups`` runs.
+    """
+    __tablename__ = 'booking_rollups'
+    __table_args__ = (
+        db.UniqueConstraint('day', 'hotel_id', 'room_type', 'customer_type', 'country', 'booking_channel'),
+        # Covering indexes, read in group order by the revenue and channel endpoints
+        db.Index('ix_booking_rollups_customer_type', 'customer_type', 'hotel_id', 'revenue'),
+        db.Index('ix_booking_rollups_country', 'country', 'hotel_id', 'revenue'),
+        db.Index('ix_booking_rollups_channel', 'booking_channel', 'bookings', 'revenue'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)
+    hotel_id = db.Column(db.Integer, db.ForeignKey('hotels.id'))
+    room_type = db.Column(db.String(50))
+    customer_type = db.Column(db.String(50))
+    country = db.Column(db.String(100))
+    booking_channel = db.Column(db.String(50))
+    bookings = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+    week = db.Column(db.String(8))
+    month = db.Column(db.String(7))
+    quarter = db.Column(db.String(7))
+    year = db.Column(db.String(4))
+
+ROLLUP_PERIODS = ('week', 'month', 'quarter', 'year')
+
+# The day is its own day key
+store_buckets(BookingRollup.day, {'day': BookingRollup.day,
+                                  **{period: getattr(BookingRollup, period) for period in ROLLUP_PERIODS}})
+
+# The revenue trend groups by one of the period keys and reads the index in
+# key order, with no sort and no per-row date function
+db.Index('ix_booking_rollups_day', BookingRollup.day, BookingRollup.hotel_id, BookingRollup.revenue)
+for _period in ROLLUP_PERIODS:
+    db.Index(f'ix_booking_rollups_{_period}', getattr(BookingRollup, _period),
+             BookingRollup.day, BookingRollup.hotel_id, BookingRollup.revenue)
+
+# Booking columns that decide a booking's rollup row or its share of it
+ROLLUP_COLUMNS = ('check_in', 'room_id', 'customer_id', 'booking_channel', 'total_amount')
+
+def _rollup_key(connection, check_in, room_id, customer_id, booking_channel):
+    customers = Customer.__table__
+    room = _booked_room(connection, room_id)
+    customer = connection.execute(
+        db.select(customers.c.customer_type, customers.c.country).where(customers.c.id == customer_id)
+    ).first()
+    return {
+        'day': check_in.date(),
+        'hotel_id': room.hotel_id if room else None,
+        'room_type': room.room_type if room else None,
+        'customer_type': customer.customer_type if customer else None,
+        'country': customer.country if customer else None,
+        'booking_channel': booking_channel,
+    }
+
+def _add_to_rollup(connection, key, bookings, revenue):
+    # Like the sketch hook, this runs inside the flush's transaction, which
+    # holds the write lock, so the read-modify-write cannot race another one
+    table = BookingRollup.__table__
+    # == None compiles to IS NULL, so missing dimensions match too
+    row = connection.execute(
+        db.select(table.c.id, table.c.bookings, table.c.revenue).where(
+            *(table.c[name] == value for name, value in key.items()))
+    ).first()
+    if row is None:
+        connection.execute(table.insert().values(
+            bookings=bookings, revenue=revenue, **key, **period_keys(key['day'], ROLLUP_PERIODS)))
+    elif row.bookings + bookings == 0:
+        connection.execute(table.delete().where(table.c.id == row.id))
+    else:
+        connection.execute(table.update().where(table.c.id == row.id).values(
+            bookings=row.bookings + bookings, revenue=row.revenue + revenue))
+
+def _rollup_changed(booking):
+    state = db.inspect(booking)
+    return any(state.attrs[name].history.has_changes() for name in ROLLUP_COLUMNS)
+
+def _remove_stored_booking(connection, booking_id):
+    # The old values come from the row itself: an attribute that was
+    # expired when it was set keeps no history of its previous value
+    table = Booking.__table__
+    old = connection.execute(
+        db.select(*(table.c[name] for name in ROLLUP_COLUMNS)).where(table.c.id == booking_id)
+    ).first()
+    if old is not None:
+        key = _rollup_key(connection, old.check_in, old.room_id, old.customer_id, old.booking_channel)
+        _add_to_rollup(connection, key, -1, -old.total_amount)
+
+def _add_booking(connection, booking):
+    key = _rollup_key(connection, booking.check_in, booking.room_id, booking.customer_id, booking.booking_channel)
+    _add_to_rollup(connection, key, 1, booking.total_amount)
+
+@event.listens_for(Booking, 'after_insert')
+def add_booking_to_rollup(mapper, connection, booking):
+    _add_booking(connection, booking)
+
+# An update moves the booking from its old rollup row to its new one. The old
+# row is read before the UPDATE overwrites it, the new one after.
+@event.listens_for(Booking, 'before_update')
+def remove_old_booking_from_rollup(mapper, connection, booking):
+    if _rollup_changed(booking):
+        _remove_stored_booking(connection, booking.id)
+
+@event.listens_for(Booking, 'after_update')
+def add_new_booking_to_rollup(mapper, connection, booking):
+    if _rollup_changed(booking):
+        _add_booking(connection, booking)
+
+# Read before the DELETE, while the row still exists
+@event.listens_for(Booking, 'before_delete')
+def remove_booking_from_rollup(mapper, connection, booking):
+    _remove_stored_booking(connection, booking.id)
+
+def rebuild_booking_rollups(session):
+    """Recompute every rollup from the bookings table, e.g. to backfill them."""
+    day = func.date(Booking.check_in)
+    dimensions = [day, Room.hotel_id, Room.room_type, Customer.customer_type, Customer.country,
+                  Booking.booking_channel]
+    rows = session.query(
+        *dimensions, func.count(Booking.id), func.sum(Booking.total_amount)
+    ).outerjoin(Room, Room.id == Booking.room_id).outerjoin(
+        Customer, Customer.id == Booking.customer_id
+    ).group_by(*dimensions)
+    names = ('day', 'hotel_id', 'room_type', 'customer_type', 'country', 'booking_channel', 'bookings', 'revenue')
+    rollups = [dict(zip(names, row)) for row in rows]
+    for rollup in rollups:
+        # SQLite's date() returns text
+        if isinstance(rollup['day'], str):
+            rollup['day'] = date.fromisoformat(rollup['day'])
+        rollup.update(period_keys(rollup['day'], ROLLUP_PERIODS))
+    session.query(BookingRollup).delete()
+    if rollups:
+        session.execute(BookingRollup.__table__.insert(), rollups)
+    session.commit()
+    return len(rollups)
+
 class ServiceRequest(db.Model):
     __tablename__ = 'service_requests'
+    __table_args__ = (db.Index('ix_service_requests_type', 'request_type', 'created_at', 'completed_at'),)
     
     id = db.Column(db.Integer, primary_key=True)
     booking_id = db.Column(db.Integer, db.ForeignKey('bookings.id'), nullable=False)
@@ -82,6 +348,7 @@ class ServiceRequest(db.Model):
 
 class MaintenanceRecord(db.Model):
     __tablename__ = 'maintenance_records'
+    __table_args__ = (db.Index('ix_maintenance_records_type', 'maintenance_type', 'cost'),)
     
     id = db.Column(db.Integer, primary_key=True)
     room_id = db.Column(db.Integer, db.ForeignKey('rooms.id'), nullable=False)
@@ -103,6 +370,37 @@ class CustomerFeedback(db.Model):
     comment = db.Column(db.Text)
     category = db.Column(db.String(50))  # Service, Cleanliness, Value, etc.
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Period keys of created_at (see app.buckets), set on every write; the
+    # satisfaction trend groups by the one its period select names
+    created_day = db.Column(db.String(10))
+    created_week = db.Column(db.String(8))
+    created_month = db.Column(db.String(7))
+    created_quarter = db.Column(db.String(7))
+    created_year = db.Column(db.String(4))
+
+store_buckets(CustomerFeedback.created_at,
+              {period: getattr(CustomerFeedback, f'created_{period}') for period in PERIODS})
+
+# Average rating per period, read from the index in key order
+for _period in PERIODS:
+    db.Index(f'ix_customer_feedback_{_period}', getattr(CustomerFeedback, f'created_{_period}'),
+             CustomerFeedback.rating)
+
+def _set_feedback_keys(feedback):
+    for period, key in period_keys(feedback.created_at).items():
+        setattr(feedback, f'created_{period}', key)
+
+@event.listens_for(CustomerFeedback, 'before_insert')
+def set_new_feedback_keys(mapper, connection, feedback):
+    # As for bookings, the column default would apply too late for the keys
+    if feedback.created_at is None:
+        feedback.created_at = datetime.utcnow()
+    _set_feedback_keys(feedback)
+
+@event.listens_for(CustomerFeedback, 'before_update')
+def set_changed_feedback_keys(mapper, connection, feedback):
+    if db.inspect(feedback).attrs.created_at.history.has_changes():
+        _set_feedback_keys(feedback)
 
 class Staff(db.Model):
     __tablename__ = 'staff'
@@ -115,4 +413,7 @@ class Staff(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationships
-    service_requests = db.relationship('ServiceRequest', backref='staff', lazy=True) 
\ No newline at end of file
+    # Requests name their assignee in ServiceRequest.assigned_to; there is no foreign key
+    service_requests = db.relationship(
+        'ServiceRequest', primaryjoin='Staff.name == foreign(ServiceRequest.assigned_to)',
+        backref=db.backref('staff', viewonly=True), lazy=True, viewonly=True)
\ No newline at end of file
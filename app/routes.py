@@ -1,8 +1,11 @@
 from flask import Blueprint, render_template, jsonify, request
-from app.models import Hotel, Room, Customer, Booking, ServiceRequest, MaintenanceRecord, CustomerFeedback, Staff
+from app.models import Hotel, Room, Customer, Booking, BookingRollup, BookingSketch, ServiceRequest, MaintenanceRecord, CustomerFeedback, Staff
+from app.buckets import period_bucket
+from app.sketches import HyperLogLog, QuantileSketch
 from app import db
-from sqlalchemy import func
+from sqlalchemy import case, func
 from datetime import datetime, timedelta
+import numpy as np
 
 main = Blueprint('main', __name__)
 
@@ -25,27 +28,29 @@ def dashboard5():
 # API endpoints for Revenue Management Dashboard
 @main.route('/api/revenue/trend')
 def revenue_trend():
-    period = request.args.get('period', 'month')
     hotel_type = request.args.get('hotel_type', 'all')
+    try:
+        bucket = period_bucket(BookingRollup.day, request.args.get('period', 'month'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
+    # Daily rollups rather than bookings: the cost follows the number of days,
+    # grouped by their stored period key
     query = db.session.query(
-        func.date(Booking.check_in).label('date'),
-        func.sum(Booking.total_amount).label('revenue')
+        func.date(func.min(BookingRollup.day)).label('date'),
+        func.sum(BookingRollup.revenue).label('revenue')
     )
     
     if hotel_type != 'all':
-        query = query.join(Room).join(Hotel).filter(Hotel.type == hotel_type)
+        query = query.join(Hotel, Hotel.id == BookingRollup.hotel_id).filter(Hotel.type == hotel_type)
     
-    if period == 'month':
-        query = query.group_by(func.strftime('%Y-%m', Booking.check_in))
-    else:  # week
-        query = query.group_by(func.strftime('%Y-%W', Booking.check_in))
+    query = query.group_by(bucket).order_by(bucket)
     
     results = query.all()
     
     return jsonify({
         'dates': [r.date for r in results],
-        'revenue': [float(r.revenue) for r in results]
+        'revenue': [r.revenue for r in results]
     })
 
 @main.route('/api/revenue/segments')
@@ -53,18 +58,18 @@ def revenue_segments():
     hotel_type = request.args.get('hotel_type', 'all')
     
     query = db.session.query(
-        Customer.customer_type,
-        func.sum(Booking.total_amount).label('revenue')
-    ).join(Booking).join(Room).join(Hotel)
+        BookingRollup.customer_type,
+        func.sum(BookingRollup.revenue).label('revenue')
+    ).join(Hotel, Hotel.id == BookingRollup.hotel_id)
     
     if hotel_type != 'all':
         query = query.filter(Hotel.type == hotel_type)
     
-    results = query.group_by(Customer.customer_type).all()
+    results = query.group_by(BookingRollup.customer_type).all()
     
     return jsonify({
         'segments': [r.customer_type for r in results],
-        'revenue': [float(r.revenue) for r in results]
+        'revenue': [r.revenue for r in results]
     })
 
 @main.route('/api/revenue/geographic')
@@ -72,21 +77,70 @@ def revenue_geographic():
     hotel_type = request.args.get('hotel_type', 'all')
     
     query = db.session.query(
-        Customer.country,
-        func.sum(Booking.total_amount).label('revenue')
-    ).join(Booking).join(Room).join(Hotel)
+        BookingRollup.country,
+        func.sum(BookingRollup.revenue).label('revenue')
+    ).join(Hotel, Hotel.id == BookingRollup.hotel_id)
     
     if hotel_type != 'all':
         query = query.filter(Hotel.type == hotel_type)
     
-    results = query.group_by(Customer.country).all()
+    results = query.group_by(BookingRollup.country).all()
     
     return jsonify({
         'countries': [r.country for r in results],
-        'revenue': [float(r.revenue) for r in results]
+        'revenue': [r.revenue for r in results]
+    })
+
+# Merge the stored per-hotel, per-day sketches for a hotel type and check-in
+# date range (inclusive). Cost depends on the number of days, not bookings.
+def merge_booking_sketches(hotel_type='all', start=None, end=None):
+    query = db.session.query(BookingSketch.spend_sketch, BookingSketch.guest_sketch)
+    
+    if hotel_type != 'all':
+        query = query.join(Hotel, Hotel.id == BookingSketch.hotel_id).filter(Hotel.type == hotel_type)
+    if start:
+        query = query.filter(BookingSketch.day >= datetime.strptime(start, '%Y-%m-%d').date())
+    if end:
+        query = query.filter(BookingSketch.day <= datetime.strptime(end, '%Y-%m-%d').date())
+    
+    spend, guests = QuantileSketch(), HyperLogLog()
+    for spend_sketch, guest_sketch in query.all():
+        spend.merge(QuantileSketch.from_bytes(spend_sketch))
+        guests.merge(HyperLogLog.from_bytes(guest_sketch))
+    return spend, guests
+
+@main.route('/api/revenue/spend-percentiles')
+def spend_percentiles():
+    try:
+        spend, _ = merge_booking_sketches(
+            request.args.get('hotel_type', 'all'), request.args.get('start'), request.args.get('end'))
+    except ValueError:
+        return jsonify({'error': 'start and end must be YYYY-MM-DD dates'}), 400
+    
+    return jsonify({
+        'bookings': spend.count,
+        'p50': spend.quantile(0.5),
+        'p90': spend.quantile(0.9),
+        'p99': spend.quantile(0.99),
+        # Each percentile is within this fraction of the exact value
+        'relative_error': spend.alpha
     })
 
 # API endpoints for Customer Insights Dashboard
+@main.route('/api/customers/unique-guests')
+def unique_guests():
+    try:
+        _, guests = merge_booking_sketches(
+            request.args.get('hotel_type', 'all'), request.args.get('start'), request.args.get('end'))
+    except ValueError:
+        return jsonify({'error': 'start and end must be YYYY-MM-DD dates'}), 400
+    
+    return jsonify({
+        'unique_guests': round(guests.estimate()),
+        # One standard error, relative to the estimate
+        'standard_error': round(guests.standard_error, 4)
+    })
+
 @main.route('/api/customers/segmentation')
 def customer_segmentation():
     query = db.session.query(
@@ -100,37 +154,42 @@ def customer_segmentation():
     return jsonify({
         'segments': [r.customer_type for r in results],
         'counts': [r.count for r in results],
-        'avg_spend': [float(r.avg_spend) for r in results]
+        'avg_spend': [r.avg_spend for r in results]
     })
 
 @main.route('/api/customers/satisfaction')
 def customer_satisfaction():
+    try:
+        bucket = period_bucket(CustomerFeedback.created_at, request.args.get('period', 'month'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
     query = db.session.query(
-        func.strftime('%Y-%m', CustomerFeedback.created_at).label('month'),
+        bucket.label('month'),
         func.avg(CustomerFeedback.rating).label('avg_rating')
-    ).group_by(func.strftime('%Y-%m', CustomerFeedback.created_at))
+    ).group_by(bucket).order_by(bucket)
     
     results = query.all()
     
     return jsonify({
         'months': [r.month for r in results],
-        'ratings': [float(r.avg_rating) for r in results]
+        'ratings': [r.avg_rating for r in results]
     })
 
 @main.route('/api/customers/channels')
 def booking_channels():
     query = db.session.query(
-        Booking.booking_channel,
-        func.count(Booking.id).label('count'),
-        func.avg(Booking.total_amount).label('avg_amount')
-    ).group_by(Booking.booking_channel)
+        BookingRollup.booking_channel,
+        func.sum(BookingRollup.bookings).label('count'),
+        (func.sum(BookingRollup.revenue) / func.sum(BookingRollup.bookings)).label('avg_amount')
+    ).group_by(BookingRollup.booking_channel)
     
     results = query.all()
     
     return jsonify({
         'channels': [r.booking_channel for r in results],
         'counts': [r.count for r in results],
-        'avg_amounts': [float(r.avg_amount) for r in results]
+        'avg_amounts': [r.avg_amount for r in results]
     })
 
 # API endpoints for Operational Efficiency Dashboard
@@ -139,14 +198,15 @@ def room_utilization():
     query = db.session.query(
         Room.room_type,
         func.count(Room.id).label('total_rooms'),
-        func.sum(case([(Room.status == 'occupied', 1)], else_=0)).label('occupied_rooms')
+        func.sum(case((Room.status == 'occupied', 1), else_=0)).label('occupied_rooms')
     ).group_by(Room.room_type)
     
     results = query.all()
     
     return jsonify({
         'room_types': [r.room_type for r in results],
-        'utilization': [float(r.occupied_rooms) / float(r.total_rooms) * 100 for r in results]
+        'utilization': 100 * np.array([r.occupied_rooms for r in results], dtype=float)
+                       / np.array([r.total_rooms for r in results], dtype=float)
     })
 
 @main.route('/api/operations/service-requests')
@@ -162,7 +222,7 @@ def service_requests():
     return jsonify({
         'request_types': [r.request_type for r in results],
         'counts': [r.count for r in results],
-        'avg_response_times': [float(r.avg_response_time) for r in results]
+        'avg_response_times': [r.avg_response_time for r in results]
     })
 
 @main.route('/api/operations/maintenance')
@@ -178,5 +238,5 @@ def maintenance_metrics():
     return jsonify({
         'maintenance_types': [r.maintenance_type for r in results],
         'counts': [r.count for r in results],
-        'avg_costs': [float(r.avg_cost) for r in results]
+        'avg_costs': [r.avg_cost for r in results]
     }) 
\ No newline at end of file
@@ -1,6 +1,7 @@
 from flask import Blueprint, render_template
 from flask_login import login_required
 from app.models import Booking, Room
+from app.buckets import period_bucket, period_key
 from app import db
 from sqlalchemy import func
 from datetime import datetime, timedelta
@@ -33,14 +34,16 @@ def index():
     not_cancelled = total_bookings - cancelled
     cancellation_data = [not_cancelled, cancelled]
     
-    # Get monthly revenue
+    # Get monthly revenue; the month bound lets the stored month index seek
     six_months_ago = datetime.now() - timedelta(days=180)
+    month = period_bucket(Booking.created_at, 'month')
     monthly_revenue = db.session.query(
-        func.strftime('%Y-%m', Booking.created_at),
+        month,
         func.sum(Booking.total_amount)
-    ).filter(Booking.created_at >= six_months_ago).group_by(
-        func.strftime('%Y-%m', Booking.created_at)
-    ).all()
+    ).filter(
+        month >= period_key(six_months_ago, 'month'),
+        Booking.created_at >= six_months_ago
+    ).group_by(month).order_by(month).all()
     
     monthly_labels = [mr[0] for mr in monthly_revenue]
     monthly_revenue_data = [float(mr[1]) for mr in monthly_revenue]
@@ -0,0 +1,104 @@
+"""Fast JSON encoding for pandas, NumPy and plain Python payloads.
+
+Payloads can carry Series, Index, DataFrame and ndarray values straight from
+the aggregation step. Numeric arrays are cleaned in one vectorised pass
+(NaN and +/-inf become ``fill``, null by default) and, when ``orjson`` is
+installed, encoded natively without being turned into Python lists first.
+Without orjson the same payloads go through the standard library encoder.
+
+Installing ``FastJSONProvider`` on an app routes ``jsonify``, ``tojson`` in
+templates and returned dicts through this module.
+"""
+import json
+import math
+from datetime import date
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Array kinds orjson serialises natively: bool, int, uint, float
+NATIVE_KINDS = 'biuf'
+
+
+def _prepare_array(array, fill):
+    kind = array.dtype.kind
+    if kind == 'f':
+        finite = np.isfinite(array)
+        if not finite.all():
+            if fill is None:
+                return np.where(finite, array, None).tolist()
+            array = np.where(finite, array, fill)
+    elif kind == 'M':
+        return np.datetime_as_string(array).tolist()
+    elif kind not in NATIVE_KINDS:
+        return [prepare(item, fill) for item in array.tolist()]
+    if orjson is not None and array.ndim:
+        return np.ascontiguousarray(array)
+    return array.tolist()
+
+
+def prepare(value, fill=None):
+    """Turn ``value`` into something the JSON encoder accepts.
+
+    A DataFrame becomes a dict of column lists, a Series or Index a list, and
+    NumPy scalars their Python equivalents. Dates are ISO 8601 strings.
+    """
+    if isinstance(value, dict):
+        return {prepare(key): prepare(item, fill) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [prepare(item, fill) for item in value]
+    if isinstance(value, pd.DataFrame):
+        return {str(column): prepare(value[column], fill) for column in value.columns}
+    if isinstance(value, (pd.Series, pd.Index)):
+        return _prepare_array(value.to_numpy(), fill)
+    if isinstance(value, np.ndarray):
+        return _prepare_array(value, fill)
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return fill
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def _default(value):
+    # SQL aggregates come back as Decimal on some databases
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def dumps(value, fill=None, sort_keys=True):
+    """Encode ``value`` to JSON bytes."""
+    value = prepare(value, fill)
+    if orjson is not None:
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(value, default=_default, option=option)
+    return json.dumps(value, default=_default, sort_keys=sort_keys, allow_nan=False,
+                      separators=(',', ':')).encode('utf-8')
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by ``dumps``, for ``app.json``."""
+
+    def dumps(self, obj, **kwargs):
+        return dumps(obj, sort_keys=kwargs.get('sort_keys', self.sort_keys)).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj, sort_keys=self.sort_keys), mimetype=self.mimetype)
@@ -0,0 +1,46 @@
+"""Diff two benchmark result files from ``benchmarks.endpoints``.
+
+Usage: python -m benchmarks.compare base.json head.json [threshold]
+
+Prints the median latency of every case in both runs and the ratio
+head/base. Exits with status 1 when any case is slower than ``threshold``
+(default 1.10, i.e. 10% slower), so it can gate a CI job.
+"""
+import json
+import sys
+
+
+def _cases(path):
+    with open(path) as f:
+        report = json.load(f)
+    return report, {(r['size'], r['endpoint'], r['filters']): r for r in report['results']}
+
+
+def compare(base_path, head_path, threshold=1.10):
+    base, base_cases = _cases(base_path)
+    head, head_cases = _cases(head_path)
+    print(f"base {base.get('commit') or base_path}\nhead {head.get('commit') or head_path}\n")
+    print(f"{'size':>5s} {'endpoint':26s} {'filters':36s} {'base ms':>9s} {'head ms':>9s} {'ratio':>7s}")
+    regressions = []
+    for key, result in head_cases.items():
+        if key not in base_cases:
+            continue
+        before = base_cases[key]['median_ms']
+        after = result['median_ms']
+        ratio = after / before if before else float('inf')
+        flag = ' !' if ratio > threshold else ''
+        print(f'{key[0]:>5s} {key[1]:26s} {key[2]:36s} {before:9.3f} {after:9.3f} {ratio:6.2f}x{flag}')
+        if ratio > threshold:
+            regressions.append(key)
+    return regressions
+
+
+def main(base_path, head_path, threshold='1.10'):
+    regressions = compare(base_path, head_path, float(threshold))
+    if regressions:
+        print(f'\n{len(regressions)} case(s) slower than {threshold}x')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
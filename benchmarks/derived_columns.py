@@ -0,0 +1,90 @@
+"""Before/after latency of the revenue aggregations rewritten on derived columns.
+
+Usage: python -m benchmarks.derived_columns [path/to/hotel_booking_cleaned.csv]
+"""
+import sys
+import timeit
+import warnings
+
+import pandas as pd
+
+from analytics import FilterIndex, MONTHS, derive_columns
+
+FILTERS = [
+    ('All Hotels', 'All Years', 'All Months'),
+    ('City Hotel', '2016', 'All Months'),
+    ('Resort Hotel', '2017', 'August'),
+]
+
+
+def _nights(df):
+    return df['stays_in_weekend_nights'] + df['stays_in_week_nights']
+
+
+# Aggregations as they were written before the derived columns existed
+def kpi_revenue_before(df):
+    return (df['adr'] * _nights(df)).sum()
+
+
+def revenue_data_before(df):
+    return df.groupby('arrival_date_month').apply(
+        lambda x: (x['adr'] * (x['stays_in_weekend_nights'] + x['stays_in_week_nights'])).sum()
+    ).reindex(MONTHS, fill_value=0)
+
+
+def channel_revenue_before(df):
+    return df.groupby('distribution_channel').apply(
+        lambda x: (x['adr'] * (x['stays_in_weekend_nights'] + x['stays_in_week_nights'])).sum()
+    )
+
+
+def streamlit_channel_revenue_before(df):
+    df = df.copy()
+    df['revenue'] = df['adr'] * _nights(df)
+    return df.groupby('distribution_channel')['revenue'].sum()
+
+
+# The same aggregations over the derived columns
+def kpi_revenue_after(df):
+    return df['revenue'].sum()
+
+
+def revenue_data_after(df):
+    return df.groupby('arrival_date_month')['revenue'].sum().reindex(MONTHS, fill_value=0)
+
+
+def channel_revenue_after(df):
+    return df.groupby('distribution_channel')['revenue'].sum()
+
+
+CASES = [
+    ('/kpi_data total_revenue', kpi_revenue_before, kpi_revenue_after),
+    ('/revenue_data', revenue_data_before, revenue_data_after),
+    ('/dashboard2 revenue_by_channel', channel_revenue_before, channel_revenue_after),
+    ('streamlit dashboard2 revenue', streamlit_channel_revenue_before, channel_revenue_after),
+]
+
+
+def best_of(func, df, repeat=5, number=10):
+    return min(timeit.repeat(lambda: func(df), repeat=repeat, number=number)) / number
+
+
+def main(path='hotel_booking_cleaned.csv'):
+    # The "before" groupby.apply calls trigger pandas deprecation noise
+    warnings.simplefilter('ignore', DeprecationWarning)
+    raw = pd.read_csv(path)
+    derived = derive_columns(raw.copy())
+    raw_index = FilterIndex(raw)
+    derived_index = FilterIndex(derived)
+
+    print(f"{'endpoint':34s} {'filters':38s} {'before ms':>10s} {'after ms':>10s} {'speedup':>8s}")
+    for name, before, after in CASES:
+        for hotel, year, month in FILTERS:
+            before_ms = best_of(before, raw_index.filter(hotel, year, month)) * 1000
+            after_ms = best_of(after, derived_index.filter(hotel, year, month)) * 1000
+            label = f'{hotel} / {year} / {month}'
+            print(f'{name:34s} {label:38s} {before_ms:10.3f} {after_ms:10.3f} {before_ms / after_ms:7.1f}x')
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,185 @@
+"""Latency of every dashboard endpoint across dataset sizes.
+
+Usage: python -m benchmarks.endpoints results.json [SIZE ...]
+
+Sizes default to 100k and 1m (10m works too, given the disk and memory).
+Missing datasets are generated into ``benchmarks/data`` first. Each endpoint
+is requested through the app's own view, with the response cache emptied
+before every call, so a timing covers filtering, aggregation, serialisation
+and (for /dashboard2) template rendering. Results are written as JSON; diff
+two runs with ``python -m benchmarks.compare``. Set ``DATASET_BACKEND=sqlite``
+to time the SQLite backend instead of the in-memory one.
+
+The SQL endpoints of ``app.routes`` are timed too, with the parameter sets
+of ``benchmarks.query_plans``, against a synthetic SQLite database of the
+same size (``hotel_booking_<SIZE>.db``) set up as that check sets it up:
+with the model indexes, filled rollups and fresh statistics.
+"""
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from analytics import open_datasets
+from benchmarks import query_plans
+from benchmarks.generate import DEFAULT_OUT_DIR, parse_size, write_csv
+
+DEFAULT_SIZES = ['100k', '1m']
+REPEAT = 7
+
+ENDPOINTS = [
+    '/kpi_data', '/hotel_data', '/cancellation_data', '/revenue_data', '/top_countries_data',
+    '/api/dashboard1/bundle', '/market_segment_data', '/customer_type_data',
+    '/api/lead_adr_density', '/dashboard2',
+]
+
+# hotel, year, month and an optional inclusive arrival date range
+FILTERS = [
+    ('All Hotels', 'All Years', 'All Months', None, None),
+    ('City Hotel', '2016', 'All Months', None, None),
+    ('Resort Hotel', '2017', 'August', None, None),
+    ('All Hotels', 'All Years', 'All Months', '2016-07-01', '2016-09-30'),
+]
+
+
+def dataset_path(size, data_dir=DEFAULT_OUT_DIR):
+    path = os.path.join(data_dir, f'hotel_booking_{size}.csv')
+    if not os.path.exists(path):
+        os.makedirs(data_dir, exist_ok=True)
+        print(f'generating {path}', file=sys.stderr)
+        write_csv(parse_size(size), path)
+    return path
+
+
+def load_app(path):
+    """Import app.py the way wsgi.py does, serving the dataset at ``path``."""
+    saved = {name: os.environ.get(name) for name in ('DATASET_PATH', 'DATASET_WATCH_INTERVAL')}
+    os.environ['DATASET_PATH'] = path
+    os.environ['DATASET_WATCH_INTERVAL'] = '0'
+    try:
+        import wsgi
+    finally:
+        # The app reads these once, at import
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+    return sys.modules['dashboard_app']
+
+
+@contextmanager
+def serving(dashboard, path):
+    """Serve the dataset at ``path`` from the imported app, then put its own back.
+
+    The swapped-in manager is built with the app's backend and worker
+    settings, and its worker pool, if any, is shut down on the way out.
+    """
+    config = dashboard.app.config
+    original = dashboard.datasets
+    datasets = open_datasets(path, config['DATASET_BACKEND'], workers=config['DATASET_WORKERS'])
+    dashboard.datasets = datasets
+    try:
+        yield datasets
+    finally:
+        dashboard.datasets = original
+        if getattr(datasets, 'pool', None) is not None:
+            datasets.pool.shutdown()
+
+
+def time_request(client, cache, url, query, repeat=REPEAT):
+    samples = []
+    for _ in range(repeat + 1):
+        if cache is not None:
+            cache.clear()
+        start = time.perf_counter()
+        response = client.get(url, query_string=query)
+        samples.append(time.perf_counter() - start)
+        if response.status_code != 200:
+            raise RuntimeError(f'{url} {query}: HTTP {response.status_code}')
+    # The first call warms up lazily built state and is dropped
+    samples = np.array(samples[1:]) * 1000
+    return {
+        'min_ms': round(float(samples.min()), 4),
+        'median_ms': round(float(np.median(samples)), 4),
+        'mean_ms': round(float(samples.mean()), 4),
+        'stdev_ms': round(statistics.stdev(samples), 4) if len(samples) > 1 else 0.0,
+        'bytes': len(response.get_data()),
+    }
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run_sql(size, repeat=REPEAT, data_dir=DEFAULT_OUT_DIR):
+    """Time the ``app.routes`` SQL endpoints on the SQLite database of ``size``."""
+    from app.models import Booking
+
+    app, db = query_plans.make_app(query_plans.database_path(size, data_dir))
+    client = app.test_client()
+    with app.app_context():
+        rows = db.session.query(Booking.id).count()
+    results = []
+    for url, query in query_plans.ENDPOINTS:
+        # The routes cache nothing, so every call runs its queries
+        timing = time_request(client, None, url, query, repeat)
+        filters = ' / '.join(f'{name}={value}' for name, value in query.items()) or 'none'
+        results.append({'size': size, 'rows': rows, 'endpoint': url, 'filters': filters, **timing})
+        print(f"{size:>5s} {url:26s} {filters:36s} {timing['median_ms']:10.3f} ms", file=sys.stderr)
+    return results
+
+
+def run(sizes=DEFAULT_SIZES, repeat=REPEAT, data_dir=DEFAULT_OUT_DIR):
+    paths = [dataset_path(size, data_dir) for size in sizes]
+    dashboard = load_app(paths[0]) if paths else None
+    results = []
+    for size, path in zip(sizes, paths):
+        with serving(dashboard, path) as datasets:
+            client = dashboard.app.test_client()
+            rows = len(datasets.current)
+            for url in ENDPOINTS:
+                for hotel, year, month, start, end in FILTERS:
+                    query = {'hotel': hotel, 'year': year, 'month': month}
+                    filters = f'{hotel} / {year} / {month}'
+                    if start:
+                        query.update(start=start, end=end)
+                        filters += f' / {start}..{end}'
+                    timing = time_request(client, dashboard.response_cache, url, query, repeat)
+                    results.append({'size': size, 'rows': rows, 'endpoint': url, 'filters': filters, **timing})
+                    print(f"{size:>5s} {url:26s} {results[-1]['filters']:36s} {timing['median_ms']:10.3f} ms",
+                          file=sys.stderr)
+        results.extend(run_sql(size, repeat, data_dir))
+    return {
+        'commit': _commit(),
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'backend': dashboard.app.config['DATASET_BACKEND'] if dashboard else None,
+        'repeat': repeat,
+        'results': results,
+    }
+
+
+def main(out='benchmark_results.json', *sizes):
+    report = run(list(sizes) or DEFAULT_SIZES)
+    with open(out, 'w') as f:
+        json.dump(report, f, indent=1)
+    print(out)
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
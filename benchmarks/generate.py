@@ -0,0 +1,248 @@
+"""Synthetic booking datasets at benchmark scale.
+
+Usage: python -m benchmarks.generate SIZE [out_dir] [csv|sqlite|both]
+
+SIZE is a row count or one of 100k, 1m, 10m. Writes
+``hotel_booking_<size>.csv`` in the ``hotel_booking_cleaned.csv`` schema
+and/or ``hotel_booking_<size>.db`` with the ``app.models`` tables, into
+``benchmarks/data`` by default. Rows are generated in chunks with numpy, so
+memory stays flat at 10M rows, and the same seed gives the same data.
+
+The distributions follow the Kaggle hotel booking data: two thirds of
+bookings at the City Hotel, summer-peaked seasonality, Zipf-skewed source
+countries, repeat guests, long-tailed lead times and prices, and cancellation
+odds that grow with lead time and non-refundable deposits.
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+SIZES = {'100k': 100_000, '1m': 1_000_000, '10m': 10_000_000}
+CHUNK_ROWS = 500_000
+DEFAULT_OUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+HOTELS = ['City Hotel', 'Resort Hotel']
+HOTEL_WEIGHTS = [0.66, 0.34]
+YEARS = [2015, 2016, 2017]
+YEAR_WEIGHTS = [0.18, 0.48, 0.34]
+MONTH_NAMES = ['January', 'February', 'March', 'April', 'May', 'June', 'July',
+               'August', 'September', 'October', 'November', 'December']
+MONTH_WEIGHTS = [0.050, 0.068, 0.082, 0.093, 0.099, 0.092, 0.106, 0.116, 0.088, 0.093, 0.057, 0.056]
+# Ordered by frequency; drawn with Zipf-like weights so a few countries dominate
+COUNTRIES = [
+    'PRT', 'GBR', 'FRA', 'ESP', 'DEU', 'ITA', 'IRL', 'BEL', 'BRA', 'NLD', 'USA', 'CHE',
+    'CN', 'AUT', 'SWE', 'CHN', 'POL', 'ISR', 'RUS', 'NOR', 'ROU', 'FIN', 'DNK', 'AUS',
+    'AGO', 'LUX', 'MAR', 'TUR', 'HUN', 'ARG', 'JPN', 'CZE', 'IND', 'KOR', 'GRC', 'DZA',
+    'SRB', 'HRV', 'MEX', 'IRN', 'EST', 'LTU', 'BGR', 'NZL', 'COL', 'UKR', 'MOZ', 'CHL',
+    'SVK', 'THA', 'SVN', 'ISL', 'LVA', 'CYP', 'ZAF', 'TWN', 'SGP', 'PHL', 'ARE', 'NGA',
+]
+COUNTRY_WEIGHTS = 1 / np.arange(1, len(COUNTRIES) + 1) ** 1.3
+SEGMENTS = ['Online TA', 'Offline TA/TO', 'Groups', 'Direct', 'Corporate', 'Complementary', 'Aviation']
+SEGMENT_WEIGHTS = [0.473, 0.203, 0.166, 0.106, 0.044, 0.006, 0.002]
+# Most likely distribution channel per market segment
+SEGMENT_CHANNELS = ['TA/TO', 'TA/TO', 'TA/TO', 'Direct', 'Corporate', 'Direct', 'Corporate']
+CHANNELS = ['TA/TO', 'Direct', 'Corporate', 'GDS']
+MEALS = ['BB', 'HB', 'SC', 'FB']
+MEAL_WEIGHTS = [0.78, 0.12, 0.09, 0.01]
+CUSTOMER_TYPES = ['Transient', 'Transient-Party', 'Contract', 'Group']
+CUSTOMER_TYPE_WEIGHTS = [0.75, 0.21, 0.034, 0.006]
+DEPOSITS = ['No Deposit', 'Non Refund', 'Refundable']
+DEPOSIT_WEIGHTS = [0.876, 0.122, 0.002]
+ROOM_TYPES = ['A', 'D', 'E', 'F', 'G', 'B', 'C']
+ROOM_TYPE_WEIGHTS = [0.72, 0.16, 0.055, 0.024, 0.018, 0.012, 0.011]
+SEASON = np.array([0.75, 0.8, 0.9, 0.95, 1.0, 1.1, 1.3, 1.4, 1.05, 0.9, 0.8, 0.85])
+
+
+def parse_size(size):
+    return SIZES.get(str(size).lower()) or int(size)
+
+
+def _choice(rng, values, weights, size):
+    weights = np.asarray(weights, dtype=float)
+    return np.asarray(values)[rng.choice(len(values), size=size, p=weights / weights.sum())]
+
+
+def _bookings_chunk(rng, rows):
+    hotel_code = rng.choice(2, size=rows, p=HOTEL_WEIGHTS)
+    year = _choice(rng, YEARS, YEAR_WEIGHTS, rows)
+    month = rng.choice(12, size=rows, p=np.asarray(MONTH_WEIGHTS) / sum(MONTH_WEIGHTS))
+
+    # Pick a valid day in the arrival month
+    month_start = ((year - 1970) * 12 + month).astype('datetime64[M]')
+    month_days = ((month_start + 1).astype('datetime64[D]') - month_start.astype('datetime64[D]')).astype(np.int64)
+    arrival = month_start.astype('datetime64[D]') + (rng.random(rows) * month_days).astype(np.int64)
+
+    lead_time = np.minimum(rng.exponential(95, rows), 737).astype(np.int64)
+    weekend = np.minimum(rng.poisson(0.9, rows), 16)
+    week = np.minimum(rng.poisson(2.4 + 0.8 * hotel_code, rows), 40)
+    nights = weekend + week
+
+    segment = rng.choice(len(SEGMENTS), size=rows, p=np.asarray(SEGMENT_WEIGHTS) / sum(SEGMENT_WEIGHTS))
+    channel = np.where(rng.random(rows) < 0.9, np.asarray(SEGMENT_CHANNELS)[segment], _choice(rng, CHANNELS, [1, 1, 1, 1], rows))
+    deposit = _choice(rng, DEPOSITS, DEPOSIT_WEIGHTS, rows)
+
+    # Log-normal prices around each hotel's base rate, scaled by season
+    base = np.where(hotel_code == 0, 105.0, 95.0) * SEASON[month]
+    adr = np.round(base * rng.lognormal(-0.08, 0.4, rows), 2)
+    adr[segment == SEGMENTS.index('Complementary')] = 0.0
+
+    logit = -1.9 + 0.004 * lead_time + 2.8 * (deposit == 'Non Refund') + 0.5 * (hotel_code == 0)
+    is_canceled = (rng.random(rows) < 1 / (1 + np.exp(-logit))).astype(np.int64)
+    status = np.where(is_canceled == 1, np.where(rng.random(rows) < 0.07, 'No-Show', 'Canceled'), 'Check-Out')
+    status_date = np.where(is_canceled == 1, arrival - (rng.random(rows) * lead_time).astype(np.int64), arrival + nights)
+
+    reserved = _choice(rng, ROOM_TYPES, ROOM_TYPE_WEIGHTS, rows)
+    assigned = np.where(rng.random(rows) < 0.88, reserved, _choice(rng, ROOM_TYPES, ROOM_TYPE_WEIGHTS, rows))
+
+    return pd.DataFrame({
+        'hotel': np.asarray(HOTELS)[hotel_code],
+        'is_canceled': is_canceled,
+        'lead_time': lead_time,
+        'arrival_date_year': year,
+        'arrival_date_month': np.asarray(MONTH_NAMES)[month],
+        'arrival_date_week_number': pd.DatetimeIndex(arrival).isocalendar().week.to_numpy(np.int64),
+        'arrival_date_day_of_month': (arrival - month_start.astype('datetime64[D]')).astype(np.int64) + 1,
+        'stays_in_weekend_nights': weekend,
+        'stays_in_week_nights': week,
+        'adults': _choice(rng, [1, 2, 3, 4], [0.19, 0.75, 0.055, 0.005], rows),
+        'children': _choice(rng, [0.0, 1.0, 2.0, 3.0], [0.93, 0.04, 0.029, 0.001], rows),
+        'babies': (rng.random(rows) < 0.008).astype(np.int64),
+        'meal': _choice(rng, MEALS, MEAL_WEIGHTS, rows),
+        'country': _choice(rng, COUNTRIES, COUNTRY_WEIGHTS, rows),
+        'market_segment': np.asarray(SEGMENTS)[segment],
+        'distribution_channel': channel,
+        'is_repeated_guest': (rng.random(rows) < 0.032).astype(np.int64),
+        'previous_cancellations': np.where(rng.random(rows) < 0.05, rng.geometric(0.5, rows), 0),
+        'previous_bookings_not_canceled': np.where(rng.random(rows) < 0.03, rng.geometric(0.3, rows), 0),
+        'reserved_room_type': reserved,
+        'assigned_room_type': assigned,
+        'booking_changes': np.minimum(rng.poisson(0.22, rows), 20),
+        'deposit_type': deposit,
+        'days_in_waiting_list': np.where(rng.random(rows) < 0.03, rng.integers(1, 400, rows), 0),
+        'customer_type': _choice(rng, CUSTOMER_TYPES, CUSTOMER_TYPE_WEIGHTS, rows),
+        'adr': adr,
+        'required_car_parking_spaces': (rng.random(rows) < 0.062).astype(np.int64),
+        'total_of_special_requests': _choice(rng, [0, 1, 2, 3, 4, 5], [0.59, 0.28, 0.11, 0.02, 0.003, 0.001], rows),
+        'reservation_status': status,
+        'reservation_status_date': np.datetime_as_string(status_date, unit='D'),
+    })
+
+
+def iter_bookings(rows, seed=0, chunk_rows=CHUNK_ROWS):
+    """Yield ``rows`` synthetic bookings in the CSV schema, ``chunk_rows`` at a time."""
+    chunks = -(-rows // chunk_rows)
+    for i, child in enumerate(np.random.SeedSequence(seed).spawn(chunks)):
+        yield _bookings_chunk(np.random.default_rng(child), min(chunk_rows, rows - i * chunk_rows))
+
+
+def generate_bookings(rows, seed=0):
+    """All ``rows`` synthetic bookings as one frame."""
+    return pd.concat(iter_bookings(rows, seed), ignore_index=True)
+
+
+def write_csv(rows, path, seed=0):
+    header = True
+    for chunk in iter_bookings(rows, seed):
+        chunk.to_csv(path, mode='w' if header else 'a', header=header, index=False)
+        header = False
+    return path
+
+
+def _model_tables(chunk, offset, customers, rooms_per_hotel, rng):
+    # One ``bookings`` row per synthetic booking, plus the guests it references
+    rows = len(chunk)
+    hotel_id = np.where(chunk['hotel'].to_numpy() == HOTELS[0], 1, 2)
+    check_in = pd.to_datetime(dict(
+        year=chunk['arrival_date_year'],
+        month=chunk['arrival_date_month'].map({name: i + 1 for i, name in enumerate(MONTH_NAMES)}),
+        day=chunk['arrival_date_day_of_month'],
+    ))
+    nights = (chunk['stays_in_weekend_nights'] + chunk['stays_in_week_nights']).clip(lower=1)
+    status = np.where(chunk['is_canceled'].to_numpy() == 1, 'cancelled', 'completed')
+    created_at = check_in - pd.to_timedelta(chunk['lead_time'], unit='D')
+    return pd.DataFrame({
+        'id': np.arange(offset + 1, offset + rows + 1),
+        'hotel_id': hotel_id,
+        'room_id': (hotel_id - 1) * rooms_per_hotel + rng.integers(1, rooms_per_hotel + 1, rows),
+        # A fifth of bookings come from a small pool of regulars
+        'customer_id': np.where(rng.random(rows) < 0.2, rng.integers(1, customers // 50 + 2, rows),
+                                rng.integers(1, customers + 1, rows)),
+        'check_in': check_in,
+        'check_out': check_in + pd.to_timedelta(nights, unit='D'),
+        'status': status,
+        'total_amount': np.round(chunk['adr'].to_numpy() * nights.to_numpy(), 2),
+        'payment_status': np.where(status == 'cancelled', 'refunded', 'completed'),
+        'booking_channel': chunk['distribution_channel'].to_numpy(),
+        'special_requests': None,
+        'created_at': created_at,
+        # The month key Booking's write hooks store (see app.buckets.period_key)
+        'created_month': created_at.dt.strftime('%Y-%m'),
+    })
+
+
+def write_sqlite(rows, path, seed=0, rooms_per_hotel=200):
+    """Load ``rows`` synthetic bookings into the ``app.models`` tables in SQLite.
+
+    Rows go in through Core inserts, so model hooks such as the booking
+    sketches and rollups do not run; rebuild those afterwards (``flask
+    rebuild-sketches``, ``flask rebuild-rollups``).
+    """
+    from sqlalchemy import create_engine
+
+    from app.models import Booking, Customer, Hotel, Room, db
+
+    engine = create_engine(f'sqlite:///{os.path.abspath(path)}')
+    db.metadata.drop_all(engine)
+    db.metadata.create_all(engine)
+    rng = np.random.default_rng(seed)
+    customers = max(rows // 3, 1)
+
+    hotels = pd.DataFrame({
+        'id': [1, 2], 'name': ['Grand Hotel', 'Beach Resort'], 'type': ['City', 'Resort'],
+        'location': ['Lisbon', 'Algarve'], 'total_rooms': [rooms_per_hotel] * 2,
+    })
+    room_hotel = np.repeat([1, 2], rooms_per_hotel)
+    rooms = pd.DataFrame({
+        'id': np.arange(1, 2 * rooms_per_hotel + 1),
+        'hotel_id': room_hotel,
+        'room_number': [f'{h}-{i:03d}' for h, i in zip(room_hotel, np.tile(np.arange(1, rooms_per_hotel + 1), 2))],
+        'room_type': _choice(rng, ['Standard', 'Deluxe', 'Suite'], [0.7, 0.22, 0.08], 2 * rooms_per_hotel),
+        'capacity': rng.integers(1, 5, 2 * rooms_per_hotel),
+        'rate': rng.integers(80, 400, 2 * rooms_per_hotel).astype(float),
+        'status': 'available',
+    })
+    guest_ids = np.arange(1, customers + 1)
+    guests = pd.DataFrame({
+        'id': guest_ids,
+        'name': [f'Customer {i}' for i in guest_ids],
+        'email': [f'customer{i}@example.com' for i in guest_ids],
+        'customer_type': _choice(rng, CUSTOMER_TYPES, CUSTOMER_TYPE_WEIGHTS, customers),
+        'country': _choice(rng, COUNTRIES, COUNTRY_WEIGHTS, customers),
+    })
+
+    with engine.begin() as connection:
+        hotels.to_sql(Hotel.__tablename__, connection, if_exists='append', index=False)
+        rooms.to_sql(Room.__tablename__, connection, if_exists='append', index=False)
+        guests.to_sql(Customer.__tablename__, connection, if_exists='append', index=False, chunksize=50_000)
+        offset = 0
+        for chunk in iter_bookings(rows, seed):
+            bookings = _model_tables(chunk, offset, customers, rooms_per_hotel, rng)
+            bookings.to_sql(Booking.__tablename__, connection, if_exists='append', index=False, chunksize=50_000)
+            offset += len(chunk)
+    engine.dispose()
+    return path
+
+
+def main(size='100k', out_dir=DEFAULT_OUT_DIR, kind='csv'):
+    rows = parse_size(size)
+    os.makedirs(out_dir, exist_ok=True)
+    if kind in ('csv', 'both'):
+        print(write_csv(rows, os.path.join(out_dir, f'hotel_booking_{size}.csv')))
+    if kind in ('sqlite', 'both'):
+        print(write_sqlite(rows, os.path.join(out_dir, f'hotel_booking_{size}.db')))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
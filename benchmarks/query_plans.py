@@ -0,0 +1,144 @@
+"""Check the query plans of the SQL dashboard endpoints.
+
+Usage: python -m benchmarks.query_plans [SIZE] [data_dir]
+
+Requests every ``/api`` endpoint of ``app.routes`` against a synthetic SQLite
+database (``hotel_booking_<SIZE>.db``, 100k bookings by default, generated
+into ``benchmarks/data`` when missing) and runs ``EXPLAIN QUERY PLAN`` on
+each SELECT it issues. Prints the plans and exits with status 1 when any
+step reads a table without an index (``SCAN <table>``) or sorts into a temp
+B-tree. ``tests/test_query_plans.py`` runs the same check on a small
+database with the regular test suite.
+
+The database gets the indexes declared in ``app.models`` (the ones the
+migrations add), its booking rollups and fresh statistics, as after ``flask
+db upgrade`` and ``flask rebuild-rollups``.
+"""
+import os
+import sys
+
+from benchmarks.generate import DEFAULT_OUT_DIR, parse_size, write_sqlite
+
+DEFAULT_SIZE = '100k'
+
+# Each endpoint with the parameter sets the dashboards send
+ENDPOINTS = [
+    ('/api/revenue/trend', {'period': 'month'}),
+    ('/api/revenue/trend', {'period': 'week'}),
+    ('/api/revenue/trend', {'period': 'day'}),
+    ('/api/revenue/trend', {'period': 'quarterly'}),
+    ('/api/revenue/trend', {'period': 'month', 'hotel_type': 'City'}),
+    ('/api/revenue/segments', {}),
+    ('/api/revenue/segments', {'hotel_type': 'Resort'}),
+    ('/api/revenue/geographic', {}),
+    ('/api/revenue/geographic', {'hotel_type': 'City'}),
+    # The sketch endpoints read every stored day when given no range
+    ('/api/revenue/spend-percentiles', {'start': '2016-07-01', 'end': '2016-09-30'}),
+    ('/api/revenue/spend-percentiles', {'hotel_type': 'City', 'start': '2016-07-01'}),
+    ('/api/customers/unique-guests', {'start': '2016-01-01', 'end': '2016-12-31'}),
+    ('/api/customers/segmentation', {}),
+    ('/api/customers/satisfaction', {}),
+    ('/api/customers/satisfaction', {'period': 'weekly'}),
+    ('/api/customers/satisfaction', {'period': 'quarterly'}),
+    ('/api/customers/channels', {}),
+    ('/api/operations/room-utilization', {}),
+    ('/api/operations/service-requests', {}),
+    ('/api/operations/maintenance', {}),
+]
+
+
+def database_path(size, data_dir=DEFAULT_OUT_DIR):
+    path = os.path.join(data_dir, f'hotel_booking_{size}.db')
+    if not os.path.exists(path):
+        os.makedirs(data_dir, exist_ok=True)
+        print(f'generating {path}', file=sys.stderr)
+        write_sqlite(parse_size(size), path)
+    return path
+
+
+def make_app(path):
+    """A Flask app serving the ``app.routes`` blueprint from the database at ``path``."""
+    from flask import Flask
+    from sqlalchemy import text
+
+    from app import db as routes_db
+    from app.models import BookingRollup, db, rebuild_booking_rollups
+    from app.routes import main
+    from app.serialization import FastJSONProvider
+
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{os.path.abspath(path)}'
+    # The routes query through the package's SQLAlchemy instance; the models'
+    # tables are declared on app.models' own
+    routes_db.init_app(app)
+    app.register_blueprint(main)
+    with app.app_context():
+        with routes_db.engine.begin() as connection:
+            db.metadata.create_all(connection)
+            # Databases generated before an index was declared lack it; SQLAlchemy
+            # cannot reflect expression indexes, so look the names up directly
+            existing = {name for name, in connection.exec_driver_sql(
+                "SELECT name FROM sqlite_master WHERE type = 'index'")}
+            for table in db.metadata.sorted_tables:
+                for index in table.indexes:
+                    if index.name not in existing:
+                        index.create(connection)
+        # Generated bookings bypass the rollup hooks
+        if routes_db.session.query(BookingRollup.id).first() is None:
+            rebuild_booking_rollups(routes_db.session)
+        routes_db.session.execute(text('ANALYZE'))
+        routes_db.session.commit()
+    return app, routes_db
+
+
+def bad_steps(plan):
+    """Plan steps that scan a table without an index or sort into a temp B-tree."""
+    return [step for step in plan
+            if (step.startswith('SCAN ') and ' USING ' not in step) or 'TEMP B-TREE' in step]
+
+
+def run(size=DEFAULT_SIZE, data_dir=DEFAULT_OUT_DIR):
+    """Print every endpoint's plans and return the endpoints whose plans fail the check."""
+    from sqlalchemy import event
+
+    app, db = make_app(database_path(size, data_dir))
+    plans = []
+
+    def explain(connection, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            rows = cursor.connection.cursor().execute('EXPLAIN QUERY PLAN ' + statement, parameters)
+            plans.append((statement, [row[3] for row in rows]))
+
+    failures = []
+    client = app.test_client()
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', explain)
+        for url, query in ENDPOINTS:
+            plans.clear()
+            response = client.get(url, query_string=query)
+            label = url + ''.join(f' {name}={value}' for name, value in query.items())
+            if response.status_code != 200:
+                print(f'FAIL {label}: HTTP {response.status_code}')
+                failures.append(label)
+                continue
+            bad = [step for _, plan in plans for step in bad_steps(plan)]
+            print(f"{'FAIL' if bad else 'ok  '} {label}")
+            for _, plan in plans:
+                for step in plan:
+                    print(f"       {'!' if step in bad else ' '} {step}")
+            if bad:
+                failures.append(label)
+        event.remove(db.engine, 'before_cursor_execute', explain)
+    return failures
+
+
+def main(size=DEFAULT_SIZE, data_dir=DEFAULT_OUT_DIR):
+    failures = run(size, data_dir)
+    print(f'{len(failures)} of {len(ENDPOINTS)} endpoint queries need a full scan or a sort' if failures
+          else f'all {len(ENDPOINTS)} endpoint queries use indexes')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,45 @@
+"""Add per-hotel, per-day booking sketches
+
+Revision ID: 3f6a2d8c0b15
+Revises: 7ca767877304
+Create Date: 2026-10-18 09:04:26.118000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.orm import Session
+
+from app.models import rebuild_booking_sketches
+
+
+# revision identifiers, used by Alembic.
+revision = '3f6a2d8c0b15'
+down_revision = '7ca767877304'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'booking_sketches',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('hotel_id', sa.Integer(), nullable=True),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('bookings', sa.Integer(), nullable=False),
+        sa.Column('spend_sketch', sa.LargeBinary(), nullable=False),
+        sa.Column('guest_sketch', sa.LargeBinary(), nullable=False),
+        sa.ForeignKeyConstraint(['hotel_id'], ['hotels.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('hotel_id', 'day'),
+        if_not_exists=True,
+    )
+    # Date ranges across all hotels
+    op.create_index('ix_booking_sketches_day', 'booking_sketches', ['day'], unique=False, if_not_exists=True)
+    # Sketches cannot be built in SQL, so they are filled from Python. The
+    # session joins the migration's transaction; its commit does not end it.
+    rebuild_booking_sketches(Session(bind=op.get_bind()))
+
+
+def downgrade():
+    op.drop_index('ix_booking_sketches_day', table_name='booking_sketches', if_exists=True)
+    op.drop_table('booking_sketches')
@@ -0,0 +1,109 @@
+"""Add period bucket keys to bookings, booking rollups and customer feedback
+
+Revision ID: 5d0c9e3b61a8
+Revises: e82c5a41d7f3
+Create Date: 2026-10-18 17:52:19.730000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.buckets import KEY_FUNCTIONS, PERIODS
+
+
+# revision identifiers, used by Alembic.
+revision = '5d0c9e3b61a8'
+down_revision = 'e82c5a41d7f3'
+branch_labels = None
+depends_on = None
+
+KEY_LENGTHS = {'day': 10, 'week': 8, 'month': 7, 'quarter': 7, 'year': 4}
+
+ROLLUP_PERIODS = ['week', 'month', 'quarter', 'year']
+
+INDEXES = [
+    ('ix_bookings_created_month', 'bookings', ['created_month', 'created_at', 'total_amount']),
+    ('ix_booking_rollups_week', 'booking_rollups', ['week', 'day', 'hotel_id', 'revenue']),
+    ('ix_booking_rollups_month', 'booking_rollups', ['month', 'day', 'hotel_id', 'revenue']),
+    ('ix_booking_rollups_quarter', 'booking_rollups', ['quarter', 'day', 'hotel_id', 'revenue']),
+    ('ix_booking_rollups_year', 'booking_rollups', ['year', 'day', 'hotel_id', 'revenue']),
+] + [
+    (f'ix_customer_feedback_{period}', 'customer_feedback', [f'created_{period}', 'rating'])
+    for period in PERIODS
+]
+# The day index of e82c5a41d7f3 was only created off SQLite
+SQLITE_INDEXES = [
+    ('ix_booking_rollups_day', 'booking_rollups', ['day', 'hotel_id', 'revenue']),
+]
+
+# The SQLite expression indexes of e82c5a41d7f3, replaced by the stored keys.
+# Their names are reused, so they go before the new indexes are created.
+SUPERSEDED_SQLITE = [
+    ('ix_booking_rollups_month', [sa.text("strftime('%Y-%m', day)"), 'day', 'hotel_id', 'revenue']),
+    ('ix_booking_rollups_week', [sa.text("strftime('%Y-%W', day)"), 'day', 'hotel_id', 'revenue']),
+]
+
+# The feedback indexes of b4e1f07c2a9d, replaced by the stored keys
+SUPERSEDED_FEEDBACK_SQLITE = [
+    ('ix_customer_feedback_month', [sa.text("strftime('%Y-%m', created_at)"), 'created_at', 'rating']),
+]
+SUPERSEDED_FEEDBACK_OTHER = [
+    ('ix_customer_feedback_created_at', ['created_at', 'rating']),
+]
+
+
+def _sqlite():
+    return op.get_bind().dialect.name == 'sqlite'
+
+
+def upgrade():
+    with op.batch_alter_table('bookings') as batch_op:
+        batch_op.add_column(sa.Column('created_month', sa.String(length=KEY_LENGTHS['month']), nullable=True))
+    with op.batch_alter_table('booking_rollups') as batch_op:
+        for period in ROLLUP_PERIODS:
+            batch_op.add_column(sa.Column(period, sa.String(length=KEY_LENGTHS[period]), nullable=True))
+    with op.batch_alter_table('customer_feedback') as batch_op:
+        for period in PERIODS:
+            batch_op.add_column(sa.Column(f'created_{period}', sa.String(length=KEY_LENGTHS[period]), nullable=True))
+
+    # Backfill in SQL with the same keys the model hooks write from Python
+    bookings = sa.table('bookings', sa.column('created_at'), sa.column('created_month'))
+    op.execute(bookings.update().values(created_month=KEY_FUNCTIONS['month'](bookings.c.created_at)))
+    rollups = sa.table('booking_rollups', sa.column('day'), *(sa.column(period) for period in ROLLUP_PERIODS))
+    op.execute(rollups.update().values({
+        period: KEY_FUNCTIONS[period](rollups.c.day) for period in ROLLUP_PERIODS
+    }))
+    feedback = sa.table('customer_feedback', sa.column('created_at'),
+                        *(sa.column(f'created_{period}') for period in PERIODS))
+    op.execute(feedback.update().values({
+        f'created_{period}': KEY_FUNCTIONS[period](feedback.c.created_at) for period in PERIODS
+    }))
+
+    if _sqlite():
+        for name, _ in SUPERSEDED_SQLITE:
+            op.drop_index(name, table_name='booking_rollups', if_exists=True)
+    for name, _ in SUPERSEDED_FEEDBACK_SQLITE if _sqlite() else SUPERSEDED_FEEDBACK_OTHER:
+        op.drop_index(name, table_name='customer_feedback', if_exists=True)
+    for name, table, columns in INDEXES + (SQLITE_INDEXES if _sqlite() else []):
+        op.create_index(name, table, columns, unique=False, if_not_exists=True)
+    if _sqlite():
+        op.execute('ANALYZE')
+
+
+def downgrade():
+    for name, table, columns in reversed(INDEXES + (SQLITE_INDEXES if _sqlite() else [])):
+        op.drop_index(name, table_name=table, if_exists=True)
+    with op.batch_alter_table('customer_feedback') as batch_op:
+        for period in reversed(PERIODS):
+            batch_op.drop_column(f'created_{period}')
+    with op.batch_alter_table('booking_rollups') as batch_op:
+        for period in reversed(ROLLUP_PERIODS):
+            batch_op.drop_column(period)
+    with op.batch_alter_table('bookings') as batch_op:
+        batch_op.drop_column('created_month')
+    # After the batch copies, which cannot carry expression indexes over
+    if _sqlite():
+        for name, columns in SUPERSEDED_SQLITE:
+            op.create_index(name, 'booking_rollups', columns, unique=False, if_not_exists=True)
+    for name, columns in SUPERSEDED_FEEDBACK_SQLITE if _sqlite() else SUPERSEDED_FEEDBACK_OTHER:
+        op.create_index(name, 'customer_feedback', columns, unique=False, if_not_exists=True)
@@ -0,0 +1,97 @@
+"""Add daily booking rollups
+
+Revision ID: e82c5a41d7f3
+Revises: b4e1f07c2a9d
+Create Date: 2026-10-18 14:37:05.204000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e82c5a41d7f3'
+down_revision = 'b4e1f07c2a9d'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_booking_rollups_customer_type', ['customer_type', 'hotel_id', 'revenue']),
+    ('ix_booking_rollups_country', ['country', 'hotel_id', 'revenue']),
+    ('ix_booking_rollups_channel', ['booking_channel', 'bookings', 'revenue']),
+]
+SQLITE_INDEXES = [
+    ('ix_booking_rollups_month', [sa.text("strftime('%Y-%m', day)"), 'day', 'hotel_id', 'revenue']),
+    ('ix_booking_rollups_week', [sa.text("strftime('%Y-%W', day)"), 'day', 'hotel_id', 'revenue']),
+]
+OTHER_INDEXES = [
+    ('ix_booking_rollups_day', ['day', 'hotel_id', 'revenue']),
+]
+
+# Indexes of b4e1f07c2a9d that only served the queries now reading the rollups
+SUPERSEDED = [
+    ('ix_rooms_hotel_id', 'rooms', ['hotel_id']),
+    ('ix_customers_country', 'customers', ['country']),
+    ('ix_bookings_channel', 'bookings', ['booking_channel', 'total_amount']),
+]
+SUPERSEDED_SQLITE = [
+    ('ix_bookings_check_in_month', 'bookings',
+     [sa.text("strftime('%Y-%m', check_in)"), 'check_in', 'total_amount', 'room_id']),
+    ('ix_bookings_check_in_week', 'bookings',
+     [sa.text("strftime('%Y-%W', check_in)"), 'check_in', 'total_amount', 'room_id']),
+]
+SUPERSEDED_OTHER = [
+    ('ix_bookings_check_in', 'bookings', ['check_in', 'total_amount', 'room_id']),
+]
+
+
+def _sqlite():
+    return op.get_bind().dialect.name == 'sqlite'
+
+
+def _backfill():
+    # The same grouping as rebuild_booking_rollups, done in one statement
+    bookings = sa.table('bookings', sa.column('check_in'), sa.column('room_id'), sa.column('customer_id'),
+                        sa.column('booking_channel'), sa.column('total_amount'))
+    rooms = sa.table('rooms', sa.column('id'), sa.column('hotel_id'), sa.column('room_type'))
+    customers = sa.table('customers', sa.column('id'), sa.column('customer_type'), sa.column('country'))
+    rollups = sa.table('booking_rollups', *(sa.column(name) for name in (
+        'day', 'hotel_id', 'room_type', 'customer_type', 'country', 'booking_channel', 'bookings', 'revenue')))
+    day = sa.func.date(bookings.c.check_in) if _sqlite() else sa.cast(bookings.c.check_in, sa.Date)
+    dimensions = [day, rooms.c.hotel_id, rooms.c.room_type, customers.c.customer_type, customers.c.country,
+                  bookings.c.booking_channel]
+    rows = sa.select(*dimensions, sa.func.count(), sa.func.sum(bookings.c.total_amount)).select_from(
+        bookings.outerjoin(rooms, rooms.c.id == bookings.c.room_id)
+        .outerjoin(customers, customers.c.id == bookings.c.customer_id)
+    ).group_by(*dimensions)
+    op.execute(rollups.insert().from_select(list(rollups.c), rows))
+
+
+def upgrade():
+    op.create_table(
+        'booking_rollups',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('hotel_id', sa.Integer(), nullable=True),
+        sa.Column('room_type', sa.String(length=50), nullable=True),
+        sa.Column('customer_type', sa.String(length=50), nullable=True),
+        sa.Column('country', sa.String(length=100), nullable=True),
+        sa.Column('booking_channel', sa.String(length=50), nullable=True),
+        sa.Column('bookings', sa.Integer(), nullable=False),
+        sa.Column('revenue', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['hotel_id'], ['hotels.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('day', 'hotel_id', 'room_type', 'customer_type', 'country', 'booking_channel'),
+        if_not_exists=True,
+    )
+    for name, columns in INDEXES + (SQLITE_INDEXES if _sqlite() else OTHER_INDEXES):
+        op.create_index(name, 'booking_rollups', columns, unique=False, if_not_exists=True)
+    for name, table, columns in SUPERSEDED + (SUPERSEDED_SQLITE if _sqlite() else SUPERSEDED_OTHER):
+        op.drop_index(name, table_name=table, if_exists=True)
+    _backfill()
+
+
+def downgrade():
+    for name, table, columns in SUPERSEDED + (SUPERSEDED_SQLITE if _sqlite() else SUPERSEDED_OTHER):
+        op.create_index(name, table, columns, unique=False, if_not_exists=True)
+    op.drop_table('booking_rollups')
@@ -2,9 +2,13 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 from pathlib import Path
-import sqlite3
 import calendar
-import io
+import os
+import sys
+
+# Make the shared analytics package importable under `streamlit run src/streamlit_app.py`
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from analytics import density_cells, iter_export, open_datasets
 
 # --- THEME & COLOR PALETTE ---
 COLORS = {
@@ -73,76 +77,64 @@ st.markdown("""
 # --- DATA LOADING & CACHING ---
 BASE_DIR = Path(__file__).parent.parent
 DATA_PATH = BASE_DIR / "data" / "hotel_bookings.csv"
-DB_PATH = BASE_DIR / "data" / "hotel_bookings.db"
+# 'pandas' serves the bookings from memory, 'sqlite' from an indexed database
+# file next to the CSV, 'chunked' by streaming the CSV in fixed-size chunks
+DATASET_BACKEND = os.environ.get("DATASET_BACKEND", "pandas")
 
-@st.cache_data(show_spinner="Loading data...")
-def load_data():
-    if DB_PATH.exists():
-        conn = sqlite3.connect(DB_PATH)
-        df = pd.read_sql("SELECT * FROM bookings", conn)
-        conn.close()
-        return df
+@st.cache_resource(show_spinner="Loading data...")
+def load_datasets():
     if not DATA_PATH.exists():
         st.error(f"Data file not found at {DATA_PATH.absolute()}")
         st.stop()
-    df = pd.read_csv(DATA_PATH)
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        df.to_sql("bookings", conn, if_exists="replace", index=False)
-        conn.close()
-    except Exception:
-        pass
-    return df
+    return open_datasets(DATA_PATH, DATASET_BACKEND)
 
-def get_filtered_data(df, hotel, year, month):
-    mask = pd.Series(True, index=df.index)
-    if hotel and hotel != "All Hotels":
-        mask &= df["hotel"] == hotel
-    if year and year != "All Years":
-        mask &= df["arrival_date_year"] == int(year)
-    if month and month != "All Months":
-        mask &= df["arrival_date_month"] == month
-    return df[mask]
+def query_frame(dataset, filters, dimension, measures, order_by=None):
+    # One grouped query, run by the backend, as a frame with a column per measure
+    result = dataset.query(*filters, group_by=[dimension], measures=measures, order_by=order_by)
+    return pd.DataFrame({dimension: result["groups"], **result["measures"]})
 
 # --- LOAD DATA ---
-df = load_data()
+dataset = load_datasets().current
 
 # --- SIDEBAR: NAVIGATION & FILTERS ---
 st.sidebar.title("Hotel Booking Dashboard")
 st.sidebar.header("Filters")
 hotel = st.sidebar.selectbox(
     "Hotel",
-    ["All Hotels"] + sorted(df["hotel"].unique())
+    ["All Hotels"] + dataset.values("hotel")
 )
 year = st.sidebar.selectbox(
     "Year",
-    ["All Years"] + sorted(df["arrival_date_year"].unique())
+    ["All Years"] + dataset.values("year")
 )
 month = st.sidebar.selectbox(
     "Month",
     ["All Months"] + list(calendar.month_name)[1:]
 )
 
-# --- FILTERED DATA ---
-filtered_df = get_filtered_data(df, hotel, year, month)
+# --- FILTERS ---
+# Every chart asks the backend for its aggregate, so no view holds the filtered rows
+filters = (hotel, year, month)
 
 # --- EXPORT BUTTON ---
-buffer = io.BytesIO()
-filtered_df.to_csv(buffer, index=False)
-st.sidebar.download_button(
-    label="⬇️ Download Filtered Data (CSV)",
-    data=buffer.getvalue(),
-    file_name="filtered_hotel_bookings.csv",
-    mime="text/csv"
-)
+# The CSV is only built on the rerun triggered by asking for it, not on
+# every filter change
+if st.sidebar.button("Prepare Filtered Data (CSV)"):
+    st.sidebar.download_button(
+        label="⬇️ Download Filtered Data (CSV)",
+        data="".join(iter_export(dataset.select(*filters))),
+        file_name="filtered_hotel_bookings.csv",
+        mime="text/csv"
+    )
 
 # --- KPI CARDS ---
-def kpi_cards(df):
-    total_bookings = len(df)
-    total_revenue = (df["adr"] * (df["stays_in_weekend_nights"] + df["stays_in_week_nights"])).sum()
-    avg_adr = df["adr"].mean()
-    total_nights = (df["stays_in_weekend_nights"] + df["stays_in_week_nights"]).sum()
-    occupancy_rate = (total_nights / (len(df) * 7) * 100) if len(df) > 0 else 0
+def kpi_cards(dataset, filters):
+    cell = dataset.cube.cell(*filters)
+    total_bookings = cell.bookings
+    total_revenue = cell.revenue_sum
+    avg_adr = cell.avg_adr if cell.adr_count else float("nan")
+    total_nights = cell.nights_sum
+    occupancy_rate = (total_nights / (total_bookings * 7) * 100) if total_bookings > 0 else 0
     col1, col2, col3, col4 = st.columns(4)
     with col1:
         st.metric("Total Bookings", f"{total_bookings:,}")
@@ -154,18 +146,18 @@ def kpi_cards(df):
         st.metric("Occupancy Rate", f"{occupancy_rate:.1f}%")
 
 # --- DASHBOARD 1: BOOKING TRENDS OVERVIEW ---
-def dashboard1(df):
+def dashboard1(dataset, filters):
     st.title("Booking Trends Overview")
     st.markdown("""
     Analyze booking patterns, cancellations, and customer types. Use the filters to drill down by hotel, year, or month.
     """)
-    kpi_cards(df)
+    kpi_cards(dataset, filters)
     st.markdown("---")
     # Charts
     col1, col2 = st.columns(2)
     with col1:
         # Bookings by Hotel Type
-        hotel_bookings = df["hotel"].value_counts().reset_index()
+        hotel_bookings = dataset.cube.hotel_counts(*filters).reset_index()
         hotel_bookings.columns = ["hotel", "count"]
         fig = px.bar(
             hotel_bookings, x="hotel", y="count",
@@ -178,9 +170,11 @@ def dashboard1(df):
         st.info("City Hotel (blue) consistently receives more bookings than Resort Hotel (yellow/orange), especially during peak months.")
     with col2:
         # Cancellation Distribution
-        cancel_dist = df["is_canceled"].value_counts().reset_index()
-        cancel_dist.columns = ["status", "count"]
-        cancel_dist["status"] = cancel_dist["status"].map({0: "Not Canceled", 1: "Canceled"})
+        cell = dataset.cube.cell(*filters)
+        cancel_dist = pd.DataFrame({
+            "status": ["Not Canceled", "Canceled"],
+            "count": [cell.not_canceled, cell.canceled]
+        })
         fig = px.pie(
             cancel_dist, values="count", names="status",
             title="Cancellation Distribution",
@@ -193,10 +187,8 @@ def dashboard1(df):
     col3, col4 = st.columns(2)
     with col3:
         # Monthly ADR Trend
-        monthly_adr = df.groupby("arrival_date_month")["adr"].mean().reset_index()
-        # Ensure months are in order
-        monthly_adr["month_num"] = monthly_adr["arrival_date_month"].apply(lambda x: list(calendar.month_name).index(x))
-        monthly_adr = monthly_adr.sort_values("month_num")
+        # Months come back in calendar order
+        monthly_adr = query_frame(dataset, filters, "arrival_date_month", ["mean_adr"]).rename(columns={"mean_adr": "adr"})
         fig = px.line(
             monthly_adr, x="arrival_date_month", y="adr",
             title="Monthly ADR Trend", markers=True,
@@ -207,7 +199,7 @@ def dashboard1(df):
         st.info("ADR (average daily rate) peaks in summer, indicating higher pricing during high-demand months.")
     with col4:
         # Customer Type Distribution
-        customer_dist = df["customer_type"].value_counts().reset_index()
+        customer_dist = query_frame(dataset, filters, "customer_type", ["count"], order_by="-count")
         customer_dist.columns = ["type", "count"]
         fig = px.bar(
             customer_dist, x="type", y="count",
@@ -227,7 +219,7 @@ def dashboard1(df):
     """)
 
 # --- DASHBOARD 2: REVENUE & GUEST BEHAVIOR ---
-def dashboard2(df):
+def dashboard2(dataset, filters):
     st.title("Revenue & Guest Behavior")
     st.markdown("""
     Explore revenue sources, guest behavior, and market segmentation. Use the filters to focus your analysis.
@@ -236,8 +228,11 @@ def dashboard2(df):
     col1, col2 = st.columns(2)
     with col1:
         # Cancellations by Market Segment
-        segment_cancel = df.groupby(["market_segment", "is_canceled"]).size().reset_index(name="count")
-        segment_cancel["status"] = segment_cancel["is_canceled"].map({0: "Not Canceled", 1: "Canceled"})
+        segments = query_frame(dataset, filters, "market_segment", ["count", "sum_canceled"])
+        segment_cancel = pd.concat([
+            segments.assign(status="Not Canceled", count=segments["count"] - segments["sum_canceled"]),
+            segments.assign(status="Canceled", count=segments["sum_canceled"]),
+        ])
         fig = px.bar(
             segment_cancel, x="market_segment", y="count", color="status",
             barmode="stack", title="Cancellations by Market Segment",
@@ -248,10 +243,11 @@ def dashboard2(df):
         st.plotly_chart(fig, use_container_width=True)
         st.info("TA/TO (Travel Agent/Tour Operator) segment has the highest cancellation rate (red), while Direct and Corporate are more stable (green).")
     with col2:
-        # ADR vs Lead Time
-        sample_df = df[(df["adr"] > 0) & (df["lead_time"] > 0)].sample(min(500, len(df)), random_state=42)
+        # ADR vs Lead Time, binned over every booking instead of a random sample
+        density = density_cells(dataset.density(*filters, split_by_hotel=True))
         fig = px.scatter(
-            sample_df, x="lead_time", y="adr", color="hotel",
+            density, x="lead_time", y="adr", color="hotel", size="count",
+            hover_data={"count": True, "cancel_rate": ":.1%"},
             title="ADR vs Lead Time",
             color_discrete_sequence=COLORS['hotel_colors'],
             opacity=0.7, template="plotly_white"
@@ -262,8 +258,7 @@ def dashboard2(df):
     col3, col4 = st.columns(2)
     with col3:
         # Revenue by Distribution Channel
-        df["revenue"] = df["adr"] * (df["stays_in_weekend_nights"] + df["stays_in_week_nights"])
-        channel_revenue = df.groupby("distribution_channel")["revenue"].sum().reset_index()
+        channel_revenue = query_frame(dataset, filters, "distribution_channel", ["sum_revenue"]).rename(columns={"sum_revenue": "revenue"})
         fig = px.pie(
             channel_revenue, values="revenue", names="distribution_channel",
             title="Revenue by Distribution Channel",
@@ -276,7 +271,8 @@ def dashboard2(df):
         st.info("Direct and TA/TO channels generate the most revenue, with Corporate and GDS channels contributing less.")
     with col4:
         # Special Requests by Customer Type
-        special_requests = df.groupby("customer_type")["total_of_special_requests"].mean().reset_index()
+        special_requests = query_frame(dataset, filters, "customer_type", ["mean_special_requests"]).rename(
+            columns={"mean_special_requests": "total_of_special_requests"})
         fig = px.bar(
             special_requests, x="customer_type", y="total_of_special_requests",
             title="Avg. Special Requests by Customer Type",
@@ -288,7 +284,7 @@ def dashboard2(df):
         st.info("Transient customers make the most special requests, indicating higher service expectations.")
     st.markdown("---")
     # Top 5 Guest Countries (Doughnut)
-    top_countries = df["country"].value_counts().head(5).reset_index()
+    top_countries = dataset.cube.cell(*filters).country_counts.head(5).reset_index()
     top_countries.columns = ["country", "count"]
     fig = px.pie(
         top_countries, values="count", names="country",
@@ -317,6 +313,6 @@ tab1, tab2 = st.tabs([
 # --- MAIN APP LOGIC ---
 with st.spinner("Rendering dashboard..."):
     with tab1:
-        dashboard1(filtered_df)
+        dashboard1(dataset, filters)
     with tab2:
-        dashboard2(filtered_df)
\ No newline at end of file
+        dashboard2(dataset, filters)
\ No newline at end of file
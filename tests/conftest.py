@@ -0,0 +1,64 @@
+"""Fixtures shared by the tests: a small synthetic bookings CSV, the same rows
+read with plain pandas, and each dataset backend and app.py serving the CSV."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from analytics import open_datasets
+from analytics.chunked import ChunkedDatasetManager
+from benchmarks.endpoints import load_app
+from benchmarks.generate import write_csv
+
+ROWS = 3000
+# Small enough that the chunked backend reads the CSV in several chunks
+CHUNK_ROWS = 500
+BACKENDS = ['pandas', 'sqlite', 'chunked']
+
+
+def open_backend(path, backend, cache_dir):
+    if backend == 'chunked':
+        return ChunkedDatasetManager(path, str(cache_dir), chunk_rows=CHUNK_ROWS)
+    return open_datasets(path, backend, cache_dir=str(cache_dir))
+
+
+def same_rows(frame, expected, columns):
+    """Assert both frames hold the same rows in ``columns``, in any order."""
+    def plain(rows):
+        rows = pd.DataFrame({column: np.asarray(rows[column], dtype=object) for column in columns})
+        return rows.sort_values(columns).reset_index(drop=True)
+    pd.testing.assert_frame_equal(plain(frame), plain(expected))
+
+
+@pytest.fixture(scope='session')
+def bookings_csv(tmp_path_factory):
+    return str(write_csv(ROWS, tmp_path_factory.mktemp('data') / 'bookings.csv'))
+
+
+@pytest.fixture(scope='session')
+def bookings(bookings_csv):
+    """The CSV as plain pandas reads it, plus nights, revenue and arrival date."""
+    frame = pd.read_csv(bookings_csv)
+    frame['total_nights'] = frame['stays_in_weekend_nights'] + frame['stays_in_week_nights']
+    frame['revenue'] = frame['adr'] * frame['total_nights']
+    frame['arrival_date'] = pd.to_datetime(
+        frame['arrival_date_year'].astype(str) + '-' + frame['arrival_date_month']
+        + '-' + frame['arrival_date_day_of_month'].astype(str), format='%Y-%B-%d')
+    return frame
+
+
+@pytest.fixture(scope='session', params=BACKENDS)
+def dataset(request, bookings_csv, tmp_path_factory):
+    """The current snapshot of each backend over the CSV."""
+    return open_backend(bookings_csv, request.param, tmp_path_factory.mktemp(request.param)).current
+
+
+@pytest.fixture(scope='session')
+def dashboard(bookings_csv):
+    """The app.py module, imported as wsgi.py imports it, serving the CSV."""
+    return load_app(bookings_csv)
+
+
+@pytest.fixture
+def client(dashboard):
+    dashboard.response_cache.clear()
+    return dashboard.app.test_client()
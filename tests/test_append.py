@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from analytics import parse_query
+from benchmarks.endpoints import serving
+from tests.conftest import open_backend, same_rows
+from tests.test_filters import COLUMNS, FILTERS
+
+LOADED = 2000
+BATCH = 400
+
+QUERIES = [
+    parse_query('market_segment', 'count,sum_revenue,mean_adr,cancel_rate'),
+    parse_query('hotel,arrival_date_month', 'count,mean_lead_time'),
+    parse_query(None, 'count,sum_adr'),
+]
+
+
+def same_query(result, expected, rtol=0):
+    assert result.keys() == expected.keys()
+    for name in ('groups', 'rows', 'columns'):
+        if name in expected:
+            assert list(result[name]) == list(expected[name])
+    for name, values in expected['measures'].items():
+        np.testing.assert_allclose(result['measures'][name], values, rtol=rtol)
+
+
+@pytest.fixture
+def split_csv(bookings_csv, tmp_path):
+    """The first LOADED rows as their own CSV, and the rest as the batch to append."""
+    rows = pd.read_csv(bookings_csv)
+    path = str(tmp_path / 'loaded.csv')
+    rows.iloc[:LOADED].to_csv(path, index=False)
+    return path, rows.iloc[LOADED:]
+
+
+@pytest.mark.parametrize('backend', ['pandas', 'sqlite'])
+def test_append_matches_full_reload(backend, bookings_csv, split_csv, tmp_path):
+    path, rest = split_csv
+    datasets = open_backend(path, backend, tmp_path / 'appended')
+    for start in range(0, len(rest), BATCH):
+        dataset = datasets.append(rest.iloc[start:start + BATCH])
+    full = open_backend(bookings_csv, backend, tmp_path / 'full').current
+    # SQLite's TOTAL() adds in row order; the in-memory sums are exact
+    rtol = 1e-12 if backend == 'sqlite' else 0
+
+    assert datasets.current is dataset
+    assert len(dataset) == len(full)
+    for hotel, year, month in FILTERS:
+        same_rows(dataset.filter(hotel, year, month, columns=COLUMNS),
+                  full.filter(hotel, year, month, columns=COLUMNS), COLUMNS)
+        cell, expected = dataset.cube_for().cell(hotel, year, month), full.cube_for().cell(hotel, year, month)
+        assert (cell.bookings, cell.canceled) == (expected.bookings, expected.canceled)
+        assert cell.revenue_sum == pytest.approx(expected.revenue_sum, rel=rtol, abs=0)
+        for query in QUERIES:
+            same_query(dataset.query(hotel, year, month, **query), full.query(hotel, year, month, **query), rtol)
+
+
+def test_append_changes_the_version(split_csv, tmp_path):
+    path, rest = split_csv
+    datasets = open_backend(path, 'pandas', tmp_path)
+    before = datasets.current.version
+    assert datasets.append(rest.iloc[:10]).version != before
+
+
+def test_append_rejects_missing_columns(split_csv, tmp_path):
+    path, rest = split_csv
+    datasets = open_backend(path, 'pandas', tmp_path)
+    with pytest.raises(ValueError, match='missing columns: adr'):
+        datasets.append(rest.drop(columns='adr'))
+
+
+def test_chunked_backend_refuses_appends(split_csv, tmp_path):
+    path, rest = split_csv
+    with pytest.raises(ValueError):
+        open_backend(path, 'chunked', tmp_path).append(rest)
+
+
+def test_append_endpoint_needs_the_admin_token(dashboard, client, bookings_csv, split_csv, monkeypatch):
+    _, rest = split_csv
+    body = rest.iloc[:25].to_csv(index=False)
+    with serving(dashboard, bookings_csv) as datasets:
+        total = len(datasets.current)
+        monkeypatch.setitem(dashboard.app.config, 'DATASET_ADMIN_TOKEN', None)
+        assert client.post('/api/bookings/append', data=body, content_type='text/csv').status_code == 403
+        monkeypatch.setitem(dashboard.app.config, 'DATASET_ADMIN_TOKEN', 'secret')
+        wrong = {'Authorization': 'Bearer guess'}
+        assert client.post('/api/bookings/append', data=body, content_type='text/csv',
+                           headers=wrong).status_code == 403
+        right = {'Authorization': 'Bearer secret'}
+        response = client.post('/api/bookings/append', data=body, content_type='text/csv', headers=right)
+        assert response.status_code == 200
+        assert response.get_json()['appended'] == 25
+        assert len(datasets.current) == total + 25
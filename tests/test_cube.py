@@ -0,0 +1,37 @@
+import pandas as pd
+import pytest
+
+from analytics import MONTHS
+from tests.test_filters import FILTERS, mask
+
+
+@pytest.mark.parametrize('hotel, year, month', FILTERS)
+def test_cell_matches_pandas(dataset, bookings, hotel, year, month):
+    cell = dataset.cube_for().cell(hotel, year, month)
+    rows = mask(bookings, hotel, year, month)
+    assert cell.bookings == len(rows)
+    assert cell.canceled == (rows['is_canceled'] == 1).sum()
+    assert cell.not_canceled == (rows['is_canceled'] == 0).sum()
+    if len(rows):
+        assert cell.revenue_sum == pytest.approx(rows['revenue'].sum())
+        assert cell.avg_adr == pytest.approx(rows['adr'].mean())
+        assert cell.avg_nights == pytest.approx(rows['total_nights'].mean())
+        expected = rows['country'].value_counts()
+        assert dict(cell.country_counts) == dict(expected)
+
+
+@pytest.mark.parametrize('hotel, year, month', FILTERS)
+def test_hotel_counts_match_value_counts(dataset, bookings, hotel, year, month):
+    counts = dataset.cube_for().hotel_counts(hotel, year, month)
+    expected = mask(bookings, hotel, year, month)['hotel'].value_counts()
+    assert dict(counts) == dict(expected)
+    assert list(counts) == sorted(counts, reverse=True)
+
+
+@pytest.mark.parametrize('hotel, year', [(None, None), ('City Hotel', '2016'), ('Resort Hotel', None)])
+def test_revenue_by_month_matches_groupby(dataset, bookings, hotel, year):
+    revenue = dataset.cube_for().revenue_by_month(hotel, year)
+    expected = mask(bookings, hotel, year, None).groupby('arrival_date_month')['revenue'].sum()
+    assert list(revenue.index) == MONTHS
+    pd.testing.assert_series_equal(revenue, expected.reindex(MONTHS, fill_value=0.0),
+                                   check_names=False, check_index_type=False)
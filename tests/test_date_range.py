@@ -0,0 +1,65 @@
+import pandas as pd
+import pytest
+
+from analytics import parse_date_range
+from tests.conftest import same_rows
+from tests.test_filters import COLUMNS, mask
+
+# Inclusive start/end as the endpoints take them, with hotel/year/month
+RANGES = [
+    ('2016-07-01', '2016-09-30', None, None, None),
+    ('2016-07-01', None, None, None, None),
+    (None, '2015-12-31', None, None, None),
+    ('2016-02-29', '2016-02-29', 'City Hotel', None, None),
+    ('2015-10-15', '2017-03-15', 'Resort Hotel', '2016', 'August'),
+    ('2020-01-01', None, None, None, None),
+]
+
+
+def in_range(bookings, start, end, hotel, year, month):
+    rows = mask(bookings, hotel, year, month)
+    if start:
+        rows = rows[rows['arrival_date'] >= pd.Timestamp(start)]
+    if end:
+        rows = rows[rows['arrival_date'] <= pd.Timestamp(end)]
+    return rows
+
+
+def test_parse_date_range():
+    assert parse_date_range() == (None, None)
+    assert parse_date_range('2016-07-01', '2016-09-30') == (pd.Timestamp('2016-07-01'), pd.Timestamp('2016-10-01'))
+    assert parse_date_range(None, '2016-12-31') == (None, pd.Timestamp('2017-01-01'))
+    assert parse_date_range('2016-07-01', '2016-07-01')[1] == pd.Timestamp('2016-07-02')
+    with pytest.raises(ValueError, match='start must be a date'):
+        parse_date_range('not-a-date')
+    with pytest.raises(ValueError, match='end must not be before start'):
+        parse_date_range('2016-07-02', '2016-07-01')
+
+
+@pytest.mark.parametrize('start, end, hotel, year, month', RANGES)
+def test_filter_by_date_range(dataset, bookings, start, end, hotel, year, month):
+    frame = dataset.filter(hotel, year, month, *parse_date_range(start, end), columns=COLUMNS)
+    same_rows(frame, in_range(bookings, start, end, hotel, year, month), COLUMNS)
+
+
+@pytest.mark.parametrize('start, end, hotel, year, month', RANGES)
+def test_range_cube(dataset, bookings, start, end, hotel, year, month):
+    cell = dataset.cube_for(*parse_date_range(start, end)).cell(hotel, year, month)
+    rows = in_range(bookings, start, end, hotel, year, month)
+    assert (cell.bookings, cell.canceled) == (len(rows), rows['is_canceled'].sum())
+    if len(rows):
+        assert cell.revenue_sum == pytest.approx(rows['revenue'].sum())
+
+
+def test_endpoint_filters_by_date_range(client, bookings):
+    response = client.get('/kpi_data', query_string={'hotel': 'City Hotel', 'start': '2016-07-01', 'end': '2016-09-30'})
+    rows = in_range(bookings, '2016-07-01', '2016-09-30', 'City Hotel', None, None)
+    data = response.get_json()
+    assert data['total_bookings'] == len(rows)
+    assert data['total_revenue'] == pytest.approx(round(rows['revenue'].sum(), 2))
+
+
+def test_endpoint_rejects_bad_dates(client):
+    response = client.get('/hotel_data', query_string={'start': '2016-09-30', 'end': '2016-07-01'})
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'end must not be before start'}
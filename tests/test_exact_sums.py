@@ -0,0 +1,74 @@
+import math
+
+import numpy as np
+import pytest
+
+from analytics import BookingCube, CubeCell, parse_query
+from analytics.exact import exact_sum, exact_sums, from_float, grouped_sum, to_float
+from analytics.query import aggregate_pieces, run_query
+from tests.test_filters import FILTERS, mask
+
+
+@pytest.fixture
+def values():
+    # Magnitudes far apart, so a naive running sum loses the small ones
+    rng = np.random.default_rng(0)
+    return rng.standard_normal(5000) * 10.0 ** rng.integers(-8, 12, 5000)
+
+
+def test_sum_is_correctly_rounded(values):
+    assert exact_sum(values) == math.fsum(values)
+    assert exact_sum(np.append(values, [np.nan, np.inf])) == math.fsum(values)
+
+
+@pytest.mark.parametrize('pieces', [2, 7, 100])
+def test_partial_sums_merge_exactly(values, pieces):
+    rng = np.random.default_rng(pieces)
+    cuts = np.sort(rng.choice(np.arange(1, len(values)), pieces - 1, replace=False))
+    total = sum(exact_sums(piece)[0] for piece in np.split(values, cuts))
+    assert to_float(total) == math.fsum(values)
+    # In any order
+    assert to_float(sum(exact_sums(piece)[0] for piece in np.split(values[::-1], cuts))) == math.fsum(values)
+
+
+def test_grouped_sums_and_float_round_trip(values):
+    codes = np.arange(len(values)) % 3
+    codes[::11] = -1
+    expected = [math.fsum(values[(codes == group)]) for group in range(3)]
+    assert list(grouped_sum(values, codes, 3)) == expected
+    assert all(to_float(from_float(value)) == value for value in values[:100])
+
+
+def test_chunked_query_equals_single_pass(bookings):
+    query = parse_query('market_segment,hotel', 'count,sum_revenue,mean_adr,sum_lead_time')
+    whole = run_query(bookings, **query)
+    chunks = [bookings.iloc[start:start + 250] for start in range(0, len(bookings), 250)]
+    merged = run_query(aggregate_pieces(chunks, query['group_by'], query['measures']), aggregated=True, **query)
+    assert list(merged['rows']) == list(whole['rows'])
+    assert list(merged['columns']) == list(whole['columns'])
+    for name, expected in whole['measures'].items():
+        np.testing.assert_array_equal(merged['measures'][name], expected)
+
+
+@pytest.mark.parametrize('hotel, year, month', FILTERS)
+def test_backend_sums_are_fsum(dataset, bookings, hotel, year, month):
+    if type(dataset).__name__ == 'SQLiteDataset':
+        pytest.skip("SQLite's TOTAL() adds in row order")
+    rows = mask(bookings, hotel, year, month)
+    result = dataset.query(hotel, year, month, **parse_query('distribution_channel', 'sum_revenue,sum_adr'))
+    for group, revenue, adr in zip(result['groups'], result['measures']['sum_revenue'], result['measures']['sum_adr']):
+        group_rows = rows[rows['distribution_channel'] == group]
+        assert revenue == math.fsum(group_rows['revenue'])
+        assert adr == math.fsum(group_rows['adr'])
+    cell = dataset.cube_for().cell(hotel, year, month)
+    assert cell.revenue_sum == math.fsum(rows['revenue'])
+    assert cell.adr_sum == math.fsum(rows['adr'])
+
+
+def test_cube_cells_combine_exactly(bookings):
+    whole = CubeCell(bookings)
+    parts = CubeCell.combine([CubeCell(bookings.iloc[start:start + 333]) for start in range(0, len(bookings), 333)])
+    assert (parts.revenue_total, parts.adr_total, parts.bookings) == (whole.revenue_total, whole.adr_total,
+                                                                      whole.bookings)
+    cube = BookingCube.from_frames(bookings.iloc[start:start + 700] for start in range(0, len(bookings), 700))
+    assert cube.cell().revenue_sum == math.fsum(bookings['revenue'])
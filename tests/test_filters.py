@@ -0,0 +1,42 @@
+import pytest
+
+from tests.conftest import same_rows
+
+COLUMNS = ['hotel', 'arrival_date_year', 'arrival_date_month', 'arrival_date_day_of_month',
+           'lead_time', 'adr', 'country', 'is_canceled']
+
+# hotel, year, month as the dashboards send them
+FILTERS = [
+    (None, None, None),
+    ('All Hotels', 'All Years', 'All Months'),
+    ('City Hotel', None, None),
+    (None, '2016', None),
+    (None, None, 'July'),
+    ('Resort Hotel', '2017', 'August'),
+    ('City Hotel', 'All Years', 'March'),
+    ('No Such Hotel', None, None),
+]
+
+
+def mask(bookings, hotel, year, month):
+    selected = bookings['hotel'].notna()
+    if hotel and hotel != 'All Hotels':
+        selected &= bookings['hotel'] == hotel
+    if year and year != 'All Years':
+        selected &= bookings['arrival_date_year'] == int(year)
+    if month and month != 'All Months':
+        selected &= bookings['arrival_date_month'] == month
+    return bookings[selected]
+
+
+@pytest.mark.parametrize('hotel, year, month', FILTERS)
+def test_filter_matches_pandas_mask(dataset, bookings, hotel, year, month):
+    frame = dataset.filter(hotel, year, month, columns=COLUMNS)
+    same_rows(frame, mask(bookings, hotel, year, month), COLUMNS)
+
+
+@pytest.mark.parametrize('hotel, year, month', FILTERS)
+def test_select_covers_the_same_rows(dataset, bookings, hotel, year, month):
+    rows = sum(len(frame) if selected is None else len(selected)
+               for frame, selected in dataset.select(hotel, year, month))
+    assert rows == len(mask(bookings, hotel, year, month))
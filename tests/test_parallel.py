@@ -0,0 +1,63 @@
+import pandas as pd
+import pytest
+
+from analytics import AggregationPool, DatasetManager, parse_query, prepare_batch
+from tests.test_append import QUERIES, same_query
+from tests.test_date_range import RANGES
+from tests.test_filters import FILTERS
+
+
+@pytest.fixture(scope='module')
+def pool():
+    # min_rows=1 sends every query with any candidate rows to the workers
+    pool = AggregationPool(2, min_rows=1)
+    yield pool
+    pool.shutdown()
+
+
+@pytest.fixture(scope='module')
+def managers(pool, bookings_csv, tmp_path_factory):
+    cache_dir = str(tmp_path_factory.mktemp('parallel'))
+    return DatasetManager(bookings_csv, cache_dir, pool=pool), DatasetManager(bookings_csv, cache_dir)
+
+
+@pytest.fixture
+def calls(pool, monkeypatch):
+    """Count the queries the pool runs."""
+    counted = []
+    query = pool.query
+    monkeypatch.setattr(pool, 'query', lambda *args: counted.append(args) or query(*args))
+    return counted
+
+
+def test_pool_cube_equals_in_process(managers):
+    parallel, local = (manager.current for manager in managers)
+    assert len(parallel.partitions) > 1
+    for hotel, year, month in FILTERS:
+        cell, expected = parallel.cube.cell(hotel, year, month), local.cube.cell(hotel, year, month)
+        assert (cell.bookings, cell.canceled, cell.revenue_total, cell.adr_total, cell.nights_sum) == (
+            expected.bookings, expected.canceled, expected.revenue_total, expected.adr_total, expected.nights_sum)
+        assert dict(cell.country_counts) == dict(expected.country_counts)
+
+
+@pytest.mark.parametrize('query', QUERIES)
+def test_pool_queries_equal_in_process(managers, calls, query):
+    parallel, local = (manager.current for manager in managers)
+    filters = [(hotel, year, month, None, None) for hotel, year, month in FILTERS]
+    filters += [(hotel, year, month, pd.Timestamp(start) if start else None, None)
+                for start, _, hotel, year, month in RANGES]
+    for hotel, year, month, start, stop in filters:
+        same_query(parallel.query(hotel, year, month, start, stop, **query),
+                   local.query(hotel, year, month, start, stop, **query))
+    assert calls
+
+
+def test_pool_merges_appended_rows(managers, bookings_csv, calls):
+    # Appended parts live only in this process and are added to the workers' partials
+    batch = pd.read_csv(bookings_csv, nrows=300)
+    parallel, local = (manager.current.append(prepare_batch(batch, manager.current.parts[0].frame))
+                       for manager in managers)
+    for query in QUERIES:
+        same_query(parallel.query(**query), local.query(**query))
+    assert parallel.query(**parse_query(None, 'count'))['measures']['count'] == len(local)
+    assert calls
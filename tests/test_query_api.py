@@ -0,0 +1,54 @@
+import pytest
+
+BAD_QUERIES = [
+    ({'group_by': 'room_number'}, 'unknown dimension: room_number'),
+    ({'measures': 'median_adr'}, 'unknown measure: median_adr'),
+    ({'measures': 'count,sum_'}, 'unknown measure: sum_'),
+    ({'group_by': 'hotel,meal,country'}, 'group_by takes at most 2 dimensions'),
+    ({'group_by': 'hotel,hotel'}, 'group_by dimensions must differ'),
+    ({'measures': 'count', 'order_by': 'count'}, 'order_by and limit need exactly one group_by dimension'),
+    ({'group_by': 'hotel,meal', 'limit': '3'}, 'order_by and limit need exactly one group_by dimension'),
+    ({'group_by': 'hotel', 'order_by': 'mean_adr'}, 'order_by must be one of the requested measures'),
+    ({'group_by': 'hotel', 'limit': '0'}, 'limit must be a positive integer'),
+    ({'group_by': 'hotel', 'limit': 'ten'}, 'limit must be a positive integer'),
+    ({'start': '2016-13-01'}, 'start must be a date like 2016-07-01'),
+    ({'start': '2016-07-01', 'end': '2016-06-30'}, 'end must not be before start'),
+]
+
+
+@pytest.mark.parametrize('query, error', BAD_QUERIES)
+def test_invalid_queries_get_400(client, query, error):
+    response = client.get('/api/query', query_string=query)
+    assert response.status_code == 400
+    assert response.get_json()['error'].startswith(error)
+
+
+def test_group_by_matches_pandas(client, bookings):
+    response = client.get('/api/query', query_string={
+        'hotel': 'City Hotel', 'group_by': 'market_segment', 'measures': 'count,mean_adr,cancel_rate'})
+    assert response.status_code == 200
+    data = response.get_json()
+    expected = bookings[bookings['hotel'] == 'City Hotel'].groupby('market_segment').agg(
+        count=('adr', 'size'), mean_adr=('adr', 'mean'), cancel_rate=('is_canceled', 'mean'))
+    assert data['dimensions'] == ['market_segment']
+    assert data['groups'] == list(expected.index)
+    for measure in expected.columns:
+        assert data['measures'][measure] == pytest.approx(list(expected[measure]))
+
+
+def test_order_by_and_limit(client, bookings):
+    response = client.get('/api/query', query_string={
+        'group_by': 'country', 'measures': 'count', 'order_by': '-count', 'limit': '5'})
+    data = response.get_json()
+    expected = bookings['country'].value_counts()
+    assert data['measures']['count'] == list(expected.iloc[:5])
+    assert all(expected[country] == count for country, count in zip(data['groups'], data['measures']['count']))
+
+
+def test_pivot_matches_crosstab(client, bookings):
+    response = client.get('/api/query', query_string={'group_by': 'hotel,customer_type', 'measures': 'count'})
+    data = response.get_json()
+    expected = bookings.groupby(['hotel', 'customer_type']).size().unstack(fill_value=0)
+    assert data['rows'] == list(expected.index)
+    assert data['columns'] == list(expected.columns)
+    assert data['measures']['count'] == expected.to_numpy().tolist()
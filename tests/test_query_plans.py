@@ -0,0 +1,7 @@
+from benchmarks.query_plans import run
+
+
+def test_endpoint_queries_use_indexes(tmp_path):
+    # A small generated database is enough: the plans come from the schema
+    # and ANALYZE statistics, and the failing plans are printed on failure
+    assert run('5000', str(tmp_path)) == []
@@ -0,0 +1,49 @@
+import pandas as pd
+
+from benchmarks.endpoints import serving
+
+QUERY = {'hotel': 'City Hotel', 'year': '2016', 'month': 'All Months'}
+
+
+def test_revalidation_answers_304(dashboard, client):
+    first = client.get('/kpi_data', query_string=QUERY)
+    assert first.status_code == 200
+    assert first.headers['Cache-Control'] == 'no-cache'
+    etag = first.headers['ETag']
+
+    not_modified = dashboard.response_cache.stats()['not_modified']
+    again = client.get('/kpi_data', query_string=QUERY, headers={'If-None-Match': etag})
+    assert again.status_code == 304
+    assert again.data == b''
+    assert again.headers['ETag'] == etag
+    assert dashboard.response_cache.stats()['not_modified'] == not_modified + 1
+
+
+def test_cached_body_is_the_view_body(dashboard, client):
+    first = client.get('/hotel_data', query_string=QUERY)
+    hits = dashboard.response_cache.stats()['hits']
+    second = client.get('/hotel_data', query_string=QUERY)
+    assert dashboard.response_cache.stats()['hits'] == hits + 1
+    assert second.data == first.data
+    assert second.headers['ETag'] == first.headers['ETag']
+
+
+def test_equivalent_filters_share_an_etag(client):
+    # "All" spellings and missing parameters are the same filter
+    plain = client.get('/kpi_data', query_string={'year': '2016'})
+    spelled = client.get('/kpi_data', query_string={'hotel': 'All Hotels', 'year': '2016', 'month': 'All Months'})
+    other = client.get('/kpi_data', query_string={'year': '2017'})
+    assert plain.headers['ETag'] == spelled.headers['ETag']
+    assert plain.headers['ETag'] != other.headers['ETag']
+    assert plain.data == spelled.data
+
+
+def test_new_dataset_version_changes_the_etag(dashboard, client, bookings_csv):
+    # A fresh manager, so the append does not leak into the other tests
+    with serving(dashboard, bookings_csv) as datasets:
+        first = client.get('/kpi_data', query_string=QUERY)
+        etag = first.headers['ETag']
+        datasets.append(pd.read_csv(bookings_csv, nrows=10))
+        after = client.get('/kpi_data', query_string=QUERY, headers={'If-None-Match': etag})
+        assert after.status_code == 200
+        assert after.headers['ETag'] != etag
@@ -0,0 +1,25 @@
+"""WSGI entry point for the CSV dashboard in app.py.
+
+``import app`` resolves to the ``app`` package, so pre-forking servers load
+app.py through this module instead, e.g.::
+
+    python -m analytics.storage hotel_booking_cleaned.csv
+    gunicorn --preload --workers 4 wsgi:app
+
+Building the columnar cache first means no worker parses the CSV, and with
+``--preload`` the master maps the dataset once before forking. Either way the
+columns are read-only views over the same memory-mapped files, so resident
+memory stays about flat as workers are added.
+"""
+import importlib.util
+import os
+import sys
+
+_spec = importlib.util.spec_from_file_location(
+    'dashboard_app', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+)
+_module = importlib.util.module_from_spec(_spec)
+sys.modules[_spec.name] = _module
+_spec.loader.exec_module(_module)
+
+app = _module.app